@@ -0,0 +1,258 @@
+"""
+Request parsing, response extraction and caching helpers shared by both HTTP builds.
+
+app.py (Flask) and asgi_app.py (Starlette) serve the same JSON contract, so
+the body validation, g4f response shapes, SSE framing and response-cache
+plumbing live here. Importing this module has no side effects beyond creating
+the (empty) response cache: no web app, g4f client or thread pool.
+"""
+
+import json
+import logging
+import os
+
+import g4f
+
+from provider_health import provider_name
+from response_cache import ResponseCache, canonical_key
+from image_cache import image_key, variant_seeds, IMAGE_MAX_VARIANTS
+from context_window import budget_for, fit_to_budget
+
+logger = logging.getLogger(__name__)
+
+# Opt-in response cache for repeated identical /chat requests.
+# RESPONSE_CACHE sets the default mode (use|bypass); requests can override with "cache".
+RESPONSE_CACHE_DEFAULT = os.getenv('RESPONSE_CACHE', 'bypass')
+response_cache = ResponseCache()
+
+
+def g4f_capabilities(client):
+    """Basic runtime checks for the g4f API surface of a (sync or async) client."""
+    return {
+        'has_chat': hasattr(client, 'chat') and hasattr(getattr(client, 'chat'), 'completions'),
+        'has_images': hasattr(client, 'images') and callable(getattr(getattr(client, 'images'), 'generate', None)),
+        'provider_module': hasattr(g4f, 'Provider')
+    }
+
+
+def safe_extract_text(resp):
+    try:
+        if resp is None:
+            return None
+        if hasattr(resp, 'choices') and resp.choices:
+            c = resp.choices[0]
+            if hasattr(c, 'message') and hasattr(c.message, 'content'):
+                return c.message.content
+            if isinstance(c, dict) and 'text' in c:
+                return c['text']
+        if isinstance(resp, dict) and 'choices' in resp and resp['choices']:
+            c = resp['choices'][0]
+            if isinstance(c, dict):
+                if 'message' in c and isinstance(c['message'], dict) and 'content' in c['message']:
+                    return c['message']['content']
+                if 'text' in c:
+                    return c['text']
+        if hasattr(resp, 'content'):
+            return resp.content
+        return str(resp)
+    except Exception:
+        return str(resp)
+
+
+def chunk_text(chunk):
+    """Extract the text delta from a streamed g4f chunk (object or dict shaped)."""
+    try:
+        if chunk is None:
+            return None
+        if isinstance(chunk, str):
+            return chunk
+        if hasattr(chunk, 'choices') and chunk.choices:
+            delta = getattr(chunk.choices[0], 'delta', None)
+            content = getattr(delta, 'content', None) if delta is not None else None
+            return content if isinstance(content, str) else None
+        if isinstance(chunk, dict) and chunk.get('choices'):
+            delta = chunk['choices'][0].get('delta') or {}
+            content = delta.get('content')
+            return content if isinstance(content, str) else None
+        return None
+    except Exception:
+        return None
+
+
+def sse(event, payload):
+    """Format one Server-Sent Events frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def build_chat_kwargs(data):
+    """Build g4f chat kwargs from a /chat request body.
+
+    Returns (kwargs, error_message). error_message is set when the body is invalid.
+    """
+    message = data.get('message', '')
+    model = data.get('model', 'gpt-4')
+    provider_name = data.get('provider', None)
+    conversation_history = data.get('conversation_history', [])
+
+    if not message:
+        return None, 'Message is required'
+
+    # Build messages array, keeping the newest turns that fit the token budget
+    messages = conversation_history.copy()
+    messages.append({"role": "user", "content": message})
+    try:
+        budget = int(data.get('max_context_tokens') or budget_for(model))
+    except (TypeError, ValueError):
+        return None, 'max_context_tokens must be an integer'
+    messages = fit_to_budget(messages, budget)
+
+    # Prepare kwargs
+    kwargs = {
+        'model': model,
+        'messages': messages
+    }
+
+    # Add provider if specified
+    if provider_name:
+        try:
+            provider = getattr(g4f.Provider, provider_name)
+            kwargs['provider'] = provider
+        except AttributeError:
+            logger.warning(f"Provider {provider_name} not found, using default")
+
+    # Reject bad cache and hedge options now, before any upstream call
+    try:
+        cache_ttl(data)
+        hedge_options(data, kwargs)
+    except ValueError as e:
+        return None, str(e)
+
+    return kwargs, None
+
+
+def hedge_options(data, kwargs):
+    """Return (fanout, delay) if the request asked for hedging, else None.
+
+    `hedge` may be true (use HEDGE_FANOUT) or an int fan-out; `hedge_delay` is the
+    seconds to wait before launching each extra provider. Hedging only applies
+    when no explicit provider was requested. Raises ValueError for values that
+    are not a positive fan-out or a non-negative delay.
+    """
+    hedge = data.get('hedge')
+    if not hedge or 'provider' in kwargs:
+        return None
+    try:
+        fanout = None if hedge is True else int(hedge)
+        delay = data.get('hedge_delay')
+        delay = float(delay) if delay is not None else None
+    except (TypeError, ValueError):
+        raise ValueError('hedge must be true or an integer and hedge_delay a number') from None
+    if (fanout is not None and fanout < 1) or (delay is not None and delay < 0):
+        raise ValueError('hedge must be at least 1 and hedge_delay not negative')
+    return fanout, delay
+
+
+def cache_mode(data):
+    mode = data.get('cache', RESPONSE_CACHE_DEFAULT)
+    if mode is True:
+        mode = 'use'
+    return mode if mode in ('use', 'refresh') else 'bypass'
+
+
+def cache_plan(data, kwargs):
+    """Return (mode, key) for the response cache.
+
+    `cache` in the body is "use" (read and write), "refresh" (skip the read but
+    store the new answer) or "bypass" (neither); true/false map to use/bypass.
+    The key covers the normalized messages, model and explicit provider.
+    """
+    mode = cache_mode(data)
+    if mode == 'bypass':
+        return mode, None
+    provider = kwargs.get('provider')
+    key = canonical_key(kwargs['messages'], kwargs['model'], provider_name(provider) if provider else None)
+    return mode, key
+
+
+def cache_ttl(data):
+    """The request's "cache_ttl" in seconds, or None for the cache default.
+
+    Raises ValueError when it is not a number, so routes can reject it before any upstream call.
+    """
+    ttl = data.get('cache_ttl')
+    if ttl is None:
+        return None
+    try:
+        return float(ttl)
+    except (TypeError, ValueError):
+        raise ValueError('cache_ttl must be a number') from None
+
+
+def cache_store(key, data, response_text, provider_used):
+    if not key or not response_text:
+        return
+    response_cache.put(
+        key,
+        {'response': response_text, 'provider': provider_used},
+        ttl=cache_ttl(data),
+        size=len(response_text.encode('utf-8'))
+    )
+
+
+def image_cache_plan(data, model, prompt, provider=None, seed=None):
+    """Return (mode, key) for caching /image results (the generated URL) by request identity."""
+    mode = cache_mode(data)
+    if mode == 'bypass':
+        return mode, None
+    return mode, 'image:' + image_key(f"{model}/{provider or ''}", prompt, seed)
+
+
+def request_seeds(data):
+    """Seeds for the requested /image variants: "n" distinct seeds from "seed" (random if absent).
+
+    Raises ValueError when "n" or "seed" is not an integer.
+    """
+    try:
+        n = max(1, min(int(data.get('n') or 1), IMAGE_MAX_VARIANTS))
+        seed = data.get('seed')
+        return variant_seeds(n, None if seed is None else int(seed))
+    except (TypeError, ValueError):
+        raise ValueError('"n" and "seed" must be integers') from None
+
+
+def image_url(response):
+    """Get the image URL out of a g4f images response (robust to its shapes)."""
+    try:
+        if hasattr(response, 'data') and response.data:
+            first = response.data[0]
+            if hasattr(first, 'url'):
+                return first.url
+            if isinstance(first, str):
+                return first
+        elif isinstance(response, str):
+            return response
+    except Exception:
+        pass
+    return None
+
+
+def cached_image_body(cached, prompt):
+    return {
+        'success': True,
+        'image_url': cached['image_url'],
+        'image_urls': cached.get('image_urls', [cached['image_url']]),
+        'prompt': prompt,
+        'cached': True
+    }
+
+
+def cached_chat_events(cached, model):
+    """Replay a cached answer as the same SSE event sequence as a live stream."""
+    yield sse('chunk', {'delta': cached['response']})
+    yield sse('done', {
+        'success': True,
+        'response': cached['response'],
+        'model': model,
+        'cached': True,
+        'timing': {'ttft_ms': 0.0, 'total_ms': 0.0}
+    })
@@ -1,12 +1,21 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import g4f
 from g4f.client import Client
-from g4f.Provider import RetryProvider
 import logging
 import asyncio
 import os
+import time
 from concurrent.futures import ThreadPoolExecutor
+from hedging import hedged_chat_sync, hedged_stream_sync
+from provider_health import scoreboard, CHAT_PROVIDERS, routed_chat_sync, routed_stream_sync
+from single_flight import SyncSingleFlight
+# Request parsing, response extraction and caching are shared with the ASGI build
+from api_helpers import (
+    RESPONSE_CACHE_DEFAULT, response_cache, g4f_capabilities, safe_extract_text, chunk_text, sse,
+    build_chat_kwargs, hedge_options, cache_plan, cache_ttl, cache_store, cached_chat_events,
+    image_cache_plan, request_seeds, image_url, cached_image_body
+)
 
 app = Flask(__name__)
 CORS(app)
@@ -18,39 +27,73 @@ logger = logging.getLogger(__name__)
 # Initialize g4f client
 client = Client()
 
+# Coalesces identical concurrent /chat and /image work (keyed like the cache)
+inflight = SyncSingleFlight()
+
 # Basic runtime checks for g4f API surface
-G4F_OK = {
-    'has_chat': hasattr(client, 'chat') and hasattr(getattr(client, 'chat'), 'completions'),
-    'has_images': hasattr(client, 'images') and callable(getattr(getattr(client, 'images'), 'generate', None)),
-    'provider_module': hasattr(g4f, 'Provider')
-}
+G4F_OK = g4f_capabilities(client)
+
 
+def _stream_chat_events(kwargs, data=None, cache_key=None):
+    """Relay g4f streamed chunks as SSE frames, ending with a `done` event.
 
-def _safe_extract_text(resp):
+    Every text delta is sent as a `chunk` event the moment g4f yields it. The final
+    `done` event carries the full text plus time-to-first-token and total time.
+    With a cache key the finished text is stored in the response cache, and a
+    `hedge` request races providers on time-to-first-token.
+    """
+    started = time.perf_counter()
+    first_token_at = None
+    parts = []
     try:
-        if resp is None:
-            return None
-        if hasattr(resp, 'choices') and resp.choices:
-            c = resp.choices[0]
-            if hasattr(c, 'message') and hasattr(c.message, 'content'):
-                return c.message.content
-            if isinstance(c, dict) and 'text' in c:
-                return c['text']
-        if isinstance(resp, dict) and 'choices' in resp and resp['choices']:
-            c = resp['choices'][0]
-            if isinstance(c, dict):
-                if 'message' in c and isinstance(c['message'], dict) and 'content' in c['message']:
-                    return c['message']['content']
-                if 'text' in c:
-                    return c['text']
-        if hasattr(resp, 'content'):
-            return resp.content
-        return str(resp)
-    except Exception:
-        return str(resp)
-
-# Thread pool for async operations
-executor = ThreadPoolExecutor(max_workers=10)
+        hedge = hedge_options(data or {}, kwargs)
+        if hedge:
+            fanout, delay = hedge
+            _, deltas = hedged_stream_sync(
+                client, kwargs['messages'], kwargs['model'], chunk_text, executor, fanout=fanout, delay=delay
+            )
+        else:
+            deltas = routed_stream_sync(client, kwargs['messages'], kwargs['model'], chunk_text, kwargs.get('provider'))
+        for text in deltas:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            parts.append(text)
+            yield sse('chunk', {'delta': text})
+
+        finished = time.perf_counter()
+        cache_store(cache_key, data or {}, ''.join(parts), None)
+        yield sse('done', {
+            'success': True,
+            'response': ''.join(parts),
+            'model': kwargs['model'],
+            'cached': False,
+            'timing': {
+                'ttft_ms': round((first_token_at - started) * 1000, 1) if first_token_at else None,
+                'total_ms': round((finished - started) * 1000, 1)
+            }
+        })
+    except Exception as e:
+        logger.error(f"Chat stream error: {str(e)}")
+        yield sse('error', {
+            'success': False,
+            'error': str(e),
+            'partial_response': ''.join(parts)
+        })
+
+
+def _sse_response(events):
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Stop reverse proxies (nginx, Render) from buffering the stream
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+# Thread pool for hedged provider calls (losers keep running until they return)
+executor = ThreadPoolExecutor(max_workers=32)
 
 @app.route('/', methods=['GET'])
 def home():
@@ -58,9 +101,11 @@ def home():
         'status': 'online',
         'service': 'g4f Discord Bot API',
         'endpoints': {
-            '/chat': 'POST - Generate text responses',
+            '/chat': 'POST - Generate text responses (set "stream": true for SSE)',
+            '/chat/stream': 'POST - Stream text responses as Server-Sent Events',
             '/image': 'POST - Generate images',
-            '/providers': 'GET - List available providers'
+            '/providers': 'GET - List available providers',
+            '/cache': 'GET - Response cache stats, DELETE - clear it'
         }
     })
 
@@ -72,46 +117,63 @@ def chat():
         "message": "user message",
         "model": "gpt-4" (optional, default: gpt-4),
         "provider": "provider_name" (optional),
-        "conversation_history": [] (optional)
+        "conversation_history": [] (optional, newest turns kept within the token budget),
+        "max_context_tokens": 4000 (optional, default depends on the model),
+        "stream": false (optional, true returns Server-Sent Events),
+        "hedge": false (optional, true or N races the top N providers),
+        "hedge_delay": 0.5 (optional, seconds before each extra provider starts),
+        "cache": "use" | "refresh" | "bypass" (optional, default from RESPONSE_CACHE),
+        "cache_ttl": 600 (optional, seconds to keep this answer)
     }
     """
     try:
         data = request.json
-        message = data.get('message', '')
-        model = data.get('model', 'gpt-4')
-        provider_name = data.get('provider', None)
-        conversation_history = data.get('conversation_history', [])
-        
-        if not message:
-            return jsonify({'error': 'Message is required'}), 400
-        
-        # Build messages array
-        messages = conversation_history.copy()
-        messages.append({"role": "user", "content": message})
-        
-        # Prepare kwargs
-        kwargs = {
-            'model': model,
-            'messages': messages
-        }
-        
-        # Add provider if specified
-        if provider_name:
-            try:
-                provider = getattr(g4f.Provider, provider_name)
-                kwargs['provider'] = provider
-            except AttributeError:
-                logger.warning(f"Provider {provider_name} not found, using default")
-        
-        # Generate response
-        response = client.chat.completions.create(**kwargs)
-        
-        response_text = _safe_extract_text(response)
-        
+        kwargs, error = build_chat_kwargs(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        mode, cache_key = cache_plan(data, kwargs)
+        cached = response_cache.get(cache_key) if mode == 'use' else None
+
+        if data.get('stream'):
+            if cached:
+                return _sse_response(cached_chat_events(cached, kwargs['model']))
+            return _sse_response(_stream_chat_events(kwargs, data, cache_key))
+
+        if cached:
+            return jsonify({
+                'success': True,
+                'response': cached['response'],
+                'model': kwargs['model'],
+                'provider': cached['provider'],
+                'cached': True
+            })
+
+        def generate():
+            hedge = hedge_options(data, kwargs)
+            if hedge:
+                fanout, delay = hedge
+                provider_used, response_text = hedged_chat_sync(
+                    client, kwargs['messages'], kwargs['model'], safe_extract_text, executor,
+                    fanout=fanout, delay=delay
+                )
+            else:
+                # Generate response
+                provider_used, response_text = routed_chat_sync(
+                    client, kwargs['messages'], kwargs['model'], safe_extract_text, kwargs.get('provider')
+                )
+            cache_store(cache_key, data, response_text, provider_used)
+            return provider_used, response_text
+
+        # Identical cacheable requests already in flight share one upstream call
+        provider_used, response_text = inflight.do(cache_key, generate) if cache_key else generate()
+
         return jsonify({
             'success': True,
             'response': response_text,
-            'model': model
+            'model': kwargs['model'],
+            'provider': provider_used,
+            'cached': False
         })
         
     except Exception as e:
@@ -121,13 +183,42 @@ def chat():
             'error': str(e)
         }), 500
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Stream a text response as Server-Sent Events.
+    Accepts the same JSON body as /chat. Emits `chunk` events ({"delta": "..."})
+    as tokens arrive, then one `done` event with the full response and timing,
+    or an `error` event if generation fails part-way.
+    """
+    try:
+        data = request.json
+        kwargs, error = build_chat_kwargs(data)
+        if error:
+            return jsonify({'error': error}), 400
+        mode, cache_key = cache_plan(data, kwargs)
+        cached = response_cache.get(cache_key) if mode == 'use' else None
+        if cached:
+            return _sse_response(cached_chat_events(cached, kwargs['model']))
+        return _sse_response(_stream_chat_events(kwargs, data, cache_key))
+    except Exception as e:
+        logger.error(f"Chat stream error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/image', methods=['POST'])
 def generate_image():
     """
     Generate image using g4f
     Expects JSON: {
         "prompt": "image description",
-        "provider": "provider_name" (optional)
+        "provider": "provider_name" (optional),
+        "n": number of variants, generated in parallel (optional, default 1, max IMAGE_MAX_VARIANTS),
+        "seed": base seed, variant i uses seed + i (optional),
+        "cache": "use" | "refresh" | "bypass" (optional, default from RESPONSE_CACHE),
+        "cache_ttl": 600 (optional, seconds to keep this result)
     }
     """
     try:
@@ -138,6 +229,19 @@ def generate_image():
         if not prompt:
             return jsonify({'error': 'Prompt is required'}), 400
         
+        try:
+            seeds = request_seeds(data)
+            ttl = cache_ttl(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Identical prompts reuse the earlier image instead of regenerating
+        seed_key = seeds[0] if len(seeds) == 1 else f"{data.get('seed', '')}/n{len(seeds)}"
+        mode, cache_key = image_cache_plan(data, 'flux', prompt, provider_name, seed_key)
+        cached = response_cache.get(cache_key) if mode == 'use' else None
+        if cached:
+            return jsonify(cached_image_body(cached, prompt))
+        
         # Prepare kwargs
         kwargs = {
             'model': 'flux',
@@ -152,33 +256,46 @@ def generate_image():
             except AttributeError:
                 logger.warning(f"Provider {provider_name} not found, using default")
         
-        # Generate image
-        response = client.images.generate(**kwargs)
-        
-        # Get image URL or data (robust)
-        image_url = None
-        try:
-            if hasattr(response, 'data') and response.data:
-                first = response.data[0]
-                if hasattr(first, 'url'):
-                    image_url = first.url
-                elif isinstance(first, str):
-                    image_url = first
-            elif isinstance(response, str):
-                image_url = response
-        except Exception:
-            image_url = None
-        
-        if not image_url:
+        def generate_one(seed):
+            # Generate image
+            if seed is None:
+                return image_url(client.images.generate(**kwargs))
+            return image_url(client.images.generate(**kwargs, seed=seed))
+
+        def generate():
+            if len(seeds) == 1:
+                return [url for url in [generate_one(seeds[0])] if url]
+            # Variants are generated in parallel; failed ones are left out
+            futures = [executor.submit(generate_one, seed) for seed in seeds]
+            image_urls = []
+            for future in futures:
+                try:
+                    url = future.result()
+                except Exception as e:
+                    logger.warning(f"Image variant failed: {e}")
+                    continue
+                if url:
+                    image_urls.append(url)
+            return image_urls
+
+        # Identical cacheable requests already in flight share one generation
+        image_urls = inflight.do(cache_key, generate) if cache_key else generate()
+
+        if not image_urls:
             return jsonify({
                 'success': False,
                 'error': 'Failed to generate image'
             }), 500
         
+        if cache_key:
+            response_cache.put(cache_key, {'image_url': image_urls[0], 'image_urls': image_urls}, ttl=ttl)
+        
         return jsonify({
             'success': True,
-            'image_url': image_url,
-            'prompt': prompt
+            'image_url': image_urls[0],
+            'image_urls': image_urls,
+            'prompt': prompt,
+            'cached': False
         })
         
     except Exception as e:
@@ -190,7 +307,7 @@ def generate_image():
 
 @app.route('/providers', methods=['GET'])
 def list_providers():
-    """List available g4f providers"""
+    """List available g4f providers plus scoreboard health (?model= picks the routing order)"""
     try:
         providers = []
         for name in dir(g4f.Provider):
@@ -199,9 +316,13 @@ def list_providers():
                 if isinstance(attr, type):
                     providers.append(name)
         
+        model = request.args.get('model', 'gpt-4')
         return jsonify({
             'success': True,
-            'providers': providers
+            'providers': providers,
+            # Live health from the provider scoreboard (this worker process)
+            'routing_order': scoreboard.rank(CHAT_PROVIDERS, model),
+            'health': scoreboard.snapshot()
         })
     except Exception as e:
         logger.error(f"Provider list error: {str(e)}")
@@ -224,6 +345,14 @@ def g4f_check():
         logger.error(f"g4f-check error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/cache', methods=['GET', 'DELETE'])
+def cache_stats():
+    """Response cache hit/miss counters and size; DELETE empties the cache."""
+    if request.method == 'DELETE':
+        response_cache.clear()
+    return jsonify({'success': True, 'cache': response_cache.stats(), 'single_flight': inflight.stats(),
+                    'default_mode': RESPONSE_CACHE_DEFAULT})
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
@@ -0,0 +1,335 @@
+"""
+Async (ASGI) build of the g4f HTTP API.
+
+Serves the same endpoints and JSON contract as app.py, but every upstream call
+goes through g4f's AsyncClient, so one process can hold hundreds of slow
+generations open at once instead of one per gunicorn worker.
+
+Run with: uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+"""
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+import asyncio
+import g4f
+from g4f.client import AsyncClient
+import logging
+import os
+import time
+
+# Request parsing, response extraction and caching are shared with the Flask build
+from api_helpers import (
+    RESPONSE_CACHE_DEFAULT, response_cache, g4f_capabilities, safe_extract_text, chunk_text, sse,
+    build_chat_kwargs, hedge_options, cache_plan, cache_ttl, cache_store, cached_chat_events,
+    image_cache_plan, request_seeds, image_url, cached_image_body
+)
+from hedging import hedged_chat_async, hedged_stream_async
+from provider_health import scoreboard, CHAT_PROVIDERS, routed_chat_async, routed_stream_async
+from single_flight import SingleFlight
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Initialize async g4f client
+client = AsyncClient()
+
+# Basic runtime checks for g4f API surface
+G4F_OK = g4f_capabilities(client)
+
+# Coalesces identical concurrent /chat and /image work (keyed like the cache)
+inflight = SingleFlight()
+
+
+async def _stream_chat_events(kwargs, data=None, cache_key=None):
+    """Relay g4f streamed chunks as SSE frames, ending with a `done` event."""
+    started = time.perf_counter()
+    first_token_at = None
+    parts = []
+    try:
+        hedge = hedge_options(data or {}, kwargs)
+        if hedge:
+            fanout, delay = hedge
+            _, deltas = await hedged_stream_async(
+                client, kwargs['messages'], kwargs['model'], chunk_text, fanout=fanout, delay=delay
+            )
+        else:
+            deltas = routed_stream_async(client, kwargs['messages'], kwargs['model'], chunk_text, kwargs.get('provider'))
+        async for text in deltas:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            parts.append(text)
+            yield sse('chunk', {'delta': text})
+
+        finished = time.perf_counter()
+        cache_store(cache_key, data or {}, ''.join(parts), None)
+        yield sse('done', {
+            'success': True,
+            'response': ''.join(parts),
+            'model': kwargs['model'],
+            'cached': False,
+            'timing': {
+                'ttft_ms': round((first_token_at - started) * 1000, 1) if first_token_at else None,
+                'total_ms': round((finished - started) * 1000, 1)
+            }
+        })
+    except Exception as e:
+        logger.error(f"Chat stream error: {str(e)}")
+        yield sse('error', {
+            'success': False,
+            'error': str(e),
+            'partial_response': ''.join(parts)
+        })
+
+
+def _sse_response(events):
+    return StreamingResponse(
+        events,
+        media_type='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
+async def home(request):
+    return JSONResponse({
+        'status': 'online',
+        'service': 'g4f Discord Bot API (async)',
+        'endpoints': {
+            '/chat': 'POST - Generate text responses (set "stream": true for SSE)',
+            '/chat/stream': 'POST - Stream text responses as Server-Sent Events',
+            '/image': 'POST - Generate images',
+            '/providers': 'GET - List available providers',
+            '/cache': 'GET - Response cache stats, DELETE - clear it'
+        }
+    })
+
+
+async def chat(request):
+    """Generate text response using g4f (same body as app.py /chat)."""
+    try:
+        data = await request.json()
+        kwargs, error = build_chat_kwargs(data)
+        if error:
+            return JSONResponse({'error': error}, status_code=400)
+
+        mode, cache_key = cache_plan(data, kwargs)
+        cached = response_cache.get(cache_key) if mode == 'use' else None
+
+        if data.get('stream'):
+            if cached:
+                return _sse_response(cached_chat_events(cached, kwargs['model']))
+            return _sse_response(_stream_chat_events(kwargs, data, cache_key))
+
+        if cached:
+            return JSONResponse({
+                'success': True,
+                'response': cached['response'],
+                'model': kwargs['model'],
+                'provider': cached['provider'],
+                'cached': True
+            })
+
+        async def generate():
+            hedge = hedge_options(data, kwargs)
+            if hedge:
+                fanout, delay = hedge
+                provider_used, response_text = await hedged_chat_async(
+                    client, kwargs['messages'], kwargs['model'], safe_extract_text,
+                    fanout=fanout, delay=delay
+                )
+            else:
+                provider_used, response_text = await routed_chat_async(
+                    client, kwargs['messages'], kwargs['model'], safe_extract_text, kwargs.get('provider')
+                )
+            cache_store(cache_key, data, response_text, provider_used)
+            return provider_used, response_text
+
+        # Identical cacheable requests already in flight share one upstream call
+        provider_used, response_text = await (inflight.do(cache_key, generate) if cache_key else generate())
+
+        return JSONResponse({
+            'success': True,
+            'response': response_text,
+            'model': kwargs['model'],
+            'provider': provider_used,
+            'cached': False
+        })
+
+    except Exception as e:
+        logger.error(f"Chat error: {str(e)}")
+        return JSONResponse({
+            'success': False,
+            'error': str(e)
+        }, status_code=500)
+
+
+async def chat_stream(request):
+    """Stream a text response as Server-Sent Events (same body as /chat)."""
+    try:
+        data = await request.json()
+        kwargs, error = build_chat_kwargs(data)
+        if error:
+            return JSONResponse({'error': error}, status_code=400)
+        mode, cache_key = cache_plan(data, kwargs)
+        cached = response_cache.get(cache_key) if mode == 'use' else None
+        if cached:
+            return _sse_response(cached_chat_events(cached, kwargs['model']))
+        return _sse_response(_stream_chat_events(kwargs, data, cache_key))
+    except Exception as e:
+        logger.error(f"Chat stream error: {str(e)}")
+        return JSONResponse({
+            'success': False,
+            'error': str(e)
+        }, status_code=500)
+
+
+async def generate_image(request):
+    """Generate image using g4f (same body as app.py /image)."""
+    try:
+        data = await request.json()
+        prompt = data.get('prompt', '')
+        provider_name = data.get('provider', None)
+
+        if not prompt:
+            return JSONResponse({'error': 'Prompt is required'}, status_code=400)
+
+        try:
+            seeds = request_seeds(data)
+            ttl = cache_ttl(data)
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+        seed_key = seeds[0] if len(seeds) == 1 else f"{data.get('seed', '')}/n{len(seeds)}"
+        mode, cache_key = image_cache_plan(data, 'flux', prompt, provider_name, seed_key)
+        cached = response_cache.get(cache_key) if mode == 'use' else None
+        if cached:
+            return JSONResponse(cached_image_body(cached, prompt))
+
+        kwargs = {
+            'model': 'flux',
+            'prompt': prompt
+        }
+
+        if provider_name:
+            try:
+                kwargs['provider'] = getattr(g4f.Provider, provider_name)
+            except AttributeError:
+                logger.warning(f"Provider {provider_name} not found, using default")
+
+        async def generate_one(seed):
+            if seed is None:
+                return image_url(await client.images.generate(**kwargs))
+            return image_url(await client.images.generate(**kwargs, seed=seed))
+
+        async def generate():
+            if len(seeds) == 1:
+                return [url for url in [await generate_one(seeds[0])] if url]
+            # Variants are generated in parallel; failed ones are left out
+            results = await asyncio.gather(*[generate_one(seed) for seed in seeds], return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.warning(f"Image variant failed: {result}")
+            return [url for url in results if url and not isinstance(url, Exception)]
+
+        # Identical cacheable requests already in flight share one generation
+        image_urls = await (inflight.do(cache_key, generate) if cache_key else generate())
+
+        if not image_urls:
+            return JSONResponse({
+                'success': False,
+                'error': 'Failed to generate image'
+            }, status_code=500)
+
+        if cache_key:
+            response_cache.put(cache_key, {'image_url': image_urls[0], 'image_urls': image_urls}, ttl=ttl)
+
+        return JSONResponse({
+            'success': True,
+            'image_url': image_urls[0],
+            'image_urls': image_urls,
+            'prompt': prompt,
+            'cached': False
+        })
+
+    except Exception as e:
+        logger.error(f"Image generation error: {str(e)}")
+        return JSONResponse({
+            'success': False,
+            'error': str(e)
+        }, status_code=500)
+
+
+async def list_providers(request):
+    """List available g4f providers plus scoreboard health (?model= picks the routing order)"""
+    try:
+        providers = []
+        for name in dir(g4f.Provider):
+            if not name.startswith('_'):
+                attr = getattr(g4f.Provider, name)
+                if isinstance(attr, type):
+                    providers.append(name)
+
+        model = request.query_params.get('model', 'gpt-4')
+        return JSONResponse({
+            'success': True,
+            'providers': providers,
+            'routing_order': scoreboard.rank(CHAT_PROVIDERS, model),
+            'health': scoreboard.snapshot()
+        })
+    except Exception as e:
+        logger.error(f"Provider list error: {str(e)}")
+        return JSONResponse({
+            'success': False,
+            'error': str(e)
+        }, status_code=500)
+
+
+async def g4f_check(request):
+    """Quick runtime check of g4f client capabilities."""
+    try:
+        return JSONResponse({
+            'success': True,
+            'g4f_ok': G4F_OK,
+            'providers_available': [n for n in dir(g4f.Provider) if not n.startswith('_')] if hasattr(g4f, 'Provider') else []
+        })
+    except Exception as e:
+        logger.error(f"g4f-check error: {e}")
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=500)
+
+
+async def cache_stats(request):
+    """Response cache hit/miss counters and size; DELETE empties the cache."""
+    if request.method == 'DELETE':
+        response_cache.clear()
+    return JSONResponse({'success': True, 'cache': response_cache.stats(), 'single_flight': inflight.stats(),
+                         'default_mode': RESPONSE_CACHE_DEFAULT})
+
+
+async def health(request):
+    """Health check endpoint"""
+    return JSONResponse({'status': 'healthy'}, status_code=200)
+
+
+app = Starlette(
+    routes=[
+        Route('/', home, methods=['GET']),
+        Route('/chat', chat, methods=['POST']),
+        Route('/chat/stream', chat_stream, methods=['POST']),
+        Route('/image', generate_image, methods=['POST']),
+        Route('/providers', list_providers, methods=['GET']),
+        Route('/g4f-check', g4f_check, methods=['GET']),
+        Route('/cache', cache_stats, methods=['GET', 'DELETE']),
+        Route('/health', health, methods=['GET']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])]
+)
+
+if __name__ == '__main__':
+    import uvicorn
+    port = int(os.environ.get('PORT', 5000))
+    uvicorn.run(app, host='0.0.0.0', port=port)
@@ -0,0 +1,73 @@
+"""
+Audio processing helpers that run in the CPU process pool (see executors.py).
+
+Functions here are module-level and take/return bytes so they can be sent to
+worker processes. Decoding goes through ffmpeg over pipes, never temp files.
+"""
+
+import io
+import os
+import subprocess
+import wave
+
+from pydub import AudioSegment
+
+import vad
+
+# Opus bitrate for speech uploads (edge-tts MP3 is 48 kbit/s)
+OPUS_BITRATE = os.getenv('OPUS_BITRATE', '24k')
+
+
+# PCM format handed to speech recognizers
+RECOGNIZER_SAMPLE_RATE = int(os.getenv('RECOGNIZER_SAMPLE_RATE', 16000))
+FFMPEG_TIMEOUT = float(os.getenv('FFMPEG_TIMEOUT', 120))
+
+
+def _wav_to_pcm(audio_bytes, sample_rate):
+    """Read 16-bit PCM WAV with the stdlib, downmixing and resampling as needed."""
+    with wave.open(io.BytesIO(audio_bytes)) as wav:
+        if wav.getsampwidth() != vad.SAMPLE_WIDTH or wav.getcomptype() != 'NONE':
+            return None
+        channels, rate = wav.getnchannels(), wav.getframerate()
+        pcm = wav.readframes(wav.getnframes())
+    if channels == 2:
+        pcm = vad.audioop.tomono(pcm, vad.SAMPLE_WIDTH, 0.5, 0.5)
+    elif channels != 1:
+        return None
+    if rate != sample_rate:
+        pcm, _ = vad.audioop.ratecv(pcm, vad.SAMPLE_WIDTH, 1, rate, sample_rate, None)
+    return pcm
+
+
+def decode_pcm(audio_bytes, sample_rate=RECOGNIZER_SAMPLE_RATE):
+    """Decode any audio ffmpeg understands to 16-bit mono PCM at sample_rate, in memory."""
+    if audio_bytes[:4] == b'RIFF' and audio_bytes[8:12] == b'WAVE':
+        try:
+            pcm = _wav_to_pcm(audio_bytes, sample_rate)
+        except wave.Error:
+            pcm = None
+        if pcm is not None:
+            return pcm
+    result = subprocess.run(
+        [AudioSegment.converter, '-hide_banner', '-loglevel', 'error', '-i', 'pipe:0',
+         '-f', 's16le', '-acodec', 'pcm_s16le', '-ac', '1', '-ar', str(sample_rate), 'pipe:1'],
+        input=audio_bytes, capture_output=True, timeout=FFMPEG_TIMEOUT)
+    if result.returncode != 0 or not result.stdout:
+        raise ValueError(f"ffmpeg could not decode the audio: {result.stderr.decode(errors='replace')[-300:]}")
+    return result.stdout
+
+
+def decode_segments(audio_bytes, sample_rate=RECOGNIZER_SAMPLE_RATE, max_segment_s=vad.VAD_MAX_SEGMENT_S):
+    """Decode audio and split it at pauses; returns (duration_s, [(start_s, pcm), ...])."""
+    pcm = decode_pcm(audio_bytes, sample_rate)
+    bytes_per_second = sample_rate * vad.SAMPLE_WIDTH
+    spans = vad.split_on_silence(pcm, sample_rate, max_segment_s=max_segment_s)
+    return len(pcm) / bytes_per_second, [(start / bytes_per_second, pcm[start:end]) for start, end in spans]
+
+
+def mp3_to_opus(mp3_bytes, bitrate=OPUS_BITRATE):
+    """Re-encode MP3 speech as Ogg/Opus in memory and return the bytes."""
+    output = io.BytesIO()
+    AudioSegment.from_file(io.BytesIO(mp3_bytes), format='mp3').export(
+        output, format='ogg', codec='libopus', bitrate=bitrate)
+    return output.getvalue()
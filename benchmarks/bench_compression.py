@@ -0,0 +1,138 @@
+"""
+Image compression benchmark: old linear compress_image vs the bounded search in imaging.py.
+
+Generates a corpus of large photo-like images (smooth colour fields, shapes
+and film grain, saved as PNG like the image backends return) and compresses
+each one to `--target-mb` with both implementations, reporting encodes per
+image, wall time and output size. The default target is small so the
+corpus stays quick to generate while still forcing quality search and
+downscaling; use `--target-mb 8` with `--size 4096` for Discord's real limit.
+Runs fully offline.
+
+Usage:
+    python benchmarks/bench_compression.py --images 12 --size 2048 --target-mb 0.5 1 2
+"""
+
+import argparse
+import io
+import os
+import random
+import statistics
+import sys
+import time
+
+from PIL import Image, ImageDraw, ImageFilter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import imaging  # noqa: E402
+
+
+def legacy_compress(image_bytes, max_size_mb=8):
+    """compress_image as it was: quality 85..25 then scale 0.8..0.4, optimize=True every time."""
+    max_size_bytes = max_size_mb * 1024 * 1024
+    if len(image_bytes) <= max_size_bytes:
+        return image_bytes
+    img = Image.open(io.BytesIO(image_bytes))
+    if img.mode == 'RGBA':
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[3])
+        img = background
+    quality = 85
+    while quality > 20:
+        output = io.BytesIO()
+        img.save(output, format='JPEG', quality=quality, optimize=True)
+        compressed_bytes = output.getvalue()
+        if len(compressed_bytes) <= max_size_bytes:
+            return compressed_bytes
+        quality -= 5
+    scale = 0.8
+    while scale > 0.3:
+        resized = img.resize((int(img.width * scale), int(img.height * scale)), Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        resized.save(output, format='JPEG', quality=85, optimize=True)
+        compressed_bytes = output.getvalue()
+        if len(compressed_bytes) <= max_size_bytes:
+            return compressed_bytes
+        scale -= 0.1
+    return compressed_bytes
+
+
+def make_image(rng, size):
+    """A photo-like test image: blurred colour field with shapes plus grain, as PNG bytes."""
+    small = Image.new('RGB', (16, 16))
+    small.putdata([tuple(rng.randrange(256) for _ in range(3)) for _ in range(256)])
+    img = small.resize((size, size), Image.Resampling.BICUBIC)
+    draw = ImageDraw.Draw(img)
+    for _ in range(80):
+        x, y, r = rng.randrange(size), rng.randrange(size), rng.randrange(8, size // 6)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rng.randrange(256) for _ in range(3)))
+    img = img.filter(ImageFilter.GaussianBlur(rng.choice([0, 1, 2])))
+    grain = Image.effect_noise((size, size), rng.choice([20, 40, 60])).convert('RGB')
+    img = Image.blend(img, grain, rng.choice([0.15, 0.3, 0.45]))
+    output = io.BytesIO()
+    img.save(output, format='PNG', compress_level=1)
+    return output.getvalue()
+
+
+class EncodeCounter:
+    """Counts Image.save calls while active."""
+
+    def __enter__(self):
+        self.count = 0
+        self._save = Image.Image.save
+        counter = self
+
+        def save(image, *args, **kwargs):
+            counter.count += 1
+            return counter._save(image, *args, **kwargs)
+
+        Image.Image.save = save
+        return self
+
+    def __exit__(self, *exc):
+        Image.Image.save = self._save
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=12)
+    parser.add_argument('--size', type=int, default=2048, help='image edge in pixels')
+    parser.add_argument('--target-mb', type=float, nargs='+', default=[0.5, 1, 2])
+    parser.add_argument('--seed', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    corpus = [make_image(rng, args.size) for _ in range(args.images)]
+    print(f"corpus: {len(corpus)} x {args.size}px PNG, mean {statistics.mean(map(len, corpus)) / 1e6:.1f} MB "
+          f"(built in {time.perf_counter() - start:.1f}s)\n")
+
+    engines = [
+        ('legacy', lambda data, mb: legacy_compress(data, mb)),
+        ('jpeg', lambda data, mb: imaging.compress_image(data, mb, fmt='jpeg')),
+        ('webp', lambda data, mb: imaging.compress_image(data, mb, fmt='webp')),
+    ]
+    print(f"{'target MB':>9} {'engine':>7} {'encodes':>8} {'max enc':>8} {'ms/img':>8} {'p95 ms':>8} "
+          f"{'out MB':>7} {'fits':>5}")
+    for target in args.target_mb:
+        limit = target * 1024 * 1024
+        for name, compress in engines:
+            encodes, times, sizes, fits = [], [], [], 0
+            for data in corpus:
+                with EncodeCounter() as counter:
+                    begin = time.perf_counter()
+                    out = compress(data, target)
+                    times.append(time.perf_counter() - begin)
+                encodes.append(counter.count)
+                sizes.append(len(out))
+                fits += len(out) <= limit
+            times.sort()
+            print(f"{target:>9} {name:>7} {statistics.mean(encodes):>8.1f} {max(encodes):>8} "
+                  f"{statistics.mean(times) * 1000:>8.0f} {times[int(len(times) * 0.95)] * 1000:>8.0f} "
+                  f"{statistics.mean(sizes) / 1e6:>7.2f} {fits:>2}/{len(corpus)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Concurrency benchmark: Flask (gunicorn) build vs async (uvicorn) build.
+
+Both servers are started with the g4f chat call replaced by a stub that just
+waits `--latency` seconds, so the numbers measure how many slow upstream calls
+each build can hold open at once, not provider speed. Runs fully offline.
+
+Usage:
+    python benchmarks/bench_concurrency.py --latency 2 --concurrency 4 32 128 256
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def serve_flask(port, latency, workers, worker_class, threads):
+    """Run app.py under gunicorn with the g4f call stubbed out."""
+    from gunicorn.app.base import BaseApplication
+    import app as flask_app
+
+    def fake_create(**kwargs):
+        time.sleep(latency)
+        return {'choices': [{'message': {'content': 'ok'}}]}
+
+    flask_app.client.chat.completions.create = fake_create
+
+    class StubServer(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'127.0.0.1:{port}')
+            self.cfg.set('workers', workers)
+            self.cfg.set('worker_class', worker_class)
+            self.cfg.set('threads', threads)
+            self.cfg.set('timeout', 300)
+            self.cfg.set('loglevel', 'warning')
+
+        def load(self):
+            return flask_app.app
+
+    StubServer().run()
+
+
+def serve_asgi(port, latency):
+    """Run asgi_app.py under uvicorn with the g4f call stubbed out."""
+    import uvicorn
+    import asgi_app
+
+    async def fake_create(**kwargs):
+        await asyncio.sleep(latency)
+        return {'choices': [{'message': {'content': 'ok'}}]}
+
+    asgi_app.client.chat.completions.create = fake_create
+    uvicorn.run(asgi_app.app, host='127.0.0.1', port=port, log_level='warning', backlog=4096)
+
+
+async def wait_until_up(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f'{base_url}/health') as resp:
+                    if resp.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f'server at {base_url} did not come up')
+
+
+async def run_level(base_url, concurrency, rounds):
+    """Fire `concurrency * rounds` /chat requests with `concurrency` in flight."""
+    total = concurrency * rounds
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=600)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                queue.get_nowait()
+                started = time.perf_counter()
+                try:
+                    async with session.post(f'{base_url}/chat', json={'message': 'hi'}) as resp:
+                        await resp.read()
+                        if resp.status != 200:
+                            errors += 1
+                            continue
+                except aiohttp.ClientError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    latencies.sort()
+    ok = len(latencies)
+    return {
+        'concurrency': concurrency,
+        'requests': total,
+        'errors': errors,
+        'wall_s': wall,
+        'rps': ok / wall if wall else 0.0,
+        'p50_s': statistics.median(latencies) if latencies else float('nan'),
+        'p95_s': latencies[min(ok - 1, int(ok * 0.95))] if latencies else float('nan'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=2.0, help='stubbed upstream latency in seconds')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[4, 32, 128, 256])
+    parser.add_argument('--rounds', type=int, default=2, help='requests per client at each level')
+    parser.add_argument('--flask-workers', type=int, default=4)
+    parser.add_argument('--flask-worker-class', default='gthread', help='gthread (Dockerfile) or sync (old default)')
+    parser.add_argument('--flask-threads', type=int, default=8)
+    parser.add_argument('--serve', choices=['flask', 'asgi'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=5101, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve == 'flask':
+        serve_flask(args.port, args.latency, args.flask_workers, args.flask_worker_class, args.flask_threads)
+        return
+    if args.serve == 'asgi':
+        serve_asgi(args.port, args.latency)
+        return
+
+    builds = [
+        ('flask', f'gunicorn {args.flask_workers}x{args.flask_worker_class}'
+                  + (f'/{args.flask_threads} threads' if args.flask_worker_class == 'gthread' else '')),
+        ('asgi', 'uvicorn 1 process'),
+    ]
+    print(f'Stubbed upstream latency: {args.latency:.2f}s\n')
+    print(f"{'build':<36} {'conc':>5} {'reqs':>5} {'err':>4} {'wall s':>8} {'req/s':>8} {'p50 s':>7} {'p95 s':>7}")
+
+    for offset, (name, label) in enumerate(builds):
+        port = args.port + offset
+        cmd = [sys.executable, os.path.abspath(__file__), '--serve', name, '--port', str(port),
+               '--latency', str(args.latency), '--flask-workers', str(args.flask_workers),
+               '--flask-worker-class', args.flask_worker_class, '--flask-threads', str(args.flask_threads)]
+        server = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        base_url = f'http://127.0.0.1:{port}'
+        try:
+            asyncio.run(wait_until_up(base_url))
+            for level in args.concurrency:
+                r = asyncio.run(run_level(base_url, level, args.rounds))
+                print(f"{label:<36} {r['concurrency']:>5} {r['requests']:>5} {r['errors']:>4} "
+                      f"{r['wall_s']:>8.2f} {r['rps']:>8.1f} {r['p50_s']:>7.2f} {r['p95_s']:>7.2f}")
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+
+if __name__ == '__main__':
+    main()
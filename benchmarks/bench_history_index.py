@@ -0,0 +1,111 @@
+"""
+History retrieval benchmark: BM25 index update cost and query latency per user.
+
+Builds one user's history turn by turn from synthetic chat text (Zipf-
+distributed vocabulary) and, at each checkpoint, reports the average cost of
+indexing one more turn, query latency over the whole history, the cost of
+rebuilding the index from a SQLite-backed history_store (what a cold recall
+pays) and the prompt tokens sent with recall versus the plain token-budget
+window. Runs fully offline.
+
+Usage:
+    python benchmarks/bench_history_index.py --turns 100 1000 5000 10000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from context_window import build_context  # noqa: E402
+from history_index import RECALL_RECENT_TURNS, BM25Index, HistoryRetriever  # noqa: E402
+from history_store import HistoryStore  # noqa: E402
+
+
+def make_vocabulary(rng, size=5000):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [''.join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(size)]
+
+
+def make_turn(rng, vocabulary, weights):
+    return ' '.join(rng.choices(vocabulary, weights=weights, k=rng.randint(8, 60)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(rng)
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    checkpoints = sorted(args.turns)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(os.path.join(tmp, 'history.sqlite3'))
+        retriever = HistoryRetriever(store)
+        index = BM25Index()
+        texts = []
+
+        print(f"{'turns':>7} {'add us':>8} {'query p50 ms':>13} {'query p95 ms':>13} "
+              f"{'rebuild ms':>11} {'index MB':>9} {'recall tok':>11} {'window tok':>11}")
+        added = 0
+        for target in checkpoints:
+            add_seconds = 0.0
+            batch = target - added
+            for seq in range(added, target):
+                text = make_turn(rng, vocabulary, weights)
+                texts.append(text)
+                store.append('bench', 'user' if seq % 2 == 0 else 'assistant', text)
+                start = time.perf_counter()
+                index.add(seq, text)
+                add_seconds += time.perf_counter() - start
+            added = target
+
+            latencies = []
+            for _ in range(args.queries):
+                source = texts[rng.randrange(len(texts))].split()
+                query = ' '.join(rng.sample(source, min(5, len(source))))
+                start = time.perf_counter()
+                index.search(query)
+                latencies.append(time.perf_counter() - start)
+            latencies.sort()
+
+            # Cold recall: rebuild this user's index from the store, measuring its footprint
+            retriever.history_cleared('bench')
+            tracemalloc.start()
+            start = time.perf_counter()
+            retriever._index('bench')
+            rebuild_ms = (time.perf_counter() - start) * 1000
+            index_mb = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+            tracemalloc.stop()
+
+            # Prompt size for the next turn with and without recall
+            turn = store.append('bench', 'user', make_turn(rng, vocabulary, weights))
+            texts.append(turn.text)
+            index.add(turn.seq, turn.text)
+            added += 1
+            turns = store.turns('bench')
+            recalled = retriever.recall('bench', turn.text, turn.seq)
+            recall_prompt = build_context(turns, 'gpt-4', recalled=recalled, recent_turns=RECALL_RECENT_TURNS)
+            window_prompt = build_context(turns, 'gpt-4')
+            recall_tokens = sum(len(m['content']) for m in recall_prompt) // 4
+            window_tokens = sum(len(m['content']) for m in window_prompt) // 4
+
+            print(f"{target:>7} {add_seconds / max(batch, 1) * 1e6:>8.1f} "
+                  f"{statistics.median(latencies) * 1000:>13.3f} {latencies[int(len(latencies) * 0.95)] * 1000:>13.3f} "
+                  f"{rebuild_ms:>11.1f} {index_mb:>9.2f} {recall_tokens:>11} {window_tokens:>11}")
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
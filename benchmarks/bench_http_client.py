@@ -0,0 +1,133 @@
+"""
+Image fetch benchmark: per-call requests.get (old bot) vs the shared pooled client.
+
+"before" fetches each image with a fresh `requests.get` in a worker thread, as
+the bot did; "after" uses http_client.HTTPClient (one keep-alive pool, cached
+DNS). By default both hit a local image server that charges `--handshake-ms`
+on the first request of every new connection, standing in for the DNS + TCP +
+TLS setup of a remote host, plus `--latency-ms` per request; so it runs fully
+offline. Pass `--url` to fetch a real image endpoint instead.
+
+Usage:
+    python benchmarks/bench_http_client.py --requests 200 --concurrency 1 8 32
+    python benchmarks/bench_http_client.py --url https://image.pollinations.ai/prompt/cat --requests 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from http_client import HTTPClient  # noqa: E402
+
+
+async def start_server(port, size, handshake, latency):
+    """Serve `size` bytes of fake JPEG; the first request on a connection pays `handshake`."""
+    payload = b'\xff\xd8\xff\xe0' + os.urandom(size - 4)
+    seen = set()
+    connections = {'opened': 0}
+
+    async def image(request):
+        peer = request.transport.get_extra_info('peername')
+        if peer not in seen:
+            seen.add(peer)
+            connections['opened'] += 1
+            await asyncio.sleep(handshake)
+        await asyncio.sleep(latency)
+        return web.Response(body=payload, content_type='image/jpeg')
+
+    server = web.Application()
+    server.router.add_get('/image/{name}', image)
+    runner = web.AppRunner(server)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+    return runner, connections
+
+
+async def run_before(url, total, concurrency):
+    """Old path: a new requests.get per image, run in a thread pool."""
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    def fetch(i):
+        resp = requests.get(f"{url}{i}", timeout=30)
+        resp.raise_for_status()
+        return resp.content
+
+    async def one(i, executor):
+        async with semaphore:
+            start = time.perf_counter()
+            await loop.run_in_executor(executor, fetch, i)
+            return time.perf_counter() - start
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        return await asyncio.gather(*[one(i, executor) for i in range(total)])
+
+
+async def run_after(url, total, concurrency):
+    """New path: the shared HTTPClient session."""
+    client = HTTPClient()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await client.get_bytes(f"{url}{i}")
+            return time.perf_counter() - start
+
+    try:
+        return await asyncio.gather(*[one(i) for i in range(total)])
+    finally:
+        await client.close()
+
+
+def summarize(latencies, elapsed):
+    ordered = sorted(latencies)
+    return (statistics.median(ordered) * 1000, ordered[int(len(ordered) * 0.95)] * 1000,
+            len(ordered) / elapsed)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='real image URL prefix (a request index is appended)')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--size-kb', type=int, default=512)
+    parser.add_argument('--handshake-ms', type=float, default=60)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    runner = connections = None
+    url = args.url
+    if url is None:
+        runner, connections = await start_server(args.port, args.size_kb * 1024,
+                                                 args.handshake_ms / 1000, args.latency_ms / 1000)
+        url = f"http://127.0.0.1:{args.port}/image/"
+
+    print(f"{'mode':>7} {'conc':>5} {'p50 ms':>9} {'p95 ms':>9} {'img/s':>8} {'conns':>6}")
+    try:
+        for concurrency in args.concurrency:
+            for mode, run in (('before', run_before), ('after', run_after)):
+                opened = connections['opened'] if connections else 0
+                start = time.perf_counter()
+                latencies = await run(url, args.requests, concurrency)
+                p50, p95, rate = summarize(latencies, time.perf_counter() - start)
+                conns = connections['opened'] - opened if connections else '-'
+                print(f"{mode:>7} {concurrency:>5} {p50:>9.1f} {p95:>9.1f} {rate:>8.1f} {conns:>6}")
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+"""
+Image download benchmark: buffered requests.get (old bot) vs capped streaming download.
+
+A local server returns JPEG-looking bodies of each `--sizes` MB, plus an
+oversized body sent without Content-Length (a misbehaving or malicious
+backend) and a non-image body. Each is fetched the old way (`requests.get`
+then `.content`, in a thread) and with http_client.HTTPClient.download
+under `--cap-mb`, reporting traced peak Python memory, bytes read and
+outcome. The server runs in its own process so only the client's memory is
+traced. Runs fully offline.
+
+Usage:
+    python benchmarks/bench_image_download.py --sizes 2 8 24 --cap-mb 25
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+
+import requests
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from http_client import DownloadTooLarge, HTTPClient  # noqa: E402
+from imaging import sniff_format  # noqa: E402
+
+_BLOCK = b'\xff' * (1024 * 1024)
+
+
+def serve(port, endless_mb):
+    """/image/<mb> returns that many MB of fake JPEG; /endless has no Content-Length; /html is a page."""
+
+    async def sized(request):
+        size = int(float(request.match_info['mb']) * 1024 * 1024)
+        body = b'\xff\xd8\xff\xe0' + b'\x00' * (size - 4)
+        return web.Response(body=body, content_type='image/jpeg')
+
+    async def endless(request):
+        resp = web.StreamResponse(headers={'Content-Type': 'image/jpeg'})
+        resp.enable_chunked_encoding()
+        await resp.prepare(request)
+        await resp.write(b'\xff\xd8\xff\xe0')
+        try:
+            for _ in range(endless_mb):
+                await resp.write(_BLOCK)
+        except ConnectionError:
+            pass
+        return resp
+
+    async def html(request):
+        return web.Response(text='<html>' + 'x' * 4 * 1024 * 1024, content_type='text/html')
+
+    server = web.Application()
+    server.router.add_get('/image/{mb}', sized)
+    server.router.add_get('/endless', endless)
+    server.router.add_get('/html', html)
+    web.run_app(server, host='127.0.0.1', port=port, print=None)
+
+
+async def measure(fetch):
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        data = await fetch()
+        outcome = 'image' if data and sniff_format(data) else 'rejected'
+        size = len(data) if data else 0
+    except DownloadTooLarge:
+        outcome, size = 'too large', 0
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return outcome, size, peak / 1e6, elapsed * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=float, nargs='+', default=[2, 8, 24])
+    parser.add_argument('--cap-mb', type=float, default=25)
+    parser.add_argument('--endless-mb', type=int, default=200, help='size of the body without Content-Length')
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+
+    server = multiprocessing.Process(target=serve, args=(args.port, args.endless_mb), daemon=True)
+    server.start()
+    base = f"http://127.0.0.1:{args.port}"
+    for _ in range(50):
+        try:
+            requests.get(f"{base}/html", timeout=1)
+            break
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    client = HTTPClient()
+    cap = int(args.cap_mb * 1024 * 1024)
+    cases = [(f"{mb:g} MB image", f"{base}/image/{mb:g}") for mb in args.sizes]
+    cases += [(f"{args.endless_mb} MB, no length", f"{base}/endless"), ('4 MB html', f"{base}/html")]
+
+    def old_fetch(url):
+        resp = requests.get(url, timeout=60)
+        resp.raise_for_status()
+        return resp.content
+
+    print(f"{'body':>20} {'path':>7} {'outcome':>10} {'MB kept':>8} {'peak MB':>8} {'ms':>7}")
+    try:
+        for label, url in cases:
+            runs = (
+                ('before', lambda: asyncio.to_thread(old_fetch, url)),
+                ('after', lambda: client.download(url, cap, accept=sniff_format)),
+            )
+            for name, fetch in runs:
+                outcome, size, peak, ms = await measure(fetch)
+                print(f"{label:>20} {name:>7} {outcome:>10} {size / 1e6:>8.1f} {peak:>8.1f} {ms:>7.0f}")
+    finally:
+        await client.close()
+        server.terminate()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,273 @@
+"""
+Offline load test for app.py: throughput and tail latency per endpoint.
+
+app.py runs under gunicorn, configured like the Dockerfile, with its g4f
+client swapped for fake_upstreams.FakeG4FClient. The fake has log-normal
+latency, a failure rate, token streaming and a fake image backend. Provider
+routing, fallback, SSE relaying and JSON handling all run for real, and
+nothing leaves the machine.
+
+A closed-loop load generator keeps each `--concurrency` level of requests in
+flight against each scenario:
+- chat: POST /chat
+- stream: POST /chat with "stream": true; also reports time to first chunk
+- image: POST /image
+- providers: GET /providers
+
+For each level it reports throughput, error rate and p50/p95/p99 latency.
+Results go to `--output` as JSON with stable keys, so runs from two releases
+can be diffed or compared with `--compare OLD.json`.
+
+Usage:
+    python benchmarks/bench_load.py --concurrency 4 16 64 --requests 200 --output load.json
+    python benchmarks/bench_load.py --compare old.json --output new.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_upstreams import FakeG4FClient, install  # noqa: E402
+
+SCENARIOS = ('chat', 'stream', 'image', 'providers')
+
+
+def fake_from_args(args):
+    return FakeG4FClient(
+        chat_p50_ms=args.chat_p50_ms, chat_p95_ms=args.chat_p95_ms, failure_rate=args.failure_rate,
+        tokens=args.tokens, token_ms=args.token_ms, image_p50_ms=args.image_p50_ms,
+        image_p95_ms=args.image_p95_ms, image_failure_rate=args.image_failure_rate, seed=args.seed)
+
+
+def serve(args):
+    """Run app.py under gunicorn with the fake upstreams installed."""
+    from gunicorn.app.base import BaseApplication
+    import app as flask_app
+
+    install(flask_app, fake_from_args(args))
+
+    class LoadServer(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'127.0.0.1:{args.port}')
+            self.cfg.set('workers', args.workers)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('threads', args.threads)
+            self.cfg.set('timeout', 300)
+            self.cfg.set('loglevel', 'warning')
+
+        def load(self):
+            return flask_app.app
+
+    LoadServer().run()
+
+
+async def wait_until_up(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f'{base_url}/health') as resp:
+                    if resp.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f'server at {base_url} did not come up')
+
+
+async def call(session, base_url, scenario, i):
+    """Send one request; returns (ok, seconds to the first streamed chunk or None)."""
+    started = time.perf_counter()
+    if scenario == 'providers':
+        async with session.get(f'{base_url}/providers', params={'model': 'gpt-4'}) as resp:
+            await resp.read()
+            return resp.status == 200, None
+    if scenario == 'image':
+        body = {'prompt': f'load test image {i}', 'cache': 'bypass'}
+        async with session.post(f'{base_url}/image', json=body) as resp:
+            await resp.read()
+            return resp.status == 200, None
+    body = {'message': f'load test message {i}', 'cache': 'bypass', 'stream': scenario == 'stream'}
+    async with session.post(f'{base_url}/chat', json=body) as resp:
+        if scenario == 'chat':
+            await resp.read()
+            return resp.status == 200, None
+        first_chunk = None
+        ok = False
+        async for line in resp.content:
+            if line.startswith(b'event: chunk') and first_chunk is None:
+                first_chunk = time.perf_counter() - started
+            elif line.startswith(b'event: done'):
+                ok = True
+            elif line.startswith(b'event: error'):
+                ok = False
+        return resp.status == 200 and ok, first_chunk
+
+
+def percentiles(samples):
+    """p50/p95/p99/max in ms (nearest rank)."""
+    if not samples:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'max_ms': None}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 1)
+
+    return {'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99), 'max_ms': round(ordered[-1] * 1000, 1)}
+
+
+async def run_level(base_url, scenario, concurrency, requests, warmup):
+    """Keep `concurrency` requests in flight until `requests` have completed (after `warmup` unrecorded ones)."""
+    latencies, first_chunks = [], []
+    errors = 0
+    counter = iter(range(warmup + requests))
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=600)) as session:
+        measuring_from = None
+
+        async def worker():
+            nonlocal errors, measuring_from
+            for i in counter:
+                recorded = i >= warmup
+                if recorded and measuring_from is None:
+                    measuring_from = time.perf_counter()
+                started = time.perf_counter()
+                try:
+                    ok, first_chunk = await call(session, base_url, scenario, i)
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    ok, first_chunk = False, None
+                if not recorded:
+                    continue
+                if not ok:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+                if first_chunk is not None:
+                    first_chunks.append(first_chunk)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - (measuring_from or time.perf_counter())
+
+    result = {
+        'requests': requests,
+        'ok': len(latencies),
+        'errors': errors,
+        'error_rate': round(errors / requests, 4) if requests else 0.0,
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else 0.0,
+        'latency': percentiles(latencies),
+    }
+    if scenario == 'stream':
+        result['first_chunk'] = percentiles(first_chunks)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(old, new):
+    """Print throughput and p95 changes for every (scenario, level) present in both runs."""
+    print(f"\n{'scenario':<10} {'conc':>5} {'req/s old':>10} {'req/s new':>10} {'Δ':>7} "
+          f"{'p95 old':>9} {'p95 new':>9} {'Δ':>7}")
+    for scenario, levels in new['results'].items():
+        for level, result in levels.items():
+            before = old.get('results', {}).get(scenario, {}).get(level)
+            if not before:
+                continue
+
+            def change(a, b):
+                return f"{(b - a) / a * 100:+.0f}%" if a and b is not None else 'n/a'
+
+            p95_old, p95_new = before['latency']['p95_ms'], result['latency']['p95_ms']
+            print(f"{scenario:<10} {level[1:]:>5} {before['throughput_rps']:>10.1f} {result['throughput_rps']:>10.1f} "
+                  f"{change(before['throughput_rps'], result['throughput_rps']):>7} "
+                  f"{p95_old or 0:>9.0f} {p95_new or 0:>9.0f} {change(p95_old, p95_new):>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[4, 16, 64])
+    parser.add_argument('--requests', type=int, default=200, help='recorded requests per scenario and level')
+    parser.add_argument('--warmup', type=int, default=20, help='unrecorded requests before each level')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers (Dockerfile: 4)')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker (Dockerfile: 8)')
+    upstream = parser.add_argument_group('fake upstreams')
+    upstream.add_argument('--chat-p50-ms', type=float, default=300, help='time to first token, median')
+    upstream.add_argument('--chat-p95-ms', type=float, default=1200, help='time to first token, 95th percentile')
+    upstream.add_argument('--failure-rate', type=float, default=0.02, help='share of provider calls that fail')
+    upstream.add_argument('--tokens', type=int, default=30, help='tokens per answer')
+    upstream.add_argument('--token-ms', type=float, default=10, help='delay between streamed tokens')
+    upstream.add_argument('--image-p50-ms', type=float, default=500)
+    upstream.add_argument('--image-p95-ms', type=float, default=2000)
+    upstream.add_argument('--image-failure-rate', type=float, default=0.02)
+    upstream.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='load_results.json', help='where to write the JSON results')
+    parser.add_argument('--compare', metavar='OLD_JSON', help='print changes against an earlier results file')
+    parser.add_argument('--port', type=int, default=5201)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    cmd = [sys.executable, os.path.abspath(__file__), '--serve'] + sys.argv[1:]
+    server = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{args.port}'
+    results = {}
+    print(f"{'scenario':<10} {'conc':>5} {'ok':>5} {'err':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'1st chunk p50':>14}")
+    try:
+        asyncio.run(wait_until_up(base_url))
+        for scenario in args.scenarios:
+            for level in args.concurrency:
+                r = asyncio.run(run_level(base_url, scenario, level, args.requests, args.warmup))
+                results.setdefault(scenario, {})[f'c{level}'] = r
+                first = r.get('first_chunk', {}).get('p50_ms')
+                print(f"{scenario:<10} {level:>5} {r['ok']:>5} {r['errors']:>4} {r['throughput_rps']:>8.1f} "
+                      f"{r['latency']['p50_ms'] or 0:>8.0f} {r['latency']['p95_ms'] or 0:>8.0f} "
+                      f"{r['latency']['p99_ms'] or 0:>8.0f} {'' if first is None else f'{first:.0f}':>14}")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    report = {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'server': {'app': 'app:app', 'gunicorn_workers': args.workers, 'worker_class': 'gthread',
+                       'threads': args.threads},
+            'load': {'requests': args.requests, 'warmup': args.warmup, 'concurrency': args.concurrency},
+            'upstream': fake_from_args(args).describe(),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
+    print(f"\nWrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
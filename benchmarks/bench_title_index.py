@@ -0,0 +1,117 @@
+"""
+Title index benchmark: build time, memory footprint and lookups per second.
+
+Uses a real TMDB ID export when given (--export movie_ids_MM_DD_YYYY.json.gz),
+otherwise a synthetic corpus of `--titles` generated titles with a long-tail
+popularity distribution. Queries are drawn from the indexed titles, half of
+them with a typo and a third truncated to an autocomplete-style prefix;
+recall@10 is how often the source title comes back in the top ten (prefixes
+of short titles are inherently ambiguous, so it will not reach 1.0).
+Runs fully offline.
+
+Usage:
+    python benchmarks/bench_title_index.py --titles 50000 200000
+    python benchmarks/bench_title_index.py --export movie_ids_05_01_2025.json.gz
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from title_index import TitleIndex  # noqa: E402
+
+SYLLABLES = (
+    'ka ri to mo na shi ve lo dar in el an or th er st ar ne ly qu ix ba '
+    'ro se mi ta ul go ze fa pe vi ck ow ea'
+).split()
+COMMON = 'the of and a in to night dark star love war king city man'.split()
+
+
+def synthetic_index(count, rng):
+    # Mostly distinct invented words, with common English words mixed in
+    vocabulary = [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(count // 2)]
+    index = TitleIndex()
+    for tmdb_id in range(1, count + 1):
+        words = [rng.choice(COMMON) if rng.random() < 0.3 else rng.choice(vocabulary)
+                 for _ in range(rng.randint(1, 4))]
+        title = ' '.join(words)
+        if rng.random() < 0.2:
+            title += f" {rng.randint(2, 9)}"
+        index.add(tmdb_id, title.title(), rng.paretovariate(1.2))
+    return index
+
+
+def make_queries(index, count, rng):
+    queries = []
+    for _ in range(count):
+        record = rng.randrange(len(index))
+        title = index.titles[record]
+        roll = rng.random()
+        if roll < 0.5 and len(title) > 3:
+            i = rng.randrange(len(title) - 1)
+            title = title[:i] + title[i + 1] + title[i] + title[i + 2:]
+        elif roll < 0.83:
+            title = title[:max(3, len(title) // 2)]
+        queries.append((title, index.ids[record]))
+    return queries
+
+
+def measure(build, queries_count, rng):
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = build()
+    build_s = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    queries = make_queries(index, queries_count, rng)
+    found = 0
+    start = time.perf_counter()
+    for query, tmdb_id in queries:
+        hits = index.search(query, limit=10)
+        found += any(hit[0] == tmdb_id for hit in hits)
+    lookup_s = time.perf_counter() - start
+    return {
+        'titles': len(index),
+        'build_s': build_s,
+        'memory_mb': memory / 1024 / 1024,
+        'bytes_per_title': memory / max(len(index), 1),
+        'lookups_per_s': len(queries) / lookup_s,
+        'avg_ms': lookup_s / len(queries) * 1000,
+        'recall_at_10': found / len(queries),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--titles', type=int, nargs='+', default=[10000, 100000],
+                        help='synthetic corpus sizes')
+    parser.add_argument('--export', help='TMDB ID export (.json.gz) to index instead')
+    parser.add_argument('--min-popularity', type=float, default=0.0,
+                        help='popularity floor when loading --export')
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.export:
+        runs = [(os.path.basename(args.export),
+                 lambda: TitleIndex.from_export(args.export, min_popularity=args.min_popularity))]
+    else:
+        runs = [(f'synthetic {n}', lambda n=n: synthetic_index(n, rng)) for n in args.titles]
+
+    print(f"{'corpus':<32} {'titles':>8} {'build s':>8} {'mem MB':>8} {'B/title':>8} {'lookup/s':>9} {'avg ms':>7} {'recall@10':>9}")
+    for label, build in runs:
+        r = measure(build, args.queries, rng)
+        print(f"{label:<32} {r['titles']:>8} {r['build_s']:>8.2f} {r['memory_mb']:>8.1f} "
+              f"{r['bytes_per_title']:>8.0f} {r['lookups_per_s']:>9.0f} {r['avg_ms']:>7.2f} {r['recall_at_10']:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Transcription benchmark: old one-shot !transcribe vs chunked parallel Transcriber.
+
+Synthetic "speech" (tone bursts of random length separated by short pauses)
+of each `--durations` seconds is encoded as 44.1 kHz stereo WAV, like a typical
+upload. The old path writes it to a temp file, reads it with
+speech_recognition and sends the whole clip in one request. The new path
+decodes in memory, splits at pauses in the process pool and recognizes the
+segments concurrently.
+
+Both use the same local stand-in recognizer. It costs `--base-ms` plus
+`--rtf` x audio length per request and rejects clips longer than
+`--max-request-s`, roughly like Google's free web API. Runs fully offline.
+
+Usage:
+    python benchmarks/bench_transcription.py --durations 15 60 180 --concurrency 4
+"""
+
+import argparse
+import asyncio
+import io
+import math
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import wave
+
+import speech_recognition as sr
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from executors import cpu_pool, io_pool  # noqa: E402
+from transcription import Transcriber  # noqa: E402
+
+
+def synthetic_speech(seconds, rate=44100, seed=0):
+    """Stereo 16-bit WAV of tone bursts (0.5-4 s) with pauses (0.2-0.8 s) and background noise."""
+    rng = random.Random(seed)
+    samples = []
+    while len(samples) < seconds * rate:
+        freq = rng.uniform(120, 300)
+        for i in range(int(rng.uniform(0.5, 4) * rate)):
+            samples.append(int(6000 * math.sin(2 * math.pi * freq * i / rate) + rng.gauss(0, 80)))
+        samples.extend(int(rng.gauss(0, 80)) for _ in range(int(rng.uniform(0.2, 0.8) * rate)))
+    samples = samples[:int(seconds * rate)]
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b''.join(struct.pack('<hh', s, s) for s in samples))
+    return buffer.getvalue()
+
+
+def stand_in(base_ms, rtf, max_request_s):
+    """A blocking recognizer whose latency grows with clip length."""
+
+    def recognize(pcm, sample_rate, sample_width=2):
+        seconds = len(pcm) / (sample_rate * sample_width)
+        if seconds > max_request_s:
+            time.sleep(base_ms / 1000)
+            raise sr.RequestError('recognition request failed: Bad Request')
+        time.sleep(base_ms / 1000 + rtf * seconds)
+        return f"({seconds:.1f}s)"
+
+    return recognize
+
+
+async def legacy_transcribe(audio_bytes, recognize):
+    """The old command body: temp file, whole-clip record, one recognizer call."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_file:
+        tmp_file.write(audio_bytes)
+        tmp_filename = tmp_file.name
+    try:
+        with sr.AudioFile(tmp_filename) as source:
+            audio = sr.Recognizer().record(source)
+        return await io_pool.run(recognize, audio.frame_data, audio.sample_rate, audio.sample_width)
+    finally:
+        os.unlink(tmp_filename)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--durations', type=float, nargs='+', default=[15, 60, 180])
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--base-ms', type=float, default=400)
+    parser.add_argument('--rtf', type=float, default=0.15, help='recognizer seconds per second of audio')
+    parser.add_argument('--max-request-s', type=float, default=60)
+    args = parser.parse_args()
+
+    recognize = stand_in(args.base_ms, args.rtf, args.max_request_s)
+    transcriber = Transcriber(recognize_fn=recognize, concurrency=args.concurrency)
+    cpu_pool.start()
+    print(f"{'audio s':>8} {'path':>7} {'outcome':>12} {'requests':>9} {'wall s':>7}")
+    try:
+        for duration in args.durations:
+            audio = synthetic_speech(duration)
+            runs = (
+                ('before', lambda: legacy_transcribe(audio, recognize)),
+                ('after', lambda: transcriber.transcribe(audio)),
+            )
+            for name, run in runs:
+                segments_before = transcriber.segments
+                start = time.perf_counter()
+                try:
+                    await run()
+                    outcome = 'ok'
+                except sr.RequestError:
+                    outcome = 'rejected'
+                elapsed = time.perf_counter() - start
+                requests = transcriber.segments - segments_before if name == 'after' else 1
+                print(f"{duration:>8g} {name:>7} {outcome:>12} {requests:>9} {elapsed:>7.2f}")
+    finally:
+        cpu_pool.shutdown()
+        io_pool.shutdown()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
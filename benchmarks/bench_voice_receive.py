@@ -0,0 +1,105 @@
+"""
+Live voice receive benchmark: CPU per speaker and memory over long sessions.
+
+Feeds synthetic 20 ms Discord frames (48 kHz stereo tone bursts with pauses)
+for `--speakers` concurrent speakers through voice_listen.SpeakerStream on
+one thread, like the voice receive router does. Frames are Opus-encoded and
+decoded per speaker when libopus is available; otherwise the decode step is
+skipped and reported as such. For each session length in `--seconds` it
+reports CPU as % of one core per speaker (thread time / audio time), the
+utterances cut, and traced peak memory, which should stay flat as sessions
+get longer. Runs fully offline and faster than real time.
+
+Usage:
+    python benchmarks/bench_voice_receive.py --speakers 1 4 8 --seconds 30 300
+"""
+
+import argparse
+import math
+import os
+import random
+import struct
+import sys
+import time
+import tracemalloc
+
+import discord
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from voice_listen import DISCORD_SAMPLE_RATE, SpeakerStream  # noqa: E402
+
+_SAMPLES_PER_FRAME = DISCORD_SAMPLE_RATE // 50
+
+
+def opus_available():
+    try:
+        return discord.opus.is_loaded() or discord.opus._load_default()
+    except Exception:
+        return False
+
+
+def speech_frames(seconds, seed):
+    """One speaker's 20 ms stereo frames: bursts of 0.5-4 s with 0.3-1.5 s pauses."""
+    rng = random.Random(seed)
+    frames = []
+    while len(frames) < seconds * 50:
+        freq, amp = rng.uniform(120, 300), rng.uniform(3000, 9000)
+        for k in range(int(rng.uniform(0.5, 4) * 50)):
+            frames.append(b''.join(
+                struct.pack('<hh', v, v) for v in (
+                    int(amp * math.sin(2 * math.pi * freq * (k * _SAMPLES_PER_FRAME + i) / DISCORD_SAMPLE_RATE)
+                        + rng.gauss(0, 60)) for i in range(_SAMPLES_PER_FRAME))))
+        frames.extend(b''.join(struct.pack('<hh', v, v) for v in (int(rng.gauss(0, 60)) for _ in range(
+            _SAMPLES_PER_FRAME))) for _ in range(int(rng.uniform(0.3, 1.5) * 50)))
+    return frames[:int(seconds * 50)]
+
+
+def run(speakers, seconds, frames, use_opus):
+    """Push `seconds` of audio per speaker, cycling the prepared frames; returns per-speaker results."""
+    tracemalloc.start()
+    streams = [SpeakerStream(discord.opus.Decoder() if use_opus else None) for _ in range(speakers)]
+    for i in range(int(seconds * 50)):
+        for n, stream in enumerate(streams):
+            frame = frames[n][i % len(frames[n])]
+            if use_opus:
+                stream.push_opus(frame)
+            else:
+                stream.push(frame)
+    for stream in streams:
+        stream.cut()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return streams, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--speakers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--seconds', type=float, nargs='+', default=[30, 300])
+    parser.add_argument('--sample-seconds', type=float, default=30, help='distinct audio generated per speaker')
+    args = parser.parse_args()
+
+    use_opus = opus_available()
+    print(f"opus decode: {'on' if use_opus else 'skipped (libopus not found)'}")
+    frames = [speech_frames(args.sample_seconds, seed) for seed in range(max(args.speakers))]
+    if use_opus:
+        encoder = discord.opus.Encoder()
+        frames = [[encoder.encode(frame, _SAMPLES_PER_FRAME) for frame in speaker] for speaker in frames]
+
+    print(f"{'speakers':>8} {'audio s':>8} {'cpu %/spk':>10} {'cpu % all':>10} {'utterances':>11} "
+          f"{'peak MB':>8} {'wall s':>7}")
+    for speakers in args.speakers:
+        for seconds in args.seconds:
+            start = time.perf_counter()
+            streams, peak = run(speakers, seconds, frames, use_opus)
+            elapsed = time.perf_counter() - start
+            per_speaker = sum(s.cpu_percent() for s in streams) / len(streams)
+            utterances = sum(s.utterances for s in streams)
+            print(f"{speakers:>8} {seconds:>8g} {per_speaker:>10.2f} {per_speaker * speakers:>10.2f} "
+                  f"{utterances:>11} {peak / 1e6:>8.2f} {elapsed:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Stand-in g4f upstreams for offline benchmarks.
+
+`FakeG4FClient` has the parts of g4f's sync Client that app.py uses:
+`chat.completions.create` (plain or streamed) and `images.generate`. Every
+call waits a latency drawn from a log-normal distribution fitted to a p50 and
+a p95, fails with a configurable probability (before any text, like a dead
+provider), and streams its answer token by token when asked. `install`
+swaps it in for app.py's module-level client, so routing, fallback, the
+scoreboard, caching and SSE relaying all run for real; only the network call
+is simulated.
+"""
+
+import math
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+# z-score of the 95th percentile of a normal distribution
+_Z95 = 1.6449
+
+
+class UpstreamError(Exception):
+    """A simulated provider failure."""
+
+
+class LatencyProfile:
+    """Log-normal latency in seconds, described by its p50 and p95 in milliseconds."""
+
+    def __init__(self, p50_ms, p95_ms=None, rng=None):
+        p95_ms = p95_ms if p95_ms is not None else p50_ms
+        self.p50_ms = p50_ms
+        self.p95_ms = max(p50_ms, p95_ms)
+        self.mu = math.log(max(p50_ms, 0.001) / 1000)
+        self.sigma = math.log(self.p95_ms / p50_ms) / _Z95 if p50_ms > 0 else 0.0
+        self.rng = rng or random.Random()
+
+    def sample(self):
+        if self.p50_ms <= 0:
+            return 0.0
+        return math.exp(self.rng.gauss(self.mu, self.sigma))
+
+    def describe(self):
+        return {'distribution': 'lognormal', 'p50_ms': self.p50_ms, 'p95_ms': self.p95_ms}
+
+
+class _Completions:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def create(self, model=None, messages=None, provider=None, stream=False, **kwargs):
+        return self.owner.chat_completion(model, messages, provider, stream)
+
+
+class _Images:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def generate(self, model=None, prompt=None, seed=None, provider=None, **kwargs):
+        return self.owner.image(prompt, seed)
+
+
+class FakeG4FClient:
+    """Simulated g4f Client: configurable latency, failures and token streaming."""
+
+    def __init__(self, chat_p50_ms=300, chat_p95_ms=1200, failure_rate=0.0, tokens=40, token_ms=15,
+                 image_p50_ms=500, image_p95_ms=2000, image_failure_rate=0.0, seed=0):
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.chat_latency = LatencyProfile(chat_p50_ms, chat_p95_ms, self._rng)
+        self.image_latency = LatencyProfile(image_p50_ms, image_p95_ms, self._rng)
+        self.failure_rate = failure_rate
+        self.image_failure_rate = image_failure_rate
+        self.tokens = tokens
+        self.token_ms = token_ms
+        self.chat = SimpleNamespace(completions=_Completions(self))
+        self.images = _Images(self)
+        self.calls = 0
+
+    def _draw(self, profile, failure_rate):
+        """(latency_s, fails) for one call; the shared RNG is not thread-safe on its own."""
+        with self._lock:
+            self.calls += 1
+            return profile.sample(), self._rng.random() < failure_rate
+
+    def chat_completion(self, model, messages, provider, stream):
+        latency, fails = self._draw(self.chat_latency, self.failure_rate)
+        name = getattr(provider, '__name__', None) or 'default'
+        words = [f"word{i}" for i in range(self.tokens)]
+        if not stream:
+            # A plain answer costs the time to first token plus the whole generation
+            time.sleep(latency + self.tokens * self.token_ms / 1000)
+            if fails:
+                raise UpstreamError(f"{name}: simulated failure")
+            return {'choices': [{'message': {'content': ' '.join(words)}}]}
+        return self._stream(latency, fails, name, words)
+
+    def _stream(self, latency, fails, name, words):
+        time.sleep(latency)
+        if fails:
+            raise UpstreamError(f"{name}: simulated failure")
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_ms / 1000)
+            yield {'choices': [{'delta': {'content': word if i == 0 else ' ' + word}}]}
+
+    def image(self, prompt, seed):
+        latency, fails = self._draw(self.image_latency, self.image_failure_rate)
+        time.sleep(latency)
+        if fails:
+            raise UpstreamError('image backend: simulated failure')
+        return SimpleNamespace(data=[SimpleNamespace(url=f"http://images.invalid/{abs(hash((prompt, seed)))}.png")])
+
+    def describe(self):
+        return {
+            'chat_latency': self.chat_latency.describe(),
+            'chat_failure_rate': self.failure_rate,
+            'tokens': self.tokens,
+            'token_ms': self.token_ms,
+            'image_latency': self.image_latency.describe(),
+            'image_failure_rate': self.image_failure_rate,
+        }
+
+
+def install(app_module, fake):
+    """Point app.py's module-level g4f client at the fake."""
+    app_module.client = fake
+    return fake
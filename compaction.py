@@ -0,0 +1,88 @@
+"""
+Background compaction of long conversations.
+
+Once a user's stored turns outgrow a share of the model's context budget, the
+oldest turns (plus any previous summary) are summarized by the chat model into
+one short system message that replaces them in history_store. It runs as a
+background task after the reply has been sent, so it never delays a response;
+later prompts carry the summary plus recent turns instead of dropping context.
+"""
+
+import asyncio
+import logging
+import os
+
+from context_window import budget_for
+
+logger = logging.getLogger(__name__)
+
+# Compact once the turns exceed this share of the budget...
+COMPACT_TRIGGER_RATIO = float(os.getenv('COMPACT_TRIGGER_RATIO', 0.75))
+# ...keeping the newest turns that fit in this share verbatim
+COMPACT_KEEP_RATIO = float(os.getenv('COMPACT_KEEP_RATIO', 0.4))
+# Compact anyway when this close to the store's hot-turn cap
+_HOT_TURNS_MARGIN = 6
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+SUMMARY_INSTRUCTIONS = (
+    "Summarize the conversation below for your own future reference. Keep names, facts, "
+    "preferences, decisions and open questions; drop pleasantries. Write at most 200 words "
+    "of plain prose."
+)
+
+
+def plan_compaction(turns, budget, hot_turns=None):
+    """Return the index of the last turn to fold into the summary, or None if not needed."""
+    summary = turns[0] if turns and turns[0].role == 'system' else None
+    recent = turns[1:] if summary else turns
+    total = sum(t.tokens for t in turns)
+    near_cap = hot_turns is not None and len(recent) >= hot_turns - _HOT_TURNS_MARGIN
+    if total <= budget * COMPACT_TRIGGER_RATIO and not near_cap:
+        return None
+    keep_budget = budget * COMPACT_KEEP_RATIO
+    kept = 0
+    keep_from = len(recent)
+    while keep_from > 0 and kept + recent[keep_from - 1].tokens <= keep_budget:
+        kept += recent[keep_from - 1].tokens
+        keep_from -= 1
+    # Keep at least the latest exchange verbatim, fold at least one turn
+    keep_from = min(keep_from, max(len(recent) - 2, 0))
+    if keep_from == 0:
+        return None
+    return keep_from - 1 + (1 if summary else 0)
+
+
+def summary_messages(turns):
+    """Build the summarization request for the given turns (summary first, if any)."""
+    lines = []
+    for turn in turns:
+        if turn.role == 'system':
+            text = turn.text[len(SUMMARY_PREFIX):] if turn.text.startswith(SUMMARY_PREFIX) else turn.text
+            lines.append(f"(previous summary) {text}")
+            continue
+        text = turn.text + (" [image]" if turn.image_url else "")
+        lines.append(f"{turn.role}: {text}")
+    return [
+        {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+        {"role": "user", "content": "\n".join(lines)}
+    ]
+
+
+async def compact_history(store, user_id, model, summarize):
+    """Summarize and replace the oldest turns if the conversation is over budget.
+
+    `summarize` is an async callable taking a messages list and returning text.
+    Returns True when the history was compacted.
+    """
+    turns = await asyncio.to_thread(store.turns, user_id)
+    last = plan_compaction(turns, budget_for(model), getattr(store, 'hot_turns', None))
+    if last is None:
+        return False
+    folded = turns[:last + 1]
+    summary = (await summarize(summary_messages(folded)) or '').strip()
+    if not summary:
+        return False
+    compacted = await asyncio.to_thread(store.compact, user_id, folded[-1].seq, SUMMARY_PREFIX + summary)
+    if compacted:
+        logger.info(f"Compacted {len(folded)} turns for user {user_id}")
+    return compacted
@@ -0,0 +1,115 @@
+"""
+Token-budget-aware context window builder.
+
+Instead of keeping the last N messages, the newest turns are packed into a
+per-model token budget. Token counts are a cheap character-based estimate,
+computed once per message (history_store caches it on each Turn), so packing
+is a single backwards walk over precomputed integers. Leading system messages
+and the newest message are always kept; recalled older turns can be packed in
+alongside them.
+"""
+
+import os
+
+# Rough tokens-per-character ratio for English text in GPT-style tokenizers
+CHARS_PER_TOKEN = 4
+# Per-message framing (role, separators) and flat cost of one attached image
+MESSAGE_OVERHEAD_TOKENS = 4
+IMAGE_TOKENS = 85
+
+# Prompt budgets per model; leaves room for the reply within each context size
+MODEL_TOKEN_BUDGETS = {
+    'gpt-4': 6000,
+    'gpt-4-vision-preview': 6000,
+    'gpt-4o': 12000,
+    'gpt-4o-mini': 12000,
+    'gpt-3.5-turbo': 3000,
+}
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', 4000))
+
+RECALL_HEADER = "Relevant earlier messages from this conversation:\n"
+
+
+def estimate_tokens(text):
+    """Approximate token count of a string."""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def message_tokens(message):
+    """Approximate token count of a g4f message dict (string or vision parts content)."""
+    content = message.get('content')
+    if isinstance(content, list):
+        tokens = 0
+        for part in content:
+            if part.get('type') == 'image_url':
+                tokens += IMAGE_TOKENS
+            else:
+                tokens += estimate_tokens(part.get('text', ''))
+    else:
+        tokens = estimate_tokens(content if isinstance(content, str) else str(content or ''))
+    return tokens + MESSAGE_OVERHEAD_TOKENS
+
+
+def budget_for(model):
+    return MODEL_TOKEN_BUDGETS.get(model, CONTEXT_TOKEN_BUDGET)
+
+
+def _window(roles, costs, budget):
+    """Return (pinned, start): keep roles[:pinned] (system) and everything from start."""
+    pinned = 0
+    while pinned < len(roles) and roles[pinned] == 'system':
+        pinned += 1
+    remaining = budget - sum(costs[:pinned])
+    start = len(roles)
+    while start > pinned:
+        cost = costs[start - 1]
+        if cost > remaining and start < len(roles):
+            break
+        remaining -= cost
+        start -= 1
+    return pinned, start
+
+
+def fit_to_budget(messages, budget, costs=None):
+    """Return the newest messages whose estimated tokens fit in `budget`.
+
+    `costs` are precomputed token counts parallel to `messages`; they are
+    estimated here when omitted. Leading system messages are pinned, and the
+    newest message is always included even if it alone exceeds the budget.
+    """
+    if costs is None:
+        costs = [message_tokens(m) for m in messages]
+    pinned, start = _window([m.get('role') for m in messages], costs, budget)
+    return list(messages[:pinned]) + list(messages[start:])
+
+
+def build_context(turns, model, budget=None, recalled=None, recent_turns=None):
+    """Pack history_store Turns (oldest first) into message dicts for `model`.
+
+    `recalled` are older, relevant turns (best first, e.g. from history_index);
+    the ones not already in the window are added as one system message with
+    whatever budget the recent turns leave. `recent_turns` caps how many of
+    the newest turns are sent verbatim.
+    """
+    budget = budget_for(model) if budget is None else budget
+    costs = [t.tokens for t in turns]
+    pinned, start = _window([t.role for t in turns], costs, budget)
+    if recent_turns:
+        start = max(start, pinned, len(turns) - recent_turns)
+    messages = [turn.as_message() for turn in turns[:pinned]]
+    if recalled:
+        window = {turn.seq for turn in turns[start:]}
+        remaining = budget - sum(costs[:pinned]) - sum(costs[start:]) - MESSAGE_OVERHEAD_TOKENS
+        picked = []
+        for turn in recalled:
+            if turn.seq not in window and turn.tokens <= remaining:
+                picked.append(turn)
+                remaining -= turn.tokens
+        if picked:
+            picked.sort(key=lambda turn: turn.seq)
+            lines = [f"{turn.role}: {turn.text}" for turn in picked]
+            messages.append({"role": "system", "content": RECALL_HEADER + "\n".join(lines)})
+    messages.extend(turn.as_message() for turn in turns[start:])
+    return messages
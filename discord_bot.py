@@ -1,23 +1,38 @@
 import discord
 from discord.ext import commands
 import g4f
-from g4f.client import Client
+from g4f.client import Client, AsyncClient
 import os
 import logging
 import asyncio
 from flask import Flask, jsonify
 from threading import Thread
-import requests
 from datetime import datetime
-import edge_tts
 import io
-from pydub import AudioSegment
 import speech_recognition as sr
-import tempfile
-from collections import deque
+from contextlib import asynccontextmanager, suppress
 import re
-from tmdbv3api import TMDb, Movie, TV
-from PIL import Image
+from hedging import hedged_chat_async, hedged_stream_async
+from provider_health import scoreboard, CHAT_PROVIDERS, routed_chat_async, routed_stream_async
+from image_cache import ImageStore, image_key, IMAGE_MAX_VARIANTS
+from tmdb_client import TMDBClient
+from title_index import load_indexes
+from history_store import HistoryStore
+from context_window import build_context
+from compaction import compact_history
+from history_index import HistoryRetriever, RECALL_RECENT_TURNS
+from scheduler import FairScheduler, RateLimited
+from executors import io_pool, cpu_pool, pool_stats
+from imaging import compress_image, file_extension
+from single_flight import SingleFlight
+from image_backends import generate_variants
+from tts import TTSEngine
+from transcription import Transcriber, NoSpeech
+from voice_talk import SpeechPipeline, stats as talk_stats
+from voice_listen import (
+    ListenSession, LISTEN_MAX_SECONDS, RECEIVE_AVAILABLE, can_receive, voice_client_class, stats as listen_stats
+)
+from http_client import http
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -34,6 +49,11 @@ AI_PREFIX = "?"
 
 # Initialize g4f client
 g4f_client = Client()
+# Async client for hedged requests (lets losing providers be cancelled)
+g4f_async_client = AsyncClient()
+
+# Race the top providers for ?-chat replies (see hedging.py for HEDGE_FANOUT / HEDGE_DELAY)
+HEDGE_CHAT = os.getenv('HEDGE_CHAT', '0') == '1'
 
 # --- g4f API capability info (runtime check) ---
 G4F_API_INFO = {}
@@ -104,15 +124,44 @@ def safe_extract_ai_text(response):
         return str(response)
 
 
-# Initialize TMDB
-tmdb = TMDb()
-tmdb.api_key = 'ae4bd1b6fce2a5648671bfc171d15ba4'
-tmdb.language = 'en'
-movie_api = Movie()
-tv_api = TV()
+def extract_stream_delta(chunk):
+    """Extract the text delta from a streamed g4f chunk (object or dict shaped)."""
+    try:
+        if chunk is None:
+            return None
+        if isinstance(chunk, str):
+            return chunk
+        if hasattr(chunk, 'choices') and chunk.choices:
+            delta = getattr(chunk.choices[0], 'delta', None)
+            content = getattr(delta, 'content', None) if delta is not None else None
+            return content if isinstance(content, str) else None
+        if isinstance(chunk, dict) and chunk.get('choices'):
+            delta = chunk['choices'][0].get('delta') or {}
+            content = delta.get('content')
+            return content if isinstance(content, str) else None
+        return None
+    except Exception as e:
+        logger.debug(f"extract_stream_delta failed: {e}")
+        return None
+
+
+# Initialize TMDB (async, pooled and cached - see tmdb_client.py)
+tmdb_client = TMDBClient()
+
+# Offline title indexes ('movie' / 'tv'), filled in the background at startup
+title_indexes = {}
+
+# Conversation history: hot in-memory LRU over SQLite, survives restarts (see history_store.py).
+# Calls go through asyncio.to_thread so SQLite never blocks the event loop.
+history_store = HistoryStore()
+# BM25 recall over each user's full history (see history_index.py)
+history_retriever = HistoryRetriever(history_store)
+
+# Send recalled relevant turns + the newest few instead of the whole recent window
+RECALL_HISTORY = os.getenv('RECALL_HISTORY', '0') == '1'
 
-# Store conversation history (in-memory, resets on restart)
-conversation_history = {}
+# Admission control for all g4f / Pollinations work (see scheduler.py)
+ai_scheduler = FairScheduler()
 
 # Store allowed channels per guild (in-memory, resets on restart)
 # Format: {guild_id: [channel_id1, channel_id2, ...]}
@@ -132,8 +181,15 @@ AVAILABLE_IMAGE_MODELS = {
 # Format: {guild_id: model_name}
 image_models = {}
 
+# On-disk cache of final (already compressed) generated images, see image_cache.py
+image_store = ImageStore()
+# Concurrent /imagine calls for the same model and prompt share one generation
+image_flight = SingleFlight()
+
 # Voice settings
-TTS_VOICE = "en-IN-NeerjaNeural"  # Indian female voice
+# Text-to-speech for !speak (chunked, hedged across voices and cached - see tts.py)
+tts_engine = TTSEngine()
+transcriber = Transcriber()
 voice_clients = {}  # Store voice connections per guild
 
 def get_voice_client(guild):
@@ -154,6 +210,21 @@ def get_voice_client(guild):
     
     return None
 
+# Talk mode: guilds where `?` answers are also spoken in the bot's voice channel
+talk_guilds = set()
+talk_locks = {}  # {guild_id: asyncio.Lock} so replies play one after another
+listen_sessions = {}  # {guild_id: ListenSession} while !listen is running
+
+def talk_pipeline(message):
+    """A SpeechPipeline for the message's guild if talk mode is on and the bot is in voice, else None"""
+    if not message.guild or message.guild.id not in talk_guilds:
+        return None
+    voice_client = get_voice_client(message.guild)
+    if not voice_client:
+        return None
+    lock = talk_locks.setdefault(message.guild.id, asyncio.Lock())
+    return SpeechPipeline(voice_client, tts_engine, lock)
+
 def cleanup_voice_client(guild_id):
     """Clean up voice client entry"""
     guild_id = str(guild_id)
@@ -186,6 +257,13 @@ def home():
 def health():
     return jsonify({'status': 'healthy', 'bot_ready': bot.is_ready()})
 
+@app.route('/pools')
+def pools():
+    """Executor pool, AI scheduler, outbound HTTP and TTS metrics"""
+    return jsonify({'pools': pool_stats(), 'ai_scheduler': ai_scheduler.stats(), 'http': http.stats(),
+                    'tts': tts_engine.stats(), 'talk': talk_stats(),
+                    'transcribe': transcriber.stats(), 'listen': listen_stats()})
+
 def run_flask():
     """Run Flask server in a separate thread"""
     port = int(os.getenv('PORT', 5000))
@@ -197,6 +275,23 @@ def start_flask():
     thread.start()
     logger.info("Flask health server started")
 
+async def load_title_indexes():
+    """Build the offline title indexes without blocking the event loop"""
+    try:
+        title_indexes.update(await asyncio.to_thread(load_indexes))
+    except Exception as e:
+        logger.error(f"Title index load error: {e}")
+
+@bot.event
+async def setup_hook():
+    asyncio.create_task(load_title_indexes())
+    # Register /movie and /tv (hybrid commands with autocomplete)
+    try:
+        synced = await bot.tree.sync()
+        logger.info(f"Synced {len(synced)} slash commands")
+    except Exception as e:
+        logger.error(f"Slash command sync error: {e}")
+
 @bot.event
 async def on_ready():
     logger.info(f'{bot.user} has connected to Discord!')
@@ -244,8 +339,8 @@ async def keep_alive():
     while not bot.is_closed():
         try:
             await asyncio.sleep(600)  # Ping every 10 minutes
-            response = await asyncio.to_thread(requests.get, f"{url}/health", timeout=10)
-            logger.info(f"Keep-alive ping: {response.status_code}")
+            async with http.request('GET', f"{url}/health", timeout=10) as response:
+                logger.info(f"Keep-alive ping: {response.status}")
         except Exception as e:
             logger.error(f"Keep-alive error: {e}")
             await asyncio.sleep(60)  # Wait 1 min on error
@@ -292,44 +387,239 @@ async def on_message(message):
         if prompt:
             await handle_chat(message, prompt)
 
+# Streaming replies: post a placeholder and edit it as tokens arrive
+STREAM_REPLIES = os.getenv('STREAM_REPLIES', '1') != '0'
+DISCORD_MESSAGE_LIMIT = 2000
+# Discord allows roughly 5 edits per 5 seconds per channel, so space edits
+# in a channel at least this far apart (shared by all streams in the channel)
+STREAM_EDIT_INTERVAL = 1.1
+_channel_next_edit = {}  # {channel_id: monotonic time of next allowed edit}
+
+def split_for_discord(text, limit=DISCORD_MESSAGE_LIMIT):
+    """Split text into (head, rest) at the message limit, preferring a newline or space."""
+    if len(text) <= limit:
+        return text, ""
+    cut = text.rfind('\n', limit - 200, limit)
+    if cut == -1:
+        cut = text.rfind(' ', limit - 200, limit)
+    if cut <= 0:
+        cut = limit
+    return text[:cut], text[cut:].lstrip('\n')
+
+async def stream_ai_reply(target, messages, model="gpt-4", deltas=None):
+    """Stream a g4f completion into Discord, editing a placeholder as tokens arrive.
+
+    `target` is anything with `.reply()` and `.channel` (a Message or a Context).
+    Edits are throttled per channel, and text rolls over into a new reply once
+    the current message reaches Discord's 2000 character limit. Text comes from
+    the best healthy provider (provider_health.py) unless `deltas` (an async
+    iterator of text, e.g. a hedged race) is given.
+    Returns the full response text.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+    if deltas is None:
+        deltas = routed_stream_async(g4f_async_client, messages, model, extract_stream_delta)
+
+    async def pump():
+        try:
+            async for text in deltas:
+                queue.put_nowait(text)
+        except Exception as e:
+            queue.put_nowait(e)
+        finally:
+            queue.put_nowait(done)
+
+    producer = asyncio.ensure_future(pump())
+
+    try:
+        channel_id = target.channel.id
+        current = await target.reply("⏳ Thinking...")
+        full_parts = []
+        pending = ""      # text belonging to the current message
+        shown = ""        # text the current message currently displays (not counting its placeholder)
+        error = None
+
+        async def paced():
+            """Claim this channel's next edit slot, then wait for it.
+
+            Claiming first means two streams in one channel get consecutive slots
+            instead of waking together and editing at the same moment.
+            """
+            now = loop.time()
+            slot = max(now, _channel_next_edit.get(channel_id, 0))
+            _channel_next_edit[channel_id] = slot + STREAM_EDIT_INTERVAL
+            if slot > now:
+                await asyncio.sleep(slot - now)
+
+        async def flush():
+            nonlocal current, pending, shown
+            # Roll over: finalize full messages and start new ones, still within the channel's edit rate
+            while len(pending) > DISCORD_MESSAGE_LIMIT:
+                head, pending = split_for_discord(pending)
+                await paced()
+                await current.edit(content=head)
+                await paced()
+                current = await target.reply("⏳ ...")
+                shown = ""
+            if pending != shown:
+                await paced()
+                await current.edit(content=pending)
+                shown = pending
+
+        while True:
+            dirty = pending != shown
+            timeout = max(0.0, _channel_next_edit.get(channel_id, 0) - loop.time()) if dirty else None
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                await flush()
+                continue
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                error = item
+                continue
+            full_parts.append(item)
+            pending += item
+            if loop.time() >= _channel_next_edit.get(channel_id, 0):
+                await flush()
+
+        await producer
+        full_text = "".join(full_parts)
+
+        if error and not full_text:
+            try:
+                await current.delete()
+            except Exception:
+                pass
+            raise error
+        if error:
+            logger.warning(f"Stream interrupted after {len(full_text)} chars: {error}")
+            pending += "\n\n⚠️ _Response was interrupted._"
+        if not full_text:
+            pending = "⚠️ No response received. Please try again."
+        await flush()
+        return full_text
+    finally:
+        # Stop the upstream stream (and talk-mode TTS) if posting to Discord failed
+        producer.cancel()
+        with suppress(asyncio.CancelledError):
+            await producer
+
+@asynccontextmanager
+async def ai_slot(target):
+    """Hold a fair-share AI slot for the author of `target` (a Message or Context).
+
+    Raises RateLimited when the user or guild is over its limits. If the request
+    has to wait, the user is told their queue position until the slot is granted.
+    """
+    notice = None
+
+    async def queued(position):
+        nonlocal notice
+        notice = await target.reply(f"⏳ The bot is busy, you're #{position} in the queue...")
+
+    guild_id = target.guild.id if target.guild else None
+    async with ai_scheduler.slot(target.author.id, guild_id, on_queued=queued):
+        if notice is not None:
+            try:
+                await notice.delete()
+            except Exception:
+                pass
+        yield
+
+async def context_for(user_id, turn, model):
+    """Prompt messages for a user's newest turn: summary, recalled turns and recent turns"""
+    turns = await asyncio.to_thread(history_store.turns, user_id)
+    if not RECALL_HISTORY:
+        return build_context(turns, model)
+    # The first recall for a user builds their index from disk, so keep it off the loop
+    recalled = await asyncio.to_thread(history_retriever.recall, user_id, turn.text, turn.seq)
+    return build_context(turns, model, recalled=recalled, recent_turns=RECALL_RECENT_TURNS)
+
+# Background compaction tasks, one per user at a time
+compaction_tasks = {}
+
+async def summarize_for_compaction(messages):
+    """Summarize old turns on the fastest healthy provider"""
+    provider_used, summary = await routed_chat_async(g4f_async_client, messages, "gpt-4", safe_extract_ai_text)
+    return summary
+
+async def _run_compaction(user_id, model):
+    async def summarize(messages):
+        # Only the summarization call takes a slot; the budget check runs off it.
+        # Background work shares the slots but is never rate limited
+        async with ai_scheduler.slot(user_id, rate_limit=False):
+            return await summarize_for_compaction(messages)
+
+    try:
+        await compact_history(history_store, user_id, model, summarize)
+    except Exception as e:
+        logger.error(f"Compaction error: {str(e)}")
+    finally:
+        compaction_tasks.pop(user_id, None)
+
+def schedule_compaction(user_id, model="gpt-4"):
+    """Summarize the oldest turns in the background once the history outgrows the budget"""
+    if user_id not in compaction_tasks:
+        compaction_tasks[user_id] = asyncio.create_task(_run_compaction(user_id, model))
+
+async def hedged_deltas(messages, model):
+    """Async iterator of text from whichever hedged provider streams first."""
+    provider_used, stream = await hedged_stream_async(g4f_async_client, messages, model, extract_stream_delta)
+    logger.info(f"Hedged stream answered by {provider_used}")
+    async for text in stream:
+        yield text
+
 async def handle_chat(message, prompt=None):
     """Handle regular chat messages with AI"""
     try:
-        # Show typing indicator
-        async with message.channel.typing():
+        # Show typing indicator while waiting for a fair-share slot
+        async with message.channel.typing(), ai_slot(message):
             user_id = str(message.author.id)
             
             # Use provided prompt or message content
             user_message = prompt if prompt else message.content
             
-            # Get or create conversation history for this user
-            if user_id not in conversation_history:
-                conversation_history[user_id] = []
-            
             # Add user message to history
-            conversation_history[user_id].append({
-                "role": "user",
-                "content": user_message
-            })
-            
-            # Keep only last 10 messages to avoid token limits
-            if len(conversation_history[user_id]) > 10:
-                conversation_history[user_id] = conversation_history[user_id][-10:]
-            
-            # Generate response using g4f
-            response = await asyncio.to_thread(
-                g4f_client.chat.completions.create,
-                model="gpt-4",
-                messages=conversation_history[user_id]
-            )
+            turn = await asyncio.to_thread(history_store.append, user_id, "user", user_message)
+            
+            # Pack the newest (and recalled) turns into the model's token budget
+            history = await context_for(user_id, turn, "gpt-4")
+            
+            if STREAM_REPLIES:
+                # Stream tokens into an edited placeholder message
+                deltas = hedged_deltas(history, "gpt-4") if HEDGE_CHAT else None
+                # Talk mode: also speak the answer in the voice channel, sentence by sentence
+                talker = talk_pipeline(message)
+                if talker:
+                    deltas = talker.tee(deltas or routed_stream_async(g4f_async_client, history, "gpt-4", extract_stream_delta))
+                try:
+                    ai_response = await stream_ai_reply(message, history, model="gpt-4", deltas=deltas)
+                finally:
+                    if talker:
+                        talker.close()
+                if ai_response:
+                    await asyncio.to_thread(history_store.append, user_id, "assistant", ai_response)
+                    schedule_compaction(user_id)
+                return
             
-            ai_response = safe_extract_ai_text(response)
+            if HEDGE_CHAT:
+                # Race the top providers and keep the first valid answer
+                provider_used, ai_response = await hedged_chat_async(
+                    g4f_async_client, history, "gpt-4", safe_extract_ai_text
+                )
+                logger.info(f"Hedged chat answered by {provider_used}")
+            else:
+                # Generate response on the fastest healthy provider
+                provider_used, ai_response = await routed_chat_async(
+                    g4f_async_client, history, "gpt-4", safe_extract_ai_text
+                )
             
             # Add AI response to history
-            conversation_history[user_id].append({
-                "role": "assistant",
-                "content": ai_response
-            })
+            await asyncio.to_thread(history_store.append, user_id, "assistant", ai_response)
             
             # Split long messages (Discord has 2000 char limit)
             if len(ai_response) > 2000:
@@ -338,7 +628,17 @@ async def handle_chat(message, prompt=None):
                     await message.reply(chunk)
             else:
                 await message.reply(ai_response)
+            
+            # Talk mode without streaming: speak the whole answer (still sentence-pipelined TTS)
+            talker = talk_pipeline(message)
+            if talker:
+                talker.feed(ai_response)
+                talker.close()
+            
+            schedule_compaction(user_id)
                 
+    except RateLimited as e:
+        await message.reply(f"🐢 {e}")
     except Exception as e:
         logger.error(f"Chat error: {str(e)}")
         await message.reply(f"Sorry, I encountered an error: {str(e)}")
@@ -346,44 +646,30 @@ async def handle_chat(message, prompt=None):
 async def handle_image_analysis(message, image_url, prompt):
     """Handle image analysis with AI"""
     try:
-        # Show typing indicator
-        async with message.channel.typing():
+        # Show typing indicator while waiting for a fair-share slot
+        async with message.channel.typing(), ai_slot(message):
             user_id = str(message.author.id)
             
-            # Get or create conversation history for this user
-            if user_id not in conversation_history:
-                conversation_history[user_id] = []
-            
-            # Create message with image
-            user_message = {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": image_url}}
-                ]
-            }
+            # Add message with image to history
+            turn = await asyncio.to_thread(history_store.append, user_id, "user", [
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": {"url": image_url}}
+            ])
             
-            # Add to history
-            conversation_history[user_id].append(user_message)
-            
-            # Keep only last 10 messages
-            if len(conversation_history[user_id]) > 10:
-                conversation_history[user_id] = conversation_history[user_id][-10:]
+            # Pack the newest (and recalled) turns into the model's token budget
+            history = await context_for(user_id, turn, "gpt-4-vision-preview")
             
             # Generate response using g4f with vision capability
-            response = await asyncio.to_thread(
+            response = await io_pool.run(
                 g4f_client.chat.completions.create,
                 model="gpt-4-vision-preview",
-                messages=conversation_history[user_id]
+                messages=history
             )
             
             ai_response = safe_extract_ai_text(response)
             
             # Add AI response to history
-            conversation_history[user_id].append({
-                "role": "assistant",
-                "content": ai_response
-            })
+            await asyncio.to_thread(history_store.append, user_id, "assistant", ai_response)
             
             # Split long messages if needed
             if len(ai_response) > 2000:
@@ -392,62 +678,49 @@ async def handle_image_analysis(message, image_url, prompt):
                     await message.reply(chunk)
             else:
                 await message.reply(ai_response)
+            
+            schedule_compaction(user_id, "gpt-4-vision-preview")
                 
+    except RateLimited as e:
+        await message.reply(f"🐢 {e}")
     except Exception as e:
         logger.error(f"Image analysis error: {str(e)}")
         await message.reply(f"Sorry, I couldn't analyze that image: {str(e)}")
 
-def compress_image(image_bytes, max_size_mb=8):
-    """Compress image if it exceeds Discord's size limit"""
-    max_size_bytes = max_size_mb * 1024 * 1024
-    
-    # If already under limit, return as-is
-    if len(image_bytes) <= max_size_bytes:
+# `!imagine <prompt> --n 3` generates that many variants
+VARIANTS_FLAG = re.compile(r'(?:^|\s)--n\s+(\d+)\b')
+
+# Discord file size limits: 8MB for free servers, 50MB for boosted (Level 2), 100MB for Level 3
+# We'll use 8MB as safe default
+MAX_FILE_SIZE = 8 * 1024 * 1024  # 8 MB in bytes
+
+async def generate_images(prompt, selected_model, n=1):
+    """Generate n variants of a prompt, returning [(provider_name, image_bytes), ...] (empty on failure)
+
+    Each image is one bytes object from the capped download onward: compression
+    only runs (in the CPU pool) when it is over the upload limit, and
+    io.BytesIO(image_bytes) for discord.File shares it instead of copying.
+    """
+    # Every backend is raced per image; variants run in parallel with distinct seeds
+    images = await generate_variants(prompt, selected_model, n, g4f_client=g4f_client)
+
+    async def fit(image_bytes):
+        if len(image_bytes) > MAX_FILE_SIZE:
+            return await cpu_pool.run(compress_image, image_bytes)
         return image_bytes
-    
+
+    fitted = await asyncio.gather(*[fit(image_bytes) for _, image_bytes in images])
+    images_to_send = [(provider_name, image_bytes) for (provider_name, _), image_bytes in zip(images, fitted)]
+
+    # Keep the final bytes for repeat prompts (single images only: variants are meant to differ)
+    if not images_to_send or n > 1:
+        return images_to_send
     try:
-        # Open image
-        img = Image.open(io.BytesIO(image_bytes))
-        
-        # Convert RGBA to RGB if needed
-        if img.mode == 'RGBA':
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            background.paste(img, mask=img.split()[3])
-            img = background
-        
-        # Start with quality 85 and reduce until under size limit
-        quality = 85
-        while quality > 20:
-            output = io.BytesIO()
-            img.save(output, format='JPEG', quality=quality, optimize=True)
-            compressed_bytes = output.getvalue()
-            
-            if len(compressed_bytes) <= max_size_bytes:
-                return compressed_bytes
-            
-            quality -= 5
-        
-        # If still too large, resize the image
-        scale = 0.8
-        while scale > 0.3:
-            new_width = int(img.width * scale)
-            new_height = int(img.height * scale)
-            resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            output = io.BytesIO()
-            resized.save(output, format='JPEG', quality=85, optimize=True)
-            compressed_bytes = output.getvalue()
-            
-            if len(compressed_bytes) <= max_size_bytes:
-                return compressed_bytes
-            
-            scale -= 0.1
-        
-        # Return best effort
-        return compressed_bytes
+        await asyncio.to_thread(image_store.put, image_key(selected_model, prompt), images_to_send[0][1])
     except Exception as e:
-        logger.error(f"Compression error: {str(e)}")
-        return image_bytes
+        logger.warning(f"Image cache write failed: {e}")
+    return images_to_send
+
 
 @bot.command(name='imagine')
 async def imagine_command(ctx, *, prompt: str = None):
@@ -457,95 +730,48 @@ async def imagine_command(ctx, *, prompt: str = None):
             await ctx.reply("Please provide a prompt! Example: `!imagine a beautiful sunset`")
             return
         
+        # `--n 3` asks for several variants in one upload
+        n = 1
+        match = VARIANTS_FLAG.search(prompt)
+        if match:
+            n = max(1, min(int(match.group(1)), IMAGE_MAX_VARIANTS))
+            prompt = VARIANTS_FLAG.sub(' ', prompt).strip()
+            if not prompt:
+                await ctx.reply("Please provide a prompt! Example: `!imagine a beautiful sunset --n 3`")
+                return
+        
         # Get selected model for this guild
         guild_id = str(ctx.guild.id) if ctx.guild else "dm"
         selected_model = image_models.get(guild_id, "flux")
         
-        # Discord file size limits: 8MB for free servers, 50MB for boosted (Level 2), 100MB for Level 3
-        # We'll use 8MB as safe default
-        MAX_FILE_SIZE = 8 * 1024 * 1024  # 8 MB in bytes
-        
-        # Show typing indicator
-        status_msg = await ctx.reply(f"🎨 Generating images with **{AVAILABLE_IMAGE_MODELS.get(selected_model, selected_model)}**\n> _{prompt}_\n\n⏳ Trying multiple providers...")
+        # Repeat prompts are served from the image cache: no generation, no compression
+        cache_key = image_key(selected_model, prompt)
+        cached_image = await asyncio.to_thread(image_store.get, cache_key) if n == 1 else None
+        if cached_image:
+            filename = f"generated_image.{file_extension(cached_image)}"
+            file = discord.File(io.BytesIO(cached_image), filename=filename)
+            embed = discord.Embed(title="🎨 Generated Image", description=f"> {prompt}", color=discord.Color.green())
+            embed.set_image(url=f"attachment://{filename}")
+            embed.set_footer(text=f"Requested by {ctx.author.display_name} • Model: {selected_model} • Provider: cache")
+            await ctx.send(embed=embed, file=file)
+            return
         
-        try:
-            # First, try direct Pollinations image endpoint (fast, doesn't rely on g4f internals)
-            from urllib.parse import quote_plus
-
-            def generate_via_pollinations(prompt_text: str, model_name: str = None):
-                # Prefer the gen endpoint for better results, fallback to simple image endpoint
-                encoded = quote_plus(prompt_text)
-                urls = [
-                    f"https://gen.pollinations.ai/image/{encoded}",
-                    f"https://image.pollinations.ai/prompt/{encoded}"
-                ]
-                for url in urls:
-                    try:
-                        resp = requests.get(url, timeout=30, allow_redirects=True)
-                        resp.raise_for_status()
-                        # If we received image bytes, return them
-                        content_type = resp.headers.get('content-type', '')
-                        if content_type.startswith('image/') or resp.content:
-                            return resp.content
-                    except Exception:
-                        continue
-                return None
-
-            images_to_send = []
-
-            # Try direct Pollinations first
+        # Every requester waits for their own fair-share slot, even when the
+        # generation itself ends up shared with someone else's identical prompt
+        async with ai_slot(ctx):
+            status_msg = await ctx.reply(f"🎨 Generating {'images' if n == 1 else f'{n} variants'} with **{AVAILABLE_IMAGE_MODELS.get(selected_model, selected_model)}**\n> _{prompt}_\n\n⏳ Trying multiple providers...")
             try:
-                image_bytes = await asyncio.get_event_loop().run_in_executor(None, generate_via_pollinations, prompt, selected_model)
-                if image_bytes:
-                    if len(image_bytes) > MAX_FILE_SIZE:
-                        image_bytes = await asyncio.get_event_loop().run_in_executor(None, compress_image, image_bytes)
-                    images_to_send.append(("Pollinations", image_bytes))
-            except Exception as e:
-                logger.warning(f"Pollinations direct call failed: {e}")
-
-            # If Pollinations failed, try g4f client image APIs if available
-            if not images_to_send:
-                # Attempt to use g4f client if it exposes an images interface
-                try:
-                    # Try the high-level images.generate if available
-                    if hasattr(g4f_client, 'images') and hasattr(g4f_client.images, 'generate'):
-                        def call_g4f_images():
-                            return g4f_client.images.generate(model=selected_model, prompt=prompt)
-                        resp = await asyncio.get_event_loop().run_in_executor(None, call_g4f_images)
-
-                        # Parse response for URL/bytes
-                        image_url = None
-                        image_data = None
-                        if hasattr(resp, 'data') and resp.data:
-                            first_item = resp.data[0]
-                            if hasattr(first_item, 'url'):
-                                image_url = first_item.url
-                            elif isinstance(first_item, str):
-                                image_url = first_item
-                            elif hasattr(first_item, 'b64_json'):
-                                import base64
-                                image_data = base64.b64decode(first_item.b64_json)
-                        elif isinstance(resp, str):
-                            image_url = resp
-                        elif isinstance(resp, bytes):
-                            image_data = resp
-
-                        if image_data:
-                            if len(image_data) > MAX_FILE_SIZE:
-                                image_data = await asyncio.get_event_loop().run_in_executor(None, compress_image, image_data)
-                            images_to_send.append(("g4f_images", image_data))
-                        elif image_url:
-                            # download
-                            def download_image():
-                                r = requests.get(image_url, timeout=30)
-                                r.raise_for_status()
-                                return r.content
-                            image_bytes = await asyncio.get_event_loop().run_in_executor(None, download_image)
-                            if len(image_bytes) > MAX_FILE_SIZE:
-                                image_bytes = await asyncio.get_event_loop().run_in_executor(None, compress_image, image_bytes)
-                            images_to_send.append(("g4f_images", image_bytes))
-                except Exception as e:
-                    logger.warning(f"g4f client image generation failed: {e}")
+                # The same prompt already being generated for someone else is shared, not redone
+                images_to_send = await image_flight.do(
+                    f"{cache_key}:{n}", lambda: generate_images(prompt, selected_model, n))
+            except Exception as gen_error:
+                images_to_send, generation_error = None, gen_error
+            else:
+                generation_error = None
+
+        try:
+            if generation_error is not None:
+                raise generation_error
 
             # If still no images, give up
             if not images_to_send:
@@ -555,15 +781,16 @@ async def imagine_command(ctx, *, prompt: str = None):
             # Send results (support single or multiple)
             if len(images_to_send) == 1:
                 provider_name, image_data = images_to_send[0]
-                file = discord.File(io.BytesIO(image_data), filename="generated_image.jpg")
+                filename = f"generated_image.{file_extension(image_data)}"
+                file = discord.File(io.BytesIO(image_data), filename=filename)
                 embed = discord.Embed(title="🎨 Generated Image", description=f"> {prompt}", color=discord.Color.green())
-                embed.set_image(url="attachment://generated_image.jpg")
+                embed.set_image(url=f"attachment://{filename}")
                 embed.set_footer(text=f"Requested by {ctx.author.display_name} • Model: {selected_model} • Provider: {provider_name}")
                 await ctx.send(embed=embed, file=file)
             else:
                 files = []
                 for i, (provider_name, image_data) in enumerate(images_to_send, 1):
-                    files.append(discord.File(io.BytesIO(image_data), filename=f"image_{i}_{provider_name}.jpg"))
+                    files.append(discord.File(io.BytesIO(image_data), filename=f"image_{i}_{provider_name}.{file_extension(image_data)}"))
                 embed = discord.Embed(title=f"🎨 Generated {len(images_to_send)} Images", description=f"> {prompt}", color=discord.Color.green())
                 embed.set_footer(text=f"Requested by {ctx.author.display_name} • Model: {selected_model}")
                 await ctx.send(embed=embed, files=files)
@@ -576,7 +803,8 @@ async def imagine_command(ctx, *, prompt: str = None):
                 await status_msg.edit(content=f"❌ Image generation failed: {str(gen_error)}\n\n💡 Try: `!setimagemodel flux` or check `!listimagemodels`")
             except:
                 await ctx.reply(f"❌ Image generation error: {str(gen_error)}\n\n💡 Try: `!setimagemodel flux`")
-                
+    except RateLimited as e:
+        await ctx.reply(f"🐢 {e}")
     except Exception as e:
         logger.error(f"Image command error: {str(e)}", exc_info=True)
         await ctx.reply(f"❌ Command error: {str(e)}\n\n💡 Use `!listimagemodels` to see available models")
@@ -592,6 +820,19 @@ async def g4f_status(ctx):
         providers = G4F_API_INFO.get('provider_list', [])
         info_lines.append(f"providers_count: {len(providers)}")
         info_lines.append(f"providers_sample: {', '.join(providers[:8])}")
+        # Live provider health from the scoreboard
+        info_lines.append(f"routing_order (gpt-4): {', '.join(scoreboard.rank(CHAT_PROVIDERS, 'gpt-4')) or 'none healthy'}")
+        for row in scoreboard.snapshot()[:8]:
+            rate = f"{row['success_rate'] * 100:.0f}%" if row['success_rate'] is not None else "n/a"
+            p50 = f"{row['p50_ms']}ms" if row['p50_ms'] is not None else "n/a"
+            p95 = f"{row['p95_ms']}ms" if row['p95_ms'] is not None else "n/a"
+            info_lines.append(f"{row['provider']}/{row['model']}: {row['state']} ok={rate} p50={p50} p95={p95} n={row['samples']}")
+        for pool in pool_stats():
+            info_lines.append(f"pool {pool['name']}: {pool['in_flight']}/{pool['max_workers']} busy, queue={pool['queue_depth']} wait_p95={pool['wait_p95_ms']}ms run_p95={pool['run_p95_ms']}ms")
+        downloads = http.stats()
+        info_lines.append(f"downloads: {downloads['downloading_bytes'] / 1e6:.1f}MB buffering, peak {downloads['peak_download_bytes'] / 1e6:.1f}MB, {downloads['rejected']} rejected")
+        queue = ai_scheduler.stats()
+        info_lines.append(f"ai_slots: {queue['active']}/{queue['max_concurrency']} busy, {queue['queued']} queued, {queue['rejected']} rate-limited")
         await ctx.reply("\n".join(info_lines))
     except Exception as e:
         await ctx.reply(f"Failed to get g4f status: {e}")
@@ -605,38 +846,31 @@ async def ask_command(ctx, *, question: str = None):
         return
     
     try:
-        # Show typing indicator
-        async with ctx.typing():
+        # Show typing indicator while waiting for a fair-share slot
+        async with ctx.typing(), ai_slot(ctx):
             user_id = str(ctx.author.id)
             
-            # Get or create conversation history for this user
-            if user_id not in conversation_history:
-                conversation_history[user_id] = []
-            
             # Add user message to history
-            conversation_history[user_id].append({
-                "role": "user",
-                "content": question
-            })
+            turn = await asyncio.to_thread(history_store.append, user_id, "user", question)
             
-            # Keep only last 10 messages
-            if len(conversation_history[user_id]) > 10:
-                conversation_history[user_id] = conversation_history[user_id][-10:]
+            # Pack the newest (and recalled) turns into the model's token budget
+            history = await context_for(user_id, turn, "gpt-4")
             
-            # Generate response using g4f
-            response = await asyncio.to_thread(
-                g4f_client.chat.completions.create,
-                model="gpt-4",
-                messages=conversation_history[user_id]
-            )
+            if STREAM_REPLIES:
+                # Stream tokens into an edited placeholder message
+                ai_response = await stream_ai_reply(ctx, history, model="gpt-4")
+                if ai_response:
+                    await asyncio.to_thread(history_store.append, user_id, "assistant", ai_response)
+                    schedule_compaction(user_id)
+                return
             
-            ai_response = safe_extract_ai_text(response)
+            # Generate response on the fastest healthy provider
+            provider_used, ai_response = await routed_chat_async(
+                g4f_async_client, history, "gpt-4", safe_extract_ai_text
+            )
             
             # Add AI response to history
-            conversation_history[user_id].append({
-                "role": "assistant",
-                "content": ai_response
-            })
+            await asyncio.to_thread(history_store.append, user_id, "assistant", ai_response)
             
             # Split long messages (Discord has 2000 char limit)
             if len(ai_response) > 2000:
@@ -645,7 +879,11 @@ async def ask_command(ctx, *, question: str = None):
                     await ctx.reply(chunk)
             else:
                 await ctx.reply(ai_response)
+            
+            schedule_compaction(user_id)
                 
+    except RateLimited as e:
+        await ctx.reply(f"🐢 {e}")
     except Exception as e:
         logger.error(f"Chat error: {str(e)}")
         await ctx.reply(f"Sorry, I encountered an error: {str(e)}")
@@ -657,52 +895,21 @@ async def speak_command(ctx, *, text: str = None):
         await ctx.reply("Please provide text! Example: `!speak Hello, how are you?`")
         return
     
-    # List of backup voices in case primary fails
-    voices_to_try = [
-        "en-IN-NeerjaNeural",  # Indian female (primary)
-        "en-US-JennyNeural",    # US female (backup)
-        "en-GB-SoniaNeural"     # UK female (backup)
-    ]
-    
-    tmp_filename = None
     try:
         async with ctx.typing():
-            last_error = None
-            
-            # Try each voice until one works
-            for voice in voices_to_try:
-                try:
-                    # Generate speech with Edge TTS
-                    communicate = edge_tts.Communicate(text, voice)
-                    
-                    # Save to temporary file
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
-                        tmp_filename = tmp_file.name
-                        await communicate.save(tmp_filename)
-                    
-                    # Send audio file
-                    voice_label = "🔊" if voice == voices_to_try[0] else "🔊 (backup voice)"
-                    await ctx.reply(f"{voice_label} Here's your audio:", file=discord.File(tmp_filename, "speech.mp3"))
-                    
-                    # Clean up and return on success
-                    if tmp_filename and os.path.exists(tmp_filename):
-                        os.unlink(tmp_filename)
-                    return
-                    
-                except Exception as voice_error:
-                    logger.warning(f"Failed with voice {voice}: {str(voice_error)}")
-                    last_error = voice_error
-                    if tmp_filename and os.path.exists(tmp_filename):
-                        os.unlink(tmp_filename)
-                    continue
-            
-            # If all voices failed
-            raise last_error if last_error else Exception("All voices failed")
+            # Sentence chunks are synthesized concurrently; backup voices are only hedged in
+            audio, ext, voices_used = await tts_engine.speak(text)
+        
+        voice_label = "🔊" if voices_used == {tts_engine.voices[0]} else "🔊 (backup voice)"
+        await ctx.reply(f"{voice_label} Here's your audio:", file=discord.File(io.BytesIO(audio), f"speech.{ext}"))
             
     except Exception as e:
         logger.error(f"TTS error: {str(e)}")
         await ctx.reply(f"Sorry, I couldn't generate speech: {str(e)}")
 
+# Connections use voice_listen's receiving client when it is installed; say so when it isn't
+JOIN_RECEIVE_NOTE = "" if RECEIVE_AVAILABLE else " (live `!listen` is unavailable: discord-ext-voice-recv is not installed)"
+
 @bot.command(name='join')
 async def join_voice(ctx):
     """Join your voice channel"""
@@ -723,9 +930,9 @@ async def join_voice(ctx):
         return
     
     try:
-        voice_client = await channel.connect()
+        voice_client = await channel.connect(cls=voice_client_class())
         voice_clients[guild_id] = voice_client
-        await ctx.reply(f"✅ Joined {channel.name}!")
+        await ctx.reply(f"✅ Joined {channel.name}!{JOIN_RECEIVE_NOTE}")
         
     except discord.errors.ClientException:
         # Stale connection detected - force cleanup and retry
@@ -736,9 +943,9 @@ async def join_voice(ctx):
                 await ctx.guild.voice_client.disconnect(force=True)
             await asyncio.sleep(0.5)  # Brief delay for cleanup
             
-            voice_client = await channel.connect()
+            voice_client = await channel.connect(cls=voice_client_class())
             voice_clients[guild_id] = voice_client
-            await ctx.reply(f"✅ Joined {channel.name}! (Cleaned up stale connection)")
+            await ctx.reply(f"✅ Joined {channel.name}! (Cleaned up stale connection){JOIN_RECEIVE_NOTE}")
         except Exception as retry_error:
             logger.error(f"Voice join retry failed: {str(retry_error)}")
             await ctx.reply(f"❌ Failed to join after cleanup: {str(retry_error)}")
@@ -746,6 +953,25 @@ async def join_voice(ctx):
         logger.error(f"Voice join error: {str(e)}")
         await ctx.reply(f"❌ Couldn't join voice channel: {str(e)}")
 
+@bot.command(name='talk')
+async def talk_command(ctx, mode: str = None):
+    """Toggle talk mode: `?` answers are spoken in the voice channel as they stream"""
+    if not ctx.guild:
+        await ctx.reply("❌ Talk mode only works in servers.")
+        return
+    
+    enable = ctx.guild.id not in talk_guilds if mode is None else mode.lower() in ('on', 'true', '1', 'yes')
+    if not enable:
+        talk_guilds.discard(ctx.guild.id)
+        await ctx.reply("🔇 Talk mode off.")
+        return
+    
+    if not get_voice_client(ctx.guild):
+        await ctx.reply("❌ Bot must be in voice channel! Use `!join` first.")
+        return
+    talk_guilds.add(ctx.guild.id)
+    await ctx.reply(f"🗣️ Talk mode on: answers to `{AI_PREFIX}` prompts will be spoken here. `!talk off` to stop.")
+
 @bot.command(name='leave')
 async def leave_voice(ctx):
     """Leave the voice channel"""
@@ -771,7 +997,7 @@ async def leave_voice(ctx):
 
 @bot.command(name='listen')
 async def listen_command(ctx, duration: int = 5):
-    """Listen and transcribe voice (duration in seconds, max 30)"""
+    """Listen and transcribe voice live (duration in seconds)"""
     guild_id = str(ctx.guild.id)
     
     voice_client = get_voice_client(ctx.guild)
@@ -784,19 +1010,46 @@ async def listen_command(ctx, duration: int = 5):
         cleanup_voice_client(guild_id)
         return
     
-    if duration > 30:
-        duration = 30
-        
+    if not RECEIVE_AVAILABLE:
+        await ctx.reply("ℹ️ Live listening needs the `discord-ext-voice-recv` package. Upload an audio file and use `!transcribe` instead.")
+        return
+    
+    if not can_receive(voice_client):
+        await ctx.reply("❌ This voice connection can't receive audio. Use `!leave` then `!join` again.")
+        return
+    
+    if guild_id in listen_sessions:
+        await ctx.reply("ℹ️ Already listening in this server!")
+        return
+    
+    duration = max(1, min(duration, LISTEN_MAX_SECONDS))
+    
+    async def post(user, text):
+        await ctx.send(f"🎤 **{user.display_name}:** {text}")
+    
+    session = ListenSession(voice_client, transcriber.recognize, post)
+    listen_sessions[guild_id] = session
     try:
-        await ctx.reply(f"🎤 Listening for {duration} seconds...")
+        await ctx.reply(f"🎤 Listening for {duration} seconds... (transcripts appear as you speak)")
+        await session.run(duration)
         
-        # Note: Discord.py voice recording is complex and requires additional setup
-        # For Render free tier, we'll use a simpler approach with audio attachments
-        await ctx.reply("ℹ️ Voice recording from channels requires additional setup. Please upload an audio file instead or use `!transcribe` with an audio attachment.")
+        speakers = session.speaker_stats()
+        if not speakers:
+            await ctx.reply("🔇 Didn't hear anyone.")
+            return
+        summary = "\n".join(
+            f"• {s['user']}: {s['audio_s']}s audio, {s['utterances']} utterances, {s['cpu_percent']}% CPU"
+            for s in speakers
+        )
+        if session.dropped:
+            summary += f"\n⚠️ {session.dropped} utterances skipped (transcription was falling behind)"
+        await ctx.reply(f"✅ Done listening ({session.posted} transcripts)\n{summary}")
         
     except Exception as e:
         logger.error(f"Listen error: {str(e)}")
         await ctx.reply(f"Sorry, couldn't listen: {str(e)}")
+    finally:
+        listen_sessions.pop(guild_id, None)
 
 @bot.command(name='transcribe')
 async def transcribe_command(ctx):
@@ -814,38 +1067,16 @@ async def transcribe_command(ctx):
     
     try:
         async with ctx.typing():
-            # Download audio file
+            # Decoded in memory, split at pauses and recognized in parallel
             audio_data = await attachment.read()
+            text = await transcriber.transcribe(audio_data)
             
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(attachment.filename)[1]) as tmp_file:
-                tmp_file.write(audio_data)
-                tmp_filename = tmp_file.name
+            # Long recordings can pass Discord's 2000 char limit
+            reply = f"📝 **Transcription:**\n{text}"
+            for i in range(0, len(reply), 2000):
+                await ctx.reply(reply[i:i+2000])
             
-            # Convert to WAV if needed
-            wav_filename = tmp_filename
-            if not tmp_filename.endswith('.wav'):
-                audio = AudioSegment.from_file(tmp_filename)
-                wav_filename = tmp_filename.rsplit('.', 1)[0] + '.wav'
-                audio.export(wav_filename, format='wav')
-            
-            # Transcribe using speech_recognition
-            recognizer = sr.Recognizer()
-            with sr.AudioFile(wav_filename) as source:
-                audio = recognizer.record(source)
-                text = await asyncio.to_thread(
-                    recognizer.recognize_google,
-                    audio
-                )
-            
-            # Clean up
-            os.unlink(tmp_filename)
-            if wav_filename != tmp_filename:
-                os.unlink(wav_filename)
-            
-            await ctx.reply(f"📝 **Transcription:**\n{text}")
-            
-    except sr.UnknownValueError:
+    except NoSpeech:
         await ctx.reply("❌ Could not understand the audio. Please try again with clearer audio.")
     except sr.RequestError as e:
         await ctx.reply(f"❌ Could not request transcription service: {str(e)}")
@@ -859,8 +1090,7 @@ async def transcribe_command(ctx):
 async def clear_history(ctx):
     """Clear conversation history for the user"""
     user_id = str(ctx.author.id)
-    if user_id in conversation_history:
-        conversation_history[user_id] = []
+    if await asyncio.to_thread(history_store.clear, user_id):
         await ctx.reply("✅ Your conversation history has been cleared!")
     else:
         await ctx.reply("You don't have any conversation history.")
@@ -887,7 +1117,7 @@ async def help_command(ctx):
         name="⚡ Commands",
         value=(
             "`!ask <question>` - Ask AI a question\n"
-            "`!imagine <prompt>` - Generate an image from text\n"
+            "`!imagine <prompt> [--n 2-4]` - Generate an image (or variants) from text\n"
             "`!speak <text>` - Convert text to speech (Indian voice)\n"
             "`!transcribe` - Transcribe audio attachment\n"
             "`!clear` - Clear your conversation history\n"
@@ -901,7 +1131,8 @@ async def help_command(ctx):
         value=(
             "`!join` - Join your voice channel\n"
             "`!leave` - Leave voice channel\n"
-            "`!listen [seconds]` - Listen and transcribe (max 30s)"
+            "`!talk [on|off]` - Speak `?` answers in voice as they stream\n"
+            f"`!listen [seconds]` - Transcribe the voice channel live (max {LISTEN_MAX_SECONDS}s)"
         ),
         inline=False
     )
@@ -1100,7 +1331,36 @@ def get_streaming_url(media_type: str, tmdb_id: str, imdb_id: str = None, provid
             return f"https://vidfast.pro/tv/{tmdb_id}/{season}/{episode}?autoPlay=true"
     return None
 
-@bot.command(name='movie')
+async def resolve_title_id(media_type: str, query: str):
+    """Resolve a query to a TMDB ID: tmdb:<id>, then the offline index, then TMDB search"""
+    match = re.fullmatch(r'\s*tmdb:(\d+)\s*', query)
+    if match:
+        return int(match.group(1))
+    index = title_indexes.get(media_type)
+    if index is not None:
+        tmdb_id = index.resolve(query)
+        if tmdb_id is not None:
+            return tmdb_id
+    results_list = await tmdb_client.search(media_type, query)
+    return results_list[0]['id'] if results_list else None
+
+async def title_autocomplete(media_type: str, current: str):
+    """Autocomplete choices from the offline index, falling back to (cached) TMDB search"""
+    if len(current.strip()) < 2:
+        return []
+    index = title_indexes.get(media_type)
+    if index is not None:
+        hits = [(tmdb_id, title) for tmdb_id, title, _, _ in index.search(current, limit=25)]
+    else:
+        try:
+            results_list = await tmdb_client.search(media_type, current)
+        except Exception as e:
+            logger.warning(f"Autocomplete search error: {e}")
+            return []
+        hits = [(r['id'], r.get('title') or r.get('name') or str(r['id'])) for r in results_list[:25]]
+    return [discord.app_commands.Choice(name=title[:100], value=f"tmdb:{tmdb_id}") for tmdb_id, title in hits]
+
+@bot.hybrid_command(name='movie')
 async def search_movie(ctx, *, query: str = None):
     """Search for a movie and get streaming links"""
     if not query:
@@ -1109,51 +1369,45 @@ async def search_movie(ctx, *, query: str = None):
     
     async with ctx.typing():
         try:
-            # Search TMDB
-            results = movie_api.search(query)
-            
-            if not results:
+            # Offline index first, TMDB search only on a miss
+            movie_id = await resolve_title_id('movie', query)
+            if movie_id is None:
                 await ctx.reply(f"❌ No movies found for: {query}")
                 return
             
-            # Convert results to list and get first movie
-            results_list = list(results)
-            if not results_list:
+            movie_details = await tmdb_client.details('movie', movie_id)
+            if not movie_details:
                 await ctx.reply(f"❌ No movies found for: {query}")
                 return
             
-            movie = results_list[0]
-            movie_details = movie_api.details(movie.id)
-            
-            # Get external IDs for IMDb
-            external_ids = movie_api.external_ids(movie.id)
-            imdb_id = external_ids.get('imdb_id', None)
+            # External IDs come back with the details (append_to_response)
+            imdb_id = (movie_details.get('external_ids') or {}).get('imdb_id')
             
             # Create embed
-            release_year = movie_details.release_date[:4] if hasattr(movie_details, 'release_date') and movie_details.release_date else 'N/A'
-            overview = movie_details.overview if hasattr(movie_details, 'overview') else "No overview available."
+            release_year = movie_details['release_date'][:4] if movie_details.get('release_date') else 'N/A'
+            overview = movie_details.get('overview') or "No overview available."
             description = overview[:300] + "..." if len(overview) > 300 else overview
             
             embed = discord.Embed(
-                title=f"{movie_details.title} ({release_year})",
+                title=f"{movie_details.get('title', query)} ({release_year})",
                 description=description,
                 color=discord.Color.blue(),
-                url=f"https://www.themoviedb.org/movie/{movie.id}"
+                url=f"https://www.themoviedb.org/movie/{movie_id}"
             )
             
             # Add poster
-            if movie_details.poster_path:
-                embed.set_thumbnail(url=f"https://image.tmdb.org/t/p/w500{movie_details.poster_path}")
+            if movie_details.get('poster_path'):
+                embed.set_thumbnail(url=f"https://image.tmdb.org/t/p/w500{movie_details['poster_path']}")
             
             # Add fields - safely handle genres
-            embed.add_field(name="⭐ Rating", value=f"{movie_details.vote_average:.1f}/10", inline=True)
-            embed.add_field(name="🎬 Runtime", value=f"{movie_details.runtime} min" if movie_details.runtime else "N/A", inline=True)
+            embed.add_field(name="⭐ Rating", value=f"{movie_details.get('vote_average') or 0:.1f}/10", inline=True)
+            embed.add_field(name="🎬 Runtime", value=f"{movie_details['runtime']} min" if movie_details.get('runtime') else "N/A", inline=True)
             
             # Get genres safely
             genres_text = "N/A"
-            if hasattr(movie_details, 'genres') and movie_details.genres:
+            if movie_details.get('genres'):
                 try:
-                    genres_list = list(movie_details.genres)
+                    genres_list = list(movie_details['genres'])
                     # Handle both dict and object formats
                     genre_names = []
                     for g in genres_list[:3]:
@@ -1169,7 +1423,7 @@ async def search_movie(ctx, *, query: str = None):
             # Create buttons for streaming providers
             view = discord.ui.View()
             for provider_key, provider_name in STREAMING_PROVIDERS.items():
-                stream_url = get_streaming_url('movie', str(movie.id), imdb_id, provider_key)
+                stream_url = get_streaming_url('movie', str(movie_id), imdb_id, provider_key)
                 if stream_url:
                     view.add_item(discord.ui.Button(
                         label=f"▶️ {provider_name}",
@@ -1177,7 +1431,7 @@ async def search_movie(ctx, *, query: str = None):
                         style=discord.ButtonStyle.link
                     ))
             
-            embed.set_footer(text=f"TMDB ID: {movie.id} | IMDb ID: {imdb_id if imdb_id else 'N/A'}")
+            embed.set_footer(text=f"TMDB ID: {movie_id} | IMDb ID: {imdb_id if imdb_id else 'N/A'}")
             
             await ctx.reply(embed=embed, view=view)
             
@@ -1185,7 +1439,11 @@ async def search_movie(ctx, *, query: str = None):
             logger.error(f"Movie search error: {str(e)}")
             await ctx.reply(f"❌ Error searching movie: {str(e)}")
 
-@bot.command(name='tv', aliases=['series', 'show'])
+@search_movie.autocomplete('query')
+async def search_movie_autocomplete(interaction: discord.Interaction, current: str):
+    return await title_autocomplete('movie', current)
+
+@bot.hybrid_command(name='tv', aliases=['series', 'show'])
 async def search_tv(ctx, *, query: str = None):
     """Search for a TV show and get streaming links"""
     if not query:
@@ -1194,48 +1452,44 @@ async def search_tv(ctx, *, query: str = None):
     
     async with ctx.typing():
         try:
-            # Search TMDB
-            results = tv_api.search(query)
-            
-            if not results:
+            # Offline index first, TMDB search only on a miss
+            show_id = await resolve_title_id('tv', query)
+            if show_id is None:
                 await ctx.reply(f"❌ No TV shows found for: {query}")
                 return
             
-            # Convert results to list and get first show
-            results_list = list(results)
-            if not results_list:
+            show_details = await tmdb_client.details('tv', show_id)
+            if not show_details:
                 await ctx.reply(f"❌ No TV shows found for: {query}")
                 return
             
-            show = results_list[0]
-            show_details = tv_api.details(show.id)
-            
-            # Get external IDs for IMDb
-            external_ids = tv_api.external_ids(show.id)
-            imdb_id = external_ids.get('imdb_id', None)
+            # External IDs come back with the details (append_to_response)
+            imdb_id = (show_details.get('external_ids') or {}).get('imdb_id')
             
             # Create embed
+            overview = show_details.get('overview') or ""
+            first_air_date = show_details.get('first_air_date')
             embed = discord.Embed(
-                title=f"{show_details.name} ({show_details.first_air_date[:4] if show_details.first_air_date else 'N/A'})",
-                description=show_details.overview[:300] + "..." if len(show_details.overview) > 300 else show_details.overview,
+                title=f"{show_details.get('name', query)} ({first_air_date[:4] if first_air_date else 'N/A'})",
+                description=overview[:300] + "..." if len(overview) > 300 else overview,
                 color=discord.Color.purple(),
-                url=f"https://www.themoviedb.org/tv/{show.id}"
+                url=f"https://www.themoviedb.org/tv/{show_id}"
             )
             
             # Add poster
-            if show_details.poster_path:
-                embed.set_thumbnail(url=f"https://image.tmdb.org/t/p/w500{show_details.poster_path}")
+            if show_details.get('poster_path'):
+                embed.set_thumbnail(url=f"https://image.tmdb.org/t/p/w500{show_details['poster_path']}")
             
             # Add fields
-            embed.add_field(name="⭐ Rating", value=f"{show_details.vote_average:.1f}/10", inline=True)
-            embed.add_field(name="📺 Seasons", value=str(show_details.number_of_seasons), inline=True)
-            embed.add_field(name="🎬 Episodes", value=str(show_details.number_of_episodes), inline=True)
+            embed.add_field(name="⭐ Rating", value=f"{show_details.get('vote_average') or 0:.1f}/10", inline=True)
+            embed.add_field(name="📺 Seasons", value=str(show_details.get('number_of_seasons', 'N/A')), inline=True)
+            embed.add_field(name="🎬 Episodes", value=str(show_details.get('number_of_episodes', 'N/A')), inline=True)
             
             # Get genres safely
             genres_text = "N/A"
-            if hasattr(show_details, 'genres') and show_details.genres:
+            if show_details.get('genres'):
                 try:
-                    genres_list = list(show_details.genres)
+                    genres_list = list(show_details['genres'])
                     # Handle both dict and object formats
                     genre_names = []
                     for g in genres_list[:3]:
@@ -1247,7 +1501,7 @@ async def search_tv(ctx, *, query: str = None):
                 except Exception as e:
                     logger.warning(f"Error processing genres: {e}")
             embed.add_field(name="🎭 Genres", value=genres_text, inline=True)
-            embed.add_field(name="📅 Status", value=show_details.status, inline=True)
+            embed.add_field(name="📅 Status", value=show_details.get('status') or "N/A", inline=True)
             
             # Default to Season 1 Episode 1
             season = 1
@@ -1256,7 +1510,7 @@ async def search_tv(ctx, *, query: str = None):
             # Create buttons for streaming providers
             view = discord.ui.View()
             for provider_key, provider_name in STREAMING_PROVIDERS.items():
-                stream_url = get_streaming_url('tv', str(show.id), imdb_id, provider_key, season, episode)
+                stream_url = get_streaming_url('tv', str(show_id), imdb_id, provider_key, season, episode)
                 if stream_url:
                     view.add_item(discord.ui.Button(
                         label=f"▶️ {provider_name}",
@@ -1264,8 +1518,8 @@ async def search_tv(ctx, *, query: str = None):
                         style=discord.ButtonStyle.link
                     ))
             
-            embed.set_footer(text=f"TMDB ID: {show.id} | IMDb ID: {imdb_id if imdb_id else 'N/A'} | S{season}E{episode}")
-            embed.add_field(name="💡 Tip", value=f"Use `!tvepisode {show.id} <season> <episode>` for specific episodes", inline=False)
+            embed.set_footer(text=f"TMDB ID: {show_id} | IMDb ID: {imdb_id if imdb_id else 'N/A'} | S{season}E{episode}")
+            embed.add_field(name="💡 Tip", value=f"Use `!tvepisode {show_id} <season> <episode>` for specific episodes", inline=False)
             
             await ctx.reply(embed=embed, view=view)
             
@@ -1273,6 +1527,10 @@ async def search_tv(ctx, *, query: str = None):
             logger.error(f"TV search error: {str(e)}")
             await ctx.reply(f"❌ Error searching TV show: {str(e)}")
 
+@search_tv.autocomplete('query')
+async def search_tv_autocomplete(interaction: discord.Interaction, current: str):
+    return await title_autocomplete('tv', current)
+
 @bot.command(name='tvepisode', aliases=['episode', 'ep'])
 async def tv_episode(ctx, tmdb_id: str = None, season: int = 1, episode: int = 1):
     """Get streaming links for a specific TV episode"""
@@ -1282,19 +1540,22 @@ async def tv_episode(ctx, tmdb_id: str = None, season: int = 1, episode: int = 1
     
     async with ctx.typing():
         try:
-            show_details = tv_api.details(int(tmdb_id))
-            external_ids = tv_api.external_ids(int(tmdb_id))
-            imdb_id = external_ids.get('imdb_id', None)
+            show_details = await tmdb_client.details('tv', int(tmdb_id))
+            if not show_details:
+                await ctx.reply(f"❌ No TV show found with TMDB ID: {tmdb_id}")
+                return
+            imdb_id = (show_details.get('external_ids') or {}).get('imdb_id')
             
             # Create embed
+            overview = show_details.get('overview') or ""
             embed = discord.Embed(
-                title=f"{show_details.name} - S{season}E{episode}",
-                description=show_details.overview[:200] + "..." if len(show_details.overview) > 200 else show_details.overview,
+                title=f"{show_details.get('name', tmdb_id)} - S{season}E{episode}",
+                description=overview[:200] + "..." if len(overview) > 200 else overview,
                 color=discord.Color.purple()
             )
             
-            if show_details.poster_path:
-                embed.set_thumbnail(url=f"https://image.tmdb.org/t/p/w500{show_details.poster_path}")
+            if show_details.get('poster_path'):
+                embed.set_thumbnail(url=f"https://image.tmdb.org/t/p/w500{show_details['poster_path']}")
             
             # Create buttons
             view = discord.ui.View()
@@ -1323,6 +1584,9 @@ if __name__ == "__main__":
         logger.error("DISCORD_BOT_TOKEN environment variable not set!")
         exit(1)
     
+    # Fork the CPU worker processes before any other threads exist
+    cpu_pool.start()
+    
     # Start Flask server for health checks
     start_flask()
     
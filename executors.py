@@ -0,0 +1,144 @@
+"""
+Named, size-limited executor pools with per-pool metrics.
+
+Blocking work is split by type instead of sharing asyncio's default pool:
+- `io_pool` (threads) for provider calls, downloads and other network I/O,
+- `cpu_pool` (processes) for Pillow recompression and pydub transcoding, so
+  CPU-heavy work never holds the GIL the event loop needs.
+Each pool reports in-flight and queued tasks plus wait/run time percentiles.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+IO_POOL_WORKERS = int(os.getenv('IO_POOL_WORKERS', 32))
+CPU_POOL_WORKERS = int(os.getenv('CPU_POOL_WORKERS', min(4, os.cpu_count() or 1)))
+# Recent tasks kept for the wait/run time percentiles
+_SAMPLES = 256
+
+
+def _timed(fn, args, kwargs):
+    """Run fn in the worker and report wall-clock start/end (comparable across processes)."""
+    started = time.time()
+    try:
+        result = fn(*args, **kwargs)
+    except Exception as e:
+        return started, time.time(), None, e
+    return started, time.time(), result, None
+
+
+def _percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 1)
+
+
+class InstrumentedExecutor:
+    """A thread or process pool that records queue depth, wait time and run time."""
+
+    def __init__(self, name, kind, max_workers):
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.errors = 0
+        self._waits = deque(maxlen=_SAMPLES)
+        self._runs = deque(maxlen=_SAMPLES)
+
+    def _create(self):
+        if self.kind == 'process':
+            # fork: workers only need the already-imported task modules, and
+            # spawn would re-run the bot's __main__ in every worker
+            method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+            return ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context(method))
+        return ThreadPoolExecutor(self.max_workers, thread_name_prefix=self.name)
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create()
+            return self._executor
+
+    def start(self):
+        """Start the workers now (for process pools: before the bot starts other threads)."""
+        if self.kind == 'process':
+            self.executor.submit(time.time).result()
+        else:
+            self.executor
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) in the pool and return its result."""
+        loop = asyncio.get_running_loop()
+        submitted = time.time()
+        executor = self.executor
+        self.in_flight += 1
+        try:
+            started, finished, result, error = await loop.run_in_executor(executor, _timed, fn, args, kwargs)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM): shut the broken pool down and let the next
+            # task create a new one. That new pool is forked from a process that by
+            # now runs other threads, so a child can inherit a lock some thread held
+            # mid-fork; the workers only run self-contained Pillow/pydub functions,
+            # which is why fork is still used rather than re-importing the bot.
+            with self._lock:
+                broken = self._executor is executor
+                if broken:
+                    self._executor = None
+            if broken:
+                logger.error(f"Executor pool '{self.name}' broke, restarting it")
+                executor.shutdown(wait=False, cancel_futures=True)
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        self._waits.append(max(0.0, started - submitted))
+        self._runs.append(finished - started)
+        if error is not None:
+            self.errors += 1
+            raise error
+        self.completed += 1
+        return result
+
+    def stats(self):
+        waits, runs = list(self._waits), list(self._runs)
+        return {
+            'name': self.name,
+            'kind': self.kind,
+            'max_workers': self.max_workers,
+            'in_flight': self.in_flight,
+            'queue_depth': max(0, self.in_flight - self.max_workers),
+            'completed': self.completed,
+            'errors': self.errors,
+            'wait_p50_ms': _percentile(waits, 0.5),
+            'wait_p95_ms': _percentile(waits, 0.95),
+            'run_p50_ms': _percentile(runs, 0.5),
+            'run_p95_ms': _percentile(runs, 0.95),
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+io_pool = InstrumentedExecutor('io', 'thread', IO_POOL_WORKERS)
+cpu_pool = InstrumentedExecutor('cpu', 'process', CPU_POOL_WORKERS)
+
+
+def pool_stats():
+    return [io_pool.stats(), cpu_pool.stats()]
@@ -0,0 +1,272 @@
+"""
+Hedged (raced) chat completions across several g4f providers.
+
+Free providers have very spread-out latency, so instead of waiting on one we
+send the same request to the top few providers, either all at once or one more
+every `delay` seconds, return the first valid answer and cancel the rest.
+Shared by app.py, asgi_app.py and discord_bot.py. Candidates come from the
+provider scoreboard ranking, and every attempt's outcome is recorded there.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import time
+
+from provider_health import scoreboard, iter_candidates
+
+logger = logging.getLogger(__name__)
+
+# How many providers to race, and seconds to wait before launching each extra one (0 = all at once)
+HEDGE_FANOUT = int(os.getenv('HEDGE_FANOUT', 3))
+HEDGE_DELAY = float(os.getenv('HEDGE_DELAY', 0.5))
+
+
+def hedge_candidates(model, fanout=None):
+    """Iterate up to `fanout` healthy (name, provider class) pairs, fastest first.
+
+    Lazy on purpose: a half-open provider's probe slot is claimed only when
+    the race actually launches it, not for backups that are never needed.
+    """
+    return iter_candidates(model, HEDGE_FANOUT if fanout is None else fanout)
+
+
+def _has_text(result):
+    return isinstance(result, str) and bool(result.strip())
+
+
+async def race_async(attempts, delay=0.0, is_valid=_has_text):
+    """Race coroutine attempts and return (name, result) of the first valid one.
+
+    `attempts` is an iterable of (name, zero-arg coroutine function) in
+    preference order, pulled one at a time as attempts launch. The first is
+    started immediately, the next one every `delay` seconds (or straight away
+    when an attempt fails). Losers are cancelled.
+    """
+    queue = iter(attempts)
+    more = True
+    pending = {}
+    last_error = None
+
+    def launch():
+        nonlocal more
+        for name, fn in queue:
+            pending[asyncio.ensure_future(fn())] = name
+            return
+        more = False
+
+    try:
+        while more or pending:
+            if more and (not pending or delay <= 0):
+                launch()
+                continue
+            done, _ = await asyncio.wait(
+                pending, timeout=delay if more else None, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                # Hedge delay elapsed with nothing back yet: add another provider
+                launch()
+                continue
+            for task in done:
+                name = pending.pop(task)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    logger.warning(f"Hedged attempt {name} failed: {e}")
+                    last_error = e
+                    continue
+                if is_valid(result):
+                    return name, result
+                last_error = ValueError(f"{name} returned an empty response")
+            if more:
+                # A failure frees a slot, so try the next provider right away
+                launch()
+        raise last_error or RuntimeError("No providers available to hedge")
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def race_sync(attempts, executor, delay=0.0, is_valid=_has_text):
+    """Thread-pool version of race_async for sync (Flask) callers.
+
+    Attempts are plain callables run on `executor`. Losers that have not started
+    are cancelled; ones already running can't be interrupted, so their results
+    are simply discarded.
+    """
+    queue = iter(attempts)
+    more = True
+    pending = {}
+    last_error = None
+
+    def launch():
+        nonlocal more
+        for name, fn in queue:
+            pending[executor.submit(fn)] = name
+            return
+        more = False
+
+    try:
+        while more or pending:
+            if more and (not pending or delay <= 0):
+                launch()
+                continue
+            done, _ = concurrent.futures.wait(
+                pending, timeout=delay if more else None, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            if not done:
+                launch()
+                continue
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.warning(f"Hedged attempt {name} failed: {e}")
+                    last_error = e
+                    continue
+                if is_valid(result):
+                    return name, result
+                last_error = ValueError(f"{name} returned an empty response")
+            if more:
+                launch()
+        raise last_error or RuntimeError("No providers available to hedge")
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def hedged_chat_sync(client, messages, model, extract, executor, fanout=None, delay=None):
+    """Hedge a non-streaming chat completion with the sync g4f Client.
+
+    Returns (provider_name, text).
+    """
+    delay = HEDGE_DELAY if delay is None else delay
+
+    def attempt(name, provider):
+        def run():
+            started = time.perf_counter()
+            try:
+                text = extract(client.chat.completions.create(model=model, messages=messages, provider=provider))
+            except Exception:
+                scoreboard.record(name, model, False, time.perf_counter() - started)
+                raise
+            scoreboard.record(name, model, _has_text(text), time.perf_counter() - started)
+            return text
+        return run
+
+    attempts = ((name, attempt(name, provider)) for name, provider in hedge_candidates(model, fanout))
+    return race_sync(attempts, executor, delay)
+
+
+async def hedged_chat_async(client, messages, model, extract, fanout=None, delay=None):
+    """Hedge a non-streaming chat completion with g4f's AsyncClient.
+
+    Returns (provider_name, text).
+    """
+    delay = HEDGE_DELAY if delay is None else delay
+
+    def attempt(name, provider):
+        async def run():
+            started = time.perf_counter()
+            try:
+                text = extract(await client.chat.completions.create(model=model, messages=messages, provider=provider))
+            except asyncio.CancelledError:
+                # Lost the race; says nothing about the provider's health
+                raise
+            except Exception:
+                scoreboard.record(name, model, False, time.perf_counter() - started)
+                raise
+            scoreboard.record(name, model, _has_text(text), time.perf_counter() - started)
+            return text
+        return run
+
+    attempts = ((name, attempt(name, provider)) for name, provider in hedge_candidates(model, fanout))
+    return await race_async(attempts, delay)
+
+
+def hedged_stream_sync(client, messages, model, extract, executor, fanout=None, delay=None):
+    """Sync (Flask) version of hedged_stream_async.
+
+    Streams are opened on `executor` and read up to their first text delta;
+    the rest of the winning stream is relayed on the caller's thread. Returns
+    (provider_name, iterator of text deltas), with the winning first delta included.
+    """
+    delay = HEDGE_DELAY if delay is None else delay
+
+    def attempt(name, provider):
+        def open_stream():
+            started = time.perf_counter()
+            try:
+                stream = iter(client.chat.completions.create(model=model, messages=messages, provider=provider, stream=True))
+                for chunk in stream:
+                    text = extract(chunk)
+                    if text:
+                        return started, stream, text
+                raise ValueError("stream ended without any text")
+            except Exception:
+                scoreboard.record(name, model, False, time.perf_counter() - started)
+                raise
+        return open_stream
+
+    attempts = ((name, attempt(name, provider)) for name, provider in hedge_candidates(model, fanout))
+    name, (started, stream, first) = race_sync(attempts, executor, delay, is_valid=lambda result: True)
+
+    def relay():
+        ok = False
+        try:
+            yield first
+            for chunk in stream:
+                text = extract(chunk)
+                if text:
+                    yield text
+            ok = True
+        finally:
+            scoreboard.record(name, model, ok, time.perf_counter() - started)
+
+    return name, relay()
+
+
+async def hedged_stream_async(client, messages, model, extract, fanout=None, delay=None):
+    """Hedge a streaming chat completion on time-to-first-token.
+
+    Each provider's stream is opened and the first one to produce text wins; the
+    other streams are cancelled. Returns (provider_name, async iterator of text
+    deltas), with the winning first delta included.
+    """
+    delay = HEDGE_DELAY if delay is None else delay
+
+    def attempt(name, provider):
+        async def open_stream():
+            started = time.perf_counter()
+            try:
+                stream = client.chat.completions.create(model=model, messages=messages, provider=provider, stream=True)
+                async for chunk in stream:
+                    text = extract(chunk)
+                    if text:
+                        return started, stream, text
+                raise ValueError("stream ended without any text")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                scoreboard.record(name, model, False, time.perf_counter() - started)
+                raise
+        return open_stream
+
+    attempts = ((name, attempt(name, provider)) for name, provider in hedge_candidates(model, fanout))
+    name, (started, stream, first) = await race_async(attempts, delay, is_valid=lambda result: True)
+
+    async def relay():
+        ok = False
+        try:
+            yield first
+            async for chunk in stream:
+                text = extract(chunk)
+                if text:
+                    yield text
+            ok = True
+        finally:
+            scoreboard.record(name, model, ok, time.perf_counter() - started)
+
+    return name, relay()
@@ -0,0 +1,129 @@
+"""
+BM25 retrieval over each user's full conversation history.
+
+Every stored turn (including ones already folded into a summary) is indexed
+per user in an in-memory inverted index that is updated incrementally as
+turns are appended. When a new prompt arrives, the few past turns most
+relevant to it are recalled and sent alongside the recent turns, so old facts
+survive without sending long transcripts. Indexes are built lazily from
+history_store on first use and kept for a bounded number of recently active
+users.
+"""
+
+import heapq
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+HISTORY_INDEX_USERS = int(os.getenv('HISTORY_INDEX_USERS', 128))
+RECALL_TOP_K = int(os.getenv('RECALL_TOP_K', 4))
+# Newest turns still sent verbatim alongside the recalled ones
+RECALL_RECENT_TURNS = int(os.getenv('RECALL_RECENT_TURNS', 6))
+# Ignore weak matches so unrelated turns are not pulled into the prompt
+RECALL_MIN_SCORE = float(os.getenv('RECALL_MIN_SCORE', 2.0))
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN = re.compile(r'\w+')
+_STOPWORDS = frozenset("""
+a an and are as at be but by can do for from has have he her his how i if in is it its
+me my no not of on or our she so than that the their them then there they this to us
+was we were what when where which who why will with you your
+""".split())
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.casefold()) if t not in _STOPWORDS and len(t) > 1]
+
+
+class BM25Index:
+    """Incremental BM25 inverted index over documents keyed by integer ID."""
+
+    def __init__(self):
+        self._postings = {}  # term -> {doc_id: term frequency}
+        self._lengths = {}  # doc_id -> document length in tokens
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def add(self, doc_id, text):
+        terms = Counter(tokenize(text))
+        if not terms or doc_id in self._lengths:
+            return
+        length = sum(terms.values())
+        self._lengths[doc_id] = length
+        self._total_length += length
+        for term, tf in terms.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = {}
+            posting[doc_id] = tf
+
+    def search(self, query, k=RECALL_TOP_K, before=None, min_score=0.0):
+        """Return up to k (doc_id, score) pairs, best first; `before` excludes doc_id >= before."""
+        count = len(self._lengths)
+        if not count:
+            return []
+        avg_length = self._total_length / count
+        scores = {}
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf in posting.items():
+                if before is not None and doc_id >= before:
+                    continue
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(doc_id, score) for doc_id, score in best if score >= min_score]
+
+
+class HistoryRetriever:
+    """Per-user BM25 indexes over a HistoryStore, kept in sync through its listener hook."""
+
+    def __init__(self, store, max_users=HISTORY_INDEX_USERS):
+        self.store = store
+        self.max_users = max_users
+        self._indexes = OrderedDict()  # user_id -> BM25Index, least recently used first
+        self._lock = threading.Lock()
+        store.listeners.append(self)
+
+    def _index(self, user_id):
+        index = self._indexes.get(user_id)
+        if index is not None:
+            self._indexes.move_to_end(user_id)
+            return index
+        index = BM25Index()
+        for turn in self.store.iter_turns(user_id):
+            if turn.role != 'system':
+                index.add(turn.seq, turn.text)
+        self._indexes[user_id] = index
+        while len(self._indexes) > self.max_users:
+            self._indexes.popitem(last=False)
+        return index
+
+    def turn_added(self, user_id, turn):
+        """Store listener: index a new turn if this user's index is loaded."""
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None and turn.role != 'system':
+                index.add(turn.seq, turn.text)
+
+    def history_cleared(self, user_id):
+        with self._lock:
+            self._indexes.pop(user_id, None)
+
+    def recall(self, user_id, query, before_seq, k=RECALL_TOP_K):
+        """Return the stored turns (older than `before_seq`) most relevant to `query`, best first."""
+        with self._lock:
+            hits = self._index(user_id).search(query, k=k, before=before_seq, min_score=RECALL_MIN_SCORE)
+        if not hits:
+            return []
+        turns = {turn.seq: turn for turn in self.store.fetch(user_id, [seq for seq, _ in hits])}
+        return [turns[seq] for seq, _ in hits if seq in turns]
@@ -0,0 +1,316 @@
+"""
+Bounded, tiered conversation-history store for the Discord bot.
+
+Every turn is written through to SQLite (zlib-compressed JSON bodies, WAL
+mode), so history survives restarts and costs no RAM for idle users. The most
+recent turns of active users are kept in a hot in-memory tier of compact
+records, bounded by a byte budget and evicted least-recently-used first (and
+after an idle timeout). An evicted conversation is rehydrated lazily from
+disk the next time that user talks to the bot.
+
+Long conversations can be compacted: the oldest turns are replaced by one
+system summary turn. Compacted turns stay on disk but are no longer loaded.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from context_window import IMAGE_TOKENS, MESSAGE_OVERHEAD_TOKENS, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DB_PATH = os.getenv('HISTORY_DB_PATH', os.path.join('.cache', 'history.sqlite3'))
+HISTORY_MAX_MB = float(os.getenv('HISTORY_MAX_MB', 64))
+# Turns per user kept in memory; older turns stay on disk only
+HISTORY_HOT_TURNS = int(os.getenv('HISTORY_HOT_TURNS', 50))
+HISTORY_IDLE_SECONDS = float(os.getenv('HISTORY_IDLE_SECONDS', 1800))
+# Fixed per-record / per-conversation bookkeeping cost added to string sizes
+_RECORD_OVERHEAD = 120
+_CONVERSATION_OVERHEAD = 400
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    user_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    body BLOB NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (user_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS summaries (
+    user_id TEXT PRIMARY KEY,
+    upto_seq INTEGER NOT NULL,
+    body BLOB NOT NULL,
+    created REAL NOT NULL
+);
+-- Where a cleared user's numbering resumes, so seqs never repeat after !clear
+CREATE TABLE IF NOT EXISTS seq_floor (
+    user_id TEXT PRIMARY KEY,
+    next_seq INTEGER NOT NULL
+);
+"""
+
+
+class Turn:
+    """One compact message record: role, text, an optional image URL and its token estimate."""
+
+    __slots__ = ('seq', 'role', 'text', 'image_url', 'created', 'tokens')
+
+    def __init__(self, seq, role, text, image_url=None, created=None):
+        self.seq = seq
+        self.role = sys.intern(role)
+        self.text = text
+        self.image_url = image_url
+        self.created = time.time() if created is None else created
+        self.tokens = estimate_tokens(text) + MESSAGE_OVERHEAD_TOKENS + (IMAGE_TOKENS if image_url else 0)
+
+    @classmethod
+    def from_content(cls, seq, role, content, created=None):
+        """Build a record from a g4f message 'content' (a string or a vision parts list)."""
+        if isinstance(content, list):
+            text = ' '.join(p.get('text', '') for p in content if p.get('type') == 'text')
+            image_url = next(
+                (p['image_url']['url'] for p in content if p.get('type') == 'image_url'),
+                None
+            )
+            return cls(seq, role, text, image_url, created)
+        return cls(seq, role, content or '', None, created)
+
+    @property
+    def size(self):
+        size = _RECORD_OVERHEAD + sys.getsizeof(self.text)
+        if self.image_url:
+            size += sys.getsizeof(self.image_url)
+        return size
+
+    def content(self):
+        if self.image_url:
+            return [
+                {"type": "text", "text": self.text},
+                {"type": "image_url", "image_url": {"url": self.image_url}}
+            ]
+        return self.text
+
+    def as_message(self):
+        return {"role": self.role, "content": self.content()}
+
+
+def _pack(turn):
+    body = {'t': turn.text}
+    if turn.image_url:
+        body['i'] = turn.image_url
+    return zlib.compress(json.dumps(body, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def _unpack(seq, role, blob, created):
+    body = json.loads(zlib.decompress(blob))
+    return Turn(seq, role, body.get('t', ''), body.get('i'), created)
+
+
+class _Conversation:
+    __slots__ = ('summary', 'turns', 'bytes', 'next_seq', 'last_used')
+
+    def __init__(self, summary, turns, next_seq):
+        self.summary = summary
+        self.turns = turns
+        self.bytes = _CONVERSATION_OVERHEAD + sum(t.size for t in turns) + (summary.size if summary else 0)
+        self.next_seq = next_seq
+        self.last_used = time.monotonic()
+
+
+class HistoryStore:
+    """Hot LRU tier of recent turns over a write-through SQLite tier."""
+
+    def __init__(self, path=HISTORY_DB_PATH, max_bytes=int(HISTORY_MAX_MB * 1024 * 1024),
+                 hot_turns=HISTORY_HOT_TURNS, idle_seconds=HISTORY_IDLE_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hot_turns = hot_turns
+        self.idle_seconds = idle_seconds
+        self._hot = OrderedDict()  # user_id -> _Conversation, least recently used first
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.rehydrations = 0
+        self.evictions = 0
+        # Objects with turn_added(user_id, turn) / history_cleared(user_id), e.g. history_index
+        self.listeners = []
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+        logger.info(f"History store: {path}")
+
+    def _load(self, user_id):
+        """Return the hot conversation for a user, rehydrating it from disk on a miss."""
+        conversation = self._hot.get(user_id)
+        if conversation is not None:
+            self._hot.move_to_end(user_id)
+            self.hits += 1
+        else:
+            summary = None
+            row = self._db.execute(
+                'SELECT upto_seq, body, created FROM summaries WHERE user_id = ?', (user_id,)
+            ).fetchone()
+            if row is not None:
+                summary = _unpack(row[0], 'system', row[1], row[2])
+            rows = self._db.execute(
+                'SELECT seq, role, body, created FROM turns WHERE user_id = ? AND seq > ? ORDER BY seq DESC LIMIT ?',
+                (user_id, summary.seq if summary else -1, self.hot_turns)
+            ).fetchall()
+            turns = [_unpack(*row) for row in reversed(rows)]
+            last_seq = self._db.execute('SELECT MAX(seq) FROM turns WHERE user_id = ?', (user_id,)).fetchone()[0]
+            floor = self._db.execute('SELECT next_seq FROM seq_floor WHERE user_id = ?', (user_id,)).fetchone()
+            next_seq = max(0 if last_seq is None else last_seq + 1, floor[0] if floor else 0)
+            conversation = _Conversation(summary, turns, next_seq)
+            self._hot[user_id] = conversation
+            self._bytes += conversation.bytes
+            self.rehydrations += 1
+        conversation.last_used = time.monotonic()
+        return conversation
+
+    def _evict(self, keep=None):
+        idle_before = time.monotonic() - self.idle_seconds
+        while self._hot:
+            user_id, conversation = next(iter(self._hot.items()))
+            if user_id == keep:
+                break
+            if self._bytes <= self.max_bytes and conversation.last_used >= idle_before:
+                break
+            del self._hot[user_id]
+            self._bytes -= conversation.bytes
+            self.evictions += 1
+
+    def append(self, user_id, role, content):
+        """Record one message (string or vision parts list) and return its Turn."""
+        with self._lock:
+            conversation = self._load(user_id)
+            turn = Turn.from_content(conversation.next_seq, role, content)
+            self._db.execute(
+                'INSERT OR REPLACE INTO turns (user_id, seq, role, body, created) VALUES (?, ?, ?, ?, ?)',
+                (user_id, turn.seq, turn.role, _pack(turn), turn.created)
+            )
+            conversation.next_seq += 1
+            conversation.turns.append(turn)
+            conversation.bytes += turn.size
+            self._bytes += turn.size
+            if len(conversation.turns) > self.hot_turns:
+                dropped = conversation.turns[:-self.hot_turns]
+                del conversation.turns[:-self.hot_turns]
+                freed = sum(t.size for t in dropped)
+                conversation.bytes -= freed
+                self._bytes -= freed
+            self._evict(keep=user_id)
+        for listener in self.listeners:
+            listener.turn_added(user_id, turn)
+        return turn
+
+    def turns(self, user_id, limit=None):
+        """Return the user's summary turn (if any) and most recent hot turns, oldest first."""
+        with self._lock:
+            conversation = self._load(user_id)
+            turns = conversation.turns[-limit:] if limit else list(conversation.turns)
+            summary = conversation.summary
+            self._evict(keep=user_id)
+        return [summary] + turns if summary else turns
+
+    def iter_turns(self, user_id):
+        """Yield every stored turn for a user from disk, oldest first (including compacted ones)."""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT seq, role, body, created FROM turns WHERE user_id = ? ORDER BY seq', (user_id,)
+            ).fetchall()
+        for row in rows:
+            yield _unpack(*row)
+
+    def fetch(self, user_id, seqs):
+        """Return the stored turns with the given sequence numbers, oldest first."""
+        seqs = list(seqs)
+        if not seqs:
+            return []
+        placeholders = ','.join('?' * len(seqs))
+        with self._lock:
+            rows = self._db.execute(
+                f'SELECT seq, role, body, created FROM turns WHERE user_id = ? AND seq IN ({placeholders}) ORDER BY seq',
+                (user_id, *seqs)
+            ).fetchall()
+        return [_unpack(*row) for row in rows]
+
+    def compact(self, user_id, upto_seq, summary_text):
+        """Replace every turn up to and including `upto_seq` with one system summary turn.
+
+        Returns False if the turns are gone (history cleared meanwhile) or
+        already covered by a newer summary.
+        """
+        with self._lock:
+            if self._db.execute(
+                'SELECT 1 FROM turns WHERE user_id = ? AND seq = ?', (user_id, upto_seq)
+            ).fetchone() is None:
+                return False
+            conversation = self._load(user_id)
+            if conversation.summary and conversation.summary.seq >= upto_seq:
+                return False
+            summary = Turn(upto_seq, 'system', summary_text)
+            self._db.execute(
+                'INSERT OR REPLACE INTO summaries (user_id, upto_seq, body, created) VALUES (?, ?, ?, ?)',
+                (user_id, upto_seq, _pack(summary), summary.created)
+            )
+            dropped = [t for t in conversation.turns if t.seq <= upto_seq]
+            conversation.turns = [t for t in conversation.turns if t.seq > upto_seq]
+            freed = sum(t.size for t in dropped) + (conversation.summary.size if conversation.summary else 0)
+            conversation.summary = summary
+            conversation.bytes += summary.size - freed
+            self._bytes += summary.size - freed
+            self._evict(keep=user_id)
+            return True
+
+    def messages(self, user_id, limit=None):
+        """Return the most recent turns as g4f message dicts."""
+        return [turn.as_message() for turn in self.turns(user_id, limit)]
+
+    def clear(self, user_id):
+        """Delete a user's history from both tiers; return how many turns were removed.
+
+        Sequence numbers keep counting up afterwards, so a compaction of the
+        old history that finishes later can never match a turn of the new one.
+        """
+        with self._lock:
+            next_seq = self._load(user_id).next_seq
+            conversation = self._hot.pop(user_id, None)
+            if conversation is not None:
+                self._bytes -= conversation.bytes
+            self._db.execute('INSERT OR REPLACE INTO seq_floor (user_id, next_seq) VALUES (?, ?)', (user_id, next_seq))
+            self._db.execute('DELETE FROM summaries WHERE user_id = ?', (user_id,))
+            removed = self._db.execute('DELETE FROM turns WHERE user_id = ?', (user_id,)).rowcount
+        for listener in self.listeners:
+            listener.history_cleared(user_id)
+        return removed
+
+    def stats(self):
+        with self._lock:
+            users, turns = self._db.execute('SELECT COUNT(DISTINCT user_id), COUNT(*) FROM turns').fetchone()
+            summaries = self._db.execute('SELECT COUNT(*) FROM summaries').fetchone()[0]
+            return {
+                'hot_users': len(self._hot),
+                'hot_bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'stored_users': users,
+                'stored_turns': turns,
+                'summaries': summaries,
+                'hits': self.hits,
+                'rehydrations': self.rehydrations,
+                'evictions': self.evictions,
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,181 @@
+"""
+Shared async HTTP client for every outbound call the bot makes.
+
+One aiohttp session per process (created lazily on the running loop) gives
+connection pooling with keep-alive, cached DNS lookups, a per-host connection
+cap so one slow service cannot take the whole pool, and the same timeouts
+everywhere. Image downloads, Pollinations generation, TMDB lookups and the
+keep-alive ping all reuse it instead of opening a fresh TCP/TLS connection
+per request. `download` streams a body into one buffer under a byte cap, so an
+oversized or malicious response is dropped after at most the cap.
+"""
+
+import asyncio
+import io
+import os
+
+import aiohttp
+
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 100))
+HTTP_PER_HOST_LIMIT = int(os.getenv('HTTP_PER_HOST_LIMIT', 20))
+HTTP_DNS_TTL = int(os.getenv('HTTP_DNS_TTL', 300))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 10))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 30))
+HTTP_USER_AGENT = os.getenv('HTTP_USER_AGENT', 'g4f-discord-bot')
+_CHUNK = 64 * 1024
+# Bytes of a body handed to `download`'s `accept` check
+_HEAD = 16
+
+
+class HTTPError(Exception):
+    """Raised for non-2xx responses."""
+
+    def __init__(self, status, url):
+        super().__init__(f"HTTP {status} from {url}")
+        self.status = status
+        self.url = url
+
+
+class DownloadTooLarge(Exception):
+    """Raised when a body is (or announces itself as) larger than the download cap."""
+
+    def __init__(self, url, max_bytes):
+        super().__init__(f"Response from {url} exceeds {max_bytes} bytes")
+        self.url = url
+        self.max_bytes = max_bytes
+
+
+class HTTPClient:
+    """A lazily created, pooled aiohttp session with shared limits and timeouts."""
+
+    def __init__(self, limit=HTTP_POOL_SIZE, limit_per_host=HTTP_PER_HOST_LIMIT, dns_ttl=HTTP_DNS_TTL,
+                 connect_timeout=HTTP_CONNECT_TIMEOUT, timeout=HTTP_TIMEOUT):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self._session = None
+        self._loop = None
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.downloading_bytes = 0
+        self.peak_download_bytes = 0
+
+    @property
+    def session(self):
+        """The shared session (recreated if closed or first used from another loop)."""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._retire()
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                               ttl_dns_cache=self.dns_ttl),
+                timeout=aiohttp.ClientTimeout(total=self.timeout, sock_connect=self.connect_timeout),
+                headers={'User-Agent': HTTP_USER_AGENT},
+            )
+            self._loop = loop
+        return self._session
+
+    def _retire(self):
+        """Let go of a session left over from another loop, closing it there if that loop still runs."""
+        session, loop = self._session, self._loop
+        self._session = None
+        if session is None or session.closed:
+            return
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+        # Otherwise its loop is gone and the close can't be awaited anywhere; the session
+        # is dropped and its sockets are released when it is garbage collected
+
+    def _timeout(self, timeout):
+        if timeout is None:
+            return None
+        return aiohttp.ClientTimeout(total=timeout, sock_connect=min(timeout, self.connect_timeout))
+
+    def request(self, method, url, timeout=None, **kwargs):
+        """Return the session's request context manager (for callers that need the response)."""
+        self.requests += 1
+        if timeout is not None:
+            kwargs['timeout'] = self._timeout(timeout)
+        return self.session.request(method, url, **kwargs)
+
+    async def get_bytes(self, url, timeout=None, **kwargs):
+        """GET url and return the body; raises HTTPError on a non-2xx status."""
+        try:
+            async with self.request('GET', url, timeout=timeout, **kwargs) as resp:
+                if resp.status >= 400:
+                    raise HTTPError(resp.status, url)
+                return await resp.read()
+        except Exception:
+            self.errors += 1
+            raise
+
+    async def get_json(self, url, timeout=None, **kwargs):
+        """GET url and decode JSON; returns None for a 404."""
+        try:
+            async with self.request('GET', url, timeout=timeout, **kwargs) as resp:
+                if resp.status == 404:
+                    return None
+                if resp.status >= 400:
+                    raise HTTPError(resp.status, url)
+                return await resp.json()
+        except Exception:
+            self.errors += 1
+            raise
+
+    async def download(self, url, max_bytes, timeout=None, accept=None, **kwargs):
+        """Stream url into a single buffer and return its bytes, never holding more than max_bytes.
+
+        Raises DownloadTooLarge as soon as the announced or received size passes
+        the cap. `accept` is an optional check on the first bytes (e.g.
+        imaging.sniff_format); if it returns a falsy value the download stops
+        early and None is returned.
+        """
+        buffer = io.BytesIO()
+        try:
+            async with self.request('GET', url, timeout=timeout, **kwargs) as resp:
+                if resp.status >= 400:
+                    raise HTTPError(resp.status, url)
+                if resp.content_length is not None and resp.content_length > max_bytes:
+                    raise DownloadTooLarge(url, max_bytes)
+                head = b''
+                async for chunk in resp.content.iter_chunked(_CHUNK):
+                    if buffer.tell() + len(chunk) > max_bytes:
+                        raise DownloadTooLarge(url, max_bytes)
+                    buffer.write(chunk)
+                    self.downloading_bytes += len(chunk)
+                    self.peak_download_bytes = max(self.peak_download_bytes, self.downloading_bytes)
+                    if accept is not None and len(head) < _HEAD:
+                        head += chunk[:_HEAD - len(head)]
+                        if len(head) >= _HEAD and not accept(head):
+                            self.rejected += 1
+                            return None
+                if accept is not None and len(head) < _HEAD and not accept(head):
+                    self.rejected += 1
+                    return None
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.downloading_bytes -= buffer.tell()
+        # getvalue() trims and hands over the buffer's own bytes object rather than copying it
+        return buffer.getvalue()
+
+    def stats(self):
+        open_connections = 0
+        if self._session is not None and not self._session.closed:
+            connector = self._session.connector
+            open_connections = sum(len(conns) for conns in getattr(connector, '_conns', {}).values())
+        return {'requests': self.requests, 'errors': self.errors, 'rejected': self.rejected,
+                'idle_connections': open_connections, 'limit': self.limit, 'limit_per_host': self.limit_per_host,
+                'downloading_bytes': self.downloading_bytes, 'peak_download_bytes': self.peak_download_bytes}
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+http = HTTPClient()
@@ -0,0 +1,113 @@
+"""
+Concurrent image generation across the bot's backends.
+
+A single image races every backend at once (Pollinations gen, Pollinations
+image, and g4f's images API) and takes the first response that is actually
+an image; the slower ones are cancelled. Worst case is one backend timeout
+instead of the sum of all of them. Variants are generated in parallel with
+distinct seeds. Downloads are streamed under IMAGE_MAX_DOWNLOAD_MB and
+dropped after the first bytes if they are not an image, so one generation
+buffers at most (variants x backends x cap) bytes.
+"""
+
+import asyncio
+import base64
+import logging
+import os
+from urllib.parse import quote_plus, urlencode
+
+from executors import io_pool
+from http_client import http
+from image_cache import IMAGE_MAX_VARIANTS, variant_seeds
+from imaging import sniff_format
+
+logger = logging.getLogger(__name__)
+
+IMAGE_BACKEND_TIMEOUT = float(os.getenv('IMAGE_BACKEND_TIMEOUT', 30))
+IMAGE_MAX_DOWNLOAD_BYTES = int(float(os.getenv('IMAGE_MAX_DOWNLOAD_MB', 25)) * 1024 * 1024)
+
+
+def pollinations_url(host, prompt, seed=None):
+    base = {
+        'gen': f"https://gen.pollinations.ai/image/{quote_plus(prompt)}",
+        'image': f"https://image.pollinations.ai/prompt/{quote_plus(prompt)}",
+    }[host]
+    return base if seed is None else f"{base}?{urlencode({'seed': seed})}"
+
+
+async def fetch_image(url):
+    """Stream url under the download cap, returning the bytes only if they are a recognised image."""
+    return await http.download(url, IMAGE_MAX_DOWNLOAD_BYTES, timeout=IMAGE_BACKEND_TIMEOUT, accept=sniff_format)
+
+
+async def g4f_image(client, prompt, model, seed=None):
+    """Generate through g4f's (blocking) images API, returning image bytes or None."""
+    kwargs = {'model': model, 'prompt': prompt}
+    if seed is not None:
+        kwargs['seed'] = seed
+    resp = await io_pool.run(client.images.generate, **kwargs)
+
+    # Parse response for URL/bytes
+    image_url = None
+    if hasattr(resp, 'data') and resp.data:
+        first_item = resp.data[0]
+        if getattr(first_item, 'url', None):
+            image_url = first_item.url
+        elif isinstance(first_item, str):
+            image_url = first_item
+        elif getattr(first_item, 'b64_json', None):
+            if len(first_item.b64_json) * 3 // 4 > IMAGE_MAX_DOWNLOAD_BYTES:
+                return None
+            return base64.b64decode(first_item.b64_json)
+    elif isinstance(resp, str):
+        image_url = resp
+    elif isinstance(resp, bytes):
+        return resp if len(resp) <= IMAGE_MAX_DOWNLOAD_BYTES else None
+    if image_url:
+        return await fetch_image(image_url)
+    return None
+
+
+async def race(backends, timeout=IMAGE_BACKEND_TIMEOUT):
+    """Run (name, coroutine) pairs concurrently; return (name, bytes) of the first image, or None."""
+    tasks = {asyncio.ensure_future(coro): name for name, coro in backends}
+    pending = set(tasks)
+    try:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=max(0.0, deadline - loop.time()),
+                                               return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                logger.warning(f"Image backends timed out: {', '.join(tasks[t] for t in pending)}")
+                return None
+            for task in done:
+                if task.cancelled():
+                    continue
+                if task.exception() is not None:
+                    logger.warning(f"Image backend {tasks[task]} failed: {task.exception()}")
+                elif task.result():
+                    return tasks[task], task.result()
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def generate_image(prompt, model, seed=None, g4f_client=None):
+    """Race all backends for one image; returns (backend_name, image_bytes) or None."""
+    backends = [
+        ('Pollinations-gen', fetch_image(pollinations_url('gen', prompt, seed))),
+        ('Pollinations-image', fetch_image(pollinations_url('image', prompt, seed))),
+    ]
+    if g4f_client is not None and hasattr(g4f_client, 'images'):
+        backends.append(('g4f_images', g4f_image(g4f_client, prompt, model, seed)))
+    return await race(backends)
+
+
+async def generate_variants(prompt, model, n=1, seed=None, g4f_client=None):
+    """Generate up to n variants in parallel; returns the successful (backend_name, bytes) pairs."""
+    n = max(1, min(n, IMAGE_MAX_VARIANTS))
+    results = await asyncio.gather(*[generate_image(prompt, model, s, g4f_client)
+                                     for s in variant_seeds(n, seed)])
+    return [result for result in results if result]
@@ -0,0 +1,163 @@
+"""
+Content-addressed on-disk store for generated images.
+
+Images are stored under a SHA-256 of (model, normalized prompt, seed) and hold
+the final, already-compressed bytes that get uploaded, so a hit skips both
+generation and compress_image. The disk tier is capped by total size with LRU
+eviction; an in-memory index (rebuilt from the directory on start) tracks sizes
+and recency so lookups never scan the disk. The variant seeds that go into
+those keys are chosen here too, for the bot and the HTTP APIs alike.
+"""
+
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', os.path.join('.cache', 'images'))
+IMAGE_CACHE_MAX_MB = float(os.getenv('IMAGE_CACHE_MAX_MB', 256))
+# Upper bound for variants per request (!imagine --n, the /image "n" field)
+IMAGE_MAX_VARIANTS = int(os.getenv('IMAGE_MAX_VARIANTS', 4))
+
+_WHITESPACE = re.compile(r'\s+')
+# Partial writes older than this are from a crashed writer and get deleted on start
+_STALE_TMP_SECONDS = 300
+
+
+def normalize_prompt(prompt):
+    return _WHITESPACE.sub(' ', prompt).strip().casefold()
+
+
+def image_key(model, prompt, seed=None):
+    """Stable key for one image request."""
+    identity = f"{model}\0{normalize_prompt(prompt)}\0{'' if seed is None else seed}"
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+def variant_seeds(n, seed=None):
+    """n distinct seeds; a single image keeps the backends' default (seed None)."""
+    if n <= 1:
+        return [seed]
+    base = random.randrange(1, 2 ** 31) if seed is None else seed
+    return [base + i for i in range(n)]
+
+
+class ImageStore:
+    """Size-capped, LRU-evicted directory of image blobs with an in-memory index."""
+
+    def __init__(self, root=IMAGE_CACHE_DIR, max_bytes=int(IMAGE_CACHE_MAX_MB * 1024 * 1024)):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._index = OrderedDict()  # key -> size, least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.enabled:
+            os.makedirs(root, exist_ok=True)
+            self._load_index()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def _load_index(self):
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if name.endswith('.tmp'):
+                    # Left behind by a write that died before its rename; young ones
+                    # may belong to another worker sharing the directory
+                    if time.time() - st.st_mtime > _STALE_TMP_SECONDS:
+                        try:
+                            os.unlink(path)
+                        except OSError:
+                            pass
+                    continue
+                entries.append((st.st_mtime, name, st.st_size))
+        # Oldest first so the most recently used end up at the back
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._bytes += size
+        self._evict()
+        logger.info(f"Image cache: {len(self._index)} images, {self._bytes / 1024 / 1024:.1f} MB in {self.root}")
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            try:
+                os.unlink(self._path(key))
+            except OSError:
+                pass
+
+    def get(self, key):
+        """Return cached bytes or None. Blocking file I/O; call off the event loop."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # Persist recency so the LRU order survives a restart
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                size = self._index.pop(key, None)
+                if size is not None:
+                    self._bytes -= size
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """Store bytes atomically and evict least recently used images to fit."""
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            old = self._index.pop(key, None)
+            if old is not None:
+                self._bytes -= old
+            self._index[key] = len(data)
+            self._bytes += len(data)
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'images': len(self._index),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,169 @@
+"""
+Image processing helpers that run in the CPU process pool (see executors.py).
+
+Functions here are module-level and take/return plain bytes so they can be
+sent to worker processes.
+"""
+
+import io
+import logging
+import os
+
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+# 'jpeg' or 'webp' for recompressed images (Discord displays both)
+IMAGE_OUTPUT_FORMAT = os.getenv('IMAGE_OUTPUT_FORMAT', 'jpeg').lower()
+
+# Quality levels searched, best first, and the typical encoded size at each
+# level relative to the first (medians over benchmarks/bench_compression.py)
+_QUALITY_LEVELS = (85, 80, 75, 70, 65, 60, 55, 50, 45, 40)
+_SIZE_AT_QUALITY = {
+    'jpeg': (1.0, 0.78, 0.63, 0.53, 0.45, 0.39, 0.35, 0.31, 0.28, 0.24),
+    'webp': (1.0, 0.81, 0.66, 0.61, 0.57, 0.50, 0.47, 0.42, 0.37, 0.33),
+}
+if IMAGE_OUTPUT_FORMAT not in _SIZE_AT_QUALITY:
+    logger.warning(f"IMAGE_OUTPUT_FORMAT={IMAGE_OUTPUT_FORMAT!r} is not one of {', '.join(_SIZE_AT_QUALITY)}; using jpeg")
+    IMAGE_OUTPUT_FORMAT = 'jpeg'
+# Quality used once the image has to be downscaled
+_SCALED_QUALITY = 75
+_MAX_ENCODES = 8
+
+# Leading bytes of the formats image backends return
+_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+
+
+def sniff_format(data):
+    """Return the image format from the first bytes ('jpeg', 'png', 'gif', 'webp') or None."""
+    if not data:
+        return None
+    for signature, name in _SIGNATURES:
+        if data.startswith(signature):
+            return name
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def file_extension(data):
+    """Upload filename extension for image bytes (jpg when the format is unknown)."""
+    fmt = sniff_format(data) or 'jpeg'
+    return 'jpg' if fmt == 'jpeg' else fmt
+
+
+def _flatten(img, fmt):
+    """Convert to a mode the output format can encode (JPEG has no alpha: paste on white)."""
+    if fmt == 'webp' and img.mode in ('RGB', 'RGBA'):
+        return img
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        img = img.convert('RGBA')
+        if fmt == 'webp':
+            return img
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[3])
+        return background
+    return img.convert('RGB') if img.mode != 'RGB' else img
+
+
+def _encode(img, fmt, quality):
+    output = io.BytesIO()
+    if fmt == 'webp':
+        # method 2: near method 4's size at under half the encode time
+        img.save(output, format='WEBP', quality=quality, method=2)
+    else:
+        img.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def _predict_quality(fmt, ratio):
+    """Index of the highest quality level expected to fit when the size must shrink by `ratio`."""
+    for index, relative in enumerate(_SIZE_AT_QUALITY[fmt]):
+        if relative <= ratio:
+            return index
+    return len(_QUALITY_LEVELS) - 1
+
+
+def compress_image(image_bytes, max_size_mb=8, fmt=None):
+    """Compress image if it exceeds Discord's size limit
+
+    Finds the highest quality that fits with a binary search over quality
+    levels, seeded by how far the top-quality encode is over the limit; if even
+    the lowest quality cannot fit, it downscales by the pixel ratio instead.
+    At most _MAX_ENCODES encodes per image. `fmt` is 'jpeg' or 'webp'
+    (default IMAGE_OUTPUT_FORMAT).
+    """
+    max_size_bytes = int(max_size_mb * 1024 * 1024)
+    
+    # If already under limit, return as-is
+    if len(image_bytes) <= max_size_bytes:
+        return image_bytes
+    
+    fmt = (fmt or IMAGE_OUTPUT_FORMAT).lower()
+    if fmt == 'webp' and not features.check('webp'):
+        fmt = 'jpeg'
+    try:
+        img = _flatten(Image.open(io.BytesIO(image_bytes)), fmt)
+        encodes = 0
+        smallest = None
+
+        def encode(target, quality):
+            nonlocal encodes, smallest
+            encodes += 1
+            data = _encode(target, fmt, quality)
+            if smallest is None or len(data) < len(smallest):
+                smallest = data
+            return data
+
+        # Top quality first: it often fits, and its size seeds the search
+        top = encode(img, _QUALITY_LEVELS[0])
+        if len(top) <= max_size_bytes:
+            return top
+        ratio = max_size_bytes / len(top)
+
+        # Try the predicted quality level; step up while it still fits, or
+        # binary search the lower levels when it does not
+        if ratio >= _SIZE_AT_QUALITY[fmt][-1] * 0.85:
+            index = max(1, _predict_quality(fmt, ratio))
+            data = encode(img, _QUALITY_LEVELS[index])
+            if len(data) <= max_size_bytes:
+                while index > 1 and encodes < _MAX_ENCODES:
+                    better = encode(img, _QUALITY_LEVELS[index - 1])
+                    if len(better) > max_size_bytes:
+                        break
+                    data, index = better, index - 1
+                return data
+            best = None
+            lo, hi = index + 1, len(_QUALITY_LEVELS) - 1
+            while lo <= hi and encodes < _MAX_ENCODES - 1:
+                index = (lo + hi) // 2
+                data = encode(img, _QUALITY_LEVELS[index])
+                if len(data) <= max_size_bytes:
+                    best, hi = data, index - 1
+                else:
+                    lo = index + 1
+            if best is not None:
+                return best
+
+        # Even low quality is too big: bytes scale roughly with pixel count
+        size = len(top) * _SIZE_AT_QUALITY[fmt][_QUALITY_LEVELS.index(_SCALED_QUALITY)]
+        scale = 1.0
+        while encodes < _MAX_ENCODES:
+            scale *= min(0.95, (max_size_bytes * 0.92 / size) ** 0.5)
+            width, height = max(1, int(img.width * scale)), max(1, int(img.height * scale))
+            data = encode(img.resize((width, height), Image.Resampling.LANCZOS), _SCALED_QUALITY)
+            if len(data) <= max_size_bytes:
+                return data
+            size = len(data)
+        
+        # Return best effort
+        logger.warning(f"Compression gave up after {encodes} encodes at {len(smallest)} bytes")
+        return smallest
+    except Exception as e:
+        logger.error(f"Compression error: {str(e)}")
+        return image_bytes
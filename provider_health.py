@@ -0,0 +1,330 @@
+"""
+Shared g4f provider health scoreboard and latency-ranked routing.
+
+Every chat call records its outcome per (provider, model): a rolling window of
+successes and latencies gives a success rate and p50/p95. Repeated failures trip
+a circuit breaker so dead providers are skipped instead of paying their full
+timeout again; after a cooldown one probe request is let through (half-open) and
+its result closes or re-opens the circuit.
+
+When the caller doesn't name a provider, requests go to the fastest healthy one.
+State is per process; it is exposed by /providers and the bot's !g4fstatus.
+"""
+
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import g4f
+
+logger = logging.getLogger(__name__)
+
+# Candidate providers for chat routing and hedging, in preference order
+DEFAULT_CHAT_PROVIDERS = ['PollinationsAI', 'Yqcloud', 'WeWordle', 'Chatai', 'OperaAria', 'Copilot']
+CHAT_PROVIDERS = [p.strip() for p in os.getenv('CHAT_PROVIDERS', ','.join(DEFAULT_CHAT_PROVIDERS)).split(',') if p.strip()]
+# How many ranked providers a routed request tries before letting g4f pick (0 = let g4f pick right away)
+ROUTE_MAX_ATTEMPTS = int(os.getenv('ROUTE_MAX_ATTEMPTS', 3))
+# Consecutive failures that open a circuit, and the first cooldown before a probe
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 3))
+CIRCUIT_COOLDOWN = float(os.getenv('CIRCUIT_COOLDOWN', 60))
+# Failed probes double the cooldown up to this cap
+CIRCUIT_MAX_COOLDOWN = float(os.getenv('CIRCUIT_MAX_COOLDOWN', 600))
+HEALTH_WINDOW = 50
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class _Health:
+    __slots__ = ('samples', 'consecutive_failures', 'state', 'opened_at', 'cooldown', 'probe_started')
+
+    def __init__(self, window, cooldown):
+        self.samples = deque(maxlen=window)  # (ok, latency_seconds)
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.cooldown = cooldown
+        self.probe_started = None
+
+
+class ProviderScoreboard:
+    """Rolling success rate, latency percentiles and a circuit breaker per (provider, model)."""
+
+    def __init__(self, window=HEALTH_WINDOW, failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+                 cooldown=CIRCUIT_COOLDOWN, max_cooldown=CIRCUIT_MAX_COOLDOWN):
+        self.window = window
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._health = {}
+        self._lock = threading.Lock()
+
+    def _get(self, provider, model):
+        key = (provider, model)
+        health = self._health.get(key)
+        if health is None:
+            health = self._health[key] = _Health(self.window, self.cooldown)
+        return health
+
+    def allow(self, provider, model):
+        """Return True if a request may go to this provider now.
+
+        An open circuit whose cooldown has passed moves to half-open and admits a
+        single probe; a probe that never reports back expires after one cooldown.
+        """
+        now = time.monotonic()
+        with self._lock:
+            health = self._get(provider, model)
+            if health.state == CLOSED:
+                return True
+            if health.state == OPEN:
+                if now - health.opened_at < health.cooldown:
+                    return False
+                health.state = HALF_OPEN
+                health.probe_started = now
+                return True
+            # Half-open: one probe at a time
+            if health.probe_started is None or now - health.probe_started >= health.cooldown:
+                health.probe_started = now
+                return True
+            return False
+
+    def record(self, provider, model, ok, latency):
+        """Record one call outcome and update the circuit state."""
+        with self._lock:
+            health = self._get(provider, model)
+            health.samples.append((bool(ok), latency))
+            if ok:
+                health.consecutive_failures = 0
+                health.state = CLOSED
+                health.cooldown = self.cooldown
+                health.probe_started = None
+                return
+            health.consecutive_failures += 1
+            if health.state == HALF_OPEN:
+                # Failed probe: stay out longer next time
+                health.cooldown = min(health.cooldown * 2, self.max_cooldown)
+            if health.state == HALF_OPEN or health.consecutive_failures >= self.failure_threshold:
+                if health.state != OPEN:
+                    logger.warning(f"Circuit opened for {provider}/{model} for {health.cooldown:.0f}s")
+                health.state = OPEN
+                health.opened_at = time.monotonic()
+                health.probe_started = None
+
+    def _stats(self, health):
+        samples = list(health.samples)
+        latencies = sorted(latency for ok, latency in samples if ok)
+        successes = sum(1 for ok, _ in samples if ok)
+        return {
+            'state': health.state,
+            'samples': len(samples),
+            'success_rate': round(successes / len(samples), 3) if samples else None,
+            'p50_ms': round(_percentile(latencies, 50) * 1000) if latencies else None,
+            'p95_ms': round(_percentile(latencies, 95) * 1000) if latencies else None,
+            'consecutive_failures': health.consecutive_failures,
+        }
+
+    def rank(self, names, model):
+        """Order provider names for a model: probes due, then fastest healthy, then untried.
+
+        Providers whose circuit is open and still cooling down are left out.
+        Healthy providers are ordered by p50 latency divided by success rate.
+        """
+        now = time.monotonic()
+        probes, measured, untried = [], [], []
+        with self._lock:
+            for index, name in enumerate(names):
+                health = self._health.get((name, model))
+                if health is None or not health.samples:
+                    untried.append(name)
+                    continue
+                if health.state == OPEN:
+                    if now - health.opened_at >= health.cooldown:
+                        probes.append(name)
+                    continue
+                if health.state == HALF_OPEN:
+                    if health.probe_started is None or now - health.probe_started >= health.cooldown:
+                        probes.append(name)
+                    continue
+                stats = self._stats(health)
+                if stats['p50_ms'] is None:
+                    untried.append(name)
+                    continue
+                measured.append((stats['p50_ms'] / max(stats['success_rate'], 0.05), index, name))
+        measured.sort()
+        return probes + [name for _, _, name in measured] + untried
+
+    def snapshot(self):
+        """Return a JSON-serializable list of per (provider, model) stats, best first."""
+        with self._lock:
+            rows = [dict(provider=provider, model=model, **self._stats(health))
+                    for (provider, model), health in self._health.items()]
+        rows.sort(key=lambda r: (r['state'] != CLOSED, r['p50_ms'] is None, r['p50_ms'] or 0))
+        return rows
+
+
+# Process-wide scoreboard shared by every caller in this process
+scoreboard = ProviderScoreboard()
+
+
+def provider_name(provider):
+    return getattr(provider, '__name__', None) or str(provider)
+
+
+def iter_candidates(model, limit=ROUTE_MAX_ATTEMPTS):
+    """Yield up to `limit` (name, provider class) pairs in ranked order.
+
+    Admission is checked lazily, right before each candidate is handed out, so a
+    half-open probe slot is only claimed when the caller actually tries it.
+    """
+    handed_out = 0
+    for name in scoreboard.rank(CHAT_PROVIDERS, model):
+        if handed_out >= limit:
+            return
+        provider = getattr(g4f.Provider, name, None)
+        if provider is None or not scoreboard.allow(name, model):
+            continue
+        handed_out += 1
+        yield name, provider
+
+
+def _valid(text):
+    return isinstance(text, str) and bool(text.strip())
+
+
+def routed_chat_sync(client, messages, model, extract, provider=None):
+    """Run a chat completion on the best healthy provider, falling back down the ranking.
+
+    With an explicit `provider` only that one is tried. If every ranked candidate
+    fails (or none are healthy) g4f's own default selection gets the last try.
+    Returns (provider_name, text).
+    """
+    candidates = [(provider_name(provider), provider)] if provider is not None else iter_candidates(model)
+    last_error = None
+    for name, candidate in candidates:
+        started = time.perf_counter()
+        try:
+            text = extract(client.chat.completions.create(model=model, messages=messages, provider=candidate))
+        except Exception as e:
+            scoreboard.record(name, model, False, time.perf_counter() - started)
+            logger.warning(f"Provider {name} failed: {e}")
+            last_error = e
+            continue
+        scoreboard.record(name, model, _valid(text), time.perf_counter() - started)
+        if _valid(text):
+            return name, text
+        last_error = ValueError(f"{name} returned an empty response")
+    if provider is not None:
+        raise last_error
+
+    started = time.perf_counter()
+    response = client.chat.completions.create(model=model, messages=messages)
+    text = extract(response)
+    name = getattr(response, 'provider', None) or 'default'
+    scoreboard.record(name, model, _valid(text), time.perf_counter() - started)
+    return name, text
+
+
+async def routed_chat_async(client, messages, model, extract, provider=None):
+    """AsyncClient version of routed_chat_sync. Returns (provider_name, text)."""
+    candidates = [(provider_name(provider), provider)] if provider is not None else iter_candidates(model)
+    last_error = None
+    for name, candidate in candidates:
+        started = time.perf_counter()
+        try:
+            text = extract(await client.chat.completions.create(model=model, messages=messages, provider=candidate))
+        except Exception as e:
+            scoreboard.record(name, model, False, time.perf_counter() - started)
+            logger.warning(f"Provider {name} failed: {e}")
+            last_error = e
+            continue
+        scoreboard.record(name, model, _valid(text), time.perf_counter() - started)
+        if _valid(text):
+            return name, text
+        last_error = ValueError(f"{name} returned an empty response")
+    if provider is not None:
+        raise last_error
+
+    started = time.perf_counter()
+    response = await client.chat.completions.create(model=model, messages=messages)
+    text = extract(response)
+    name = getattr(response, 'provider', None) or 'default'
+    scoreboard.record(name, model, _valid(text), time.perf_counter() - started)
+    return name, text
+
+
+def routed_stream_sync(client, messages, model, extract, provider=None):
+    """Stream text deltas from the best healthy provider.
+
+    A provider that fails before sending any text is recorded and the next one
+    is tried; once text has been sent, a failure is recorded and re-raised.
+    """
+    candidates = [(provider_name(provider), provider)] if provider is not None else iter_candidates(model)
+    if provider is None:
+        candidates = itertools.chain(candidates, [('default', None)])
+    last_error = None
+    for name, candidate in candidates:
+        started = time.perf_counter()
+        sent = False
+        kwargs = {'provider': candidate} if candidate is not None else {}
+        try:
+            for chunk in client.chat.completions.create(model=model, messages=messages, stream=True, **kwargs):
+                text = extract(chunk)
+                if text:
+                    sent = True
+                    yield text
+        except Exception as e:
+            scoreboard.record(name, model, False, time.perf_counter() - started)
+            if sent:
+                raise
+            logger.warning(f"Provider {name} stream failed: {e}")
+            last_error = e
+            continue
+        scoreboard.record(name, model, sent, time.perf_counter() - started)
+        if sent:
+            return
+        last_error = ValueError(f"{name} returned an empty stream")
+    if last_error:
+        raise last_error
+
+
+async def routed_stream_async(client, messages, model, extract, provider=None):
+    """AsyncClient version of routed_stream_sync."""
+    candidates = [(provider_name(provider), provider)] if provider is not None else iter_candidates(model)
+    if provider is None:
+        candidates = itertools.chain(candidates, [('default', None)])
+    last_error = None
+    for name, candidate in candidates:
+        started = time.perf_counter()
+        sent = False
+        kwargs = {'provider': candidate} if candidate is not None else {}
+        try:
+            async for chunk in client.chat.completions.create(model=model, messages=messages, stream=True, **kwargs):
+                text = extract(chunk)
+                if text:
+                    sent = True
+                    yield text
+        except Exception as e:
+            scoreboard.record(name, model, False, time.perf_counter() - started)
+            if sent:
+                raise
+            logger.warning(f"Provider {name} stream failed: {e}")
+            last_error = e
+            continue
+        scoreboard.record(name, model, sent, time.perf_counter() - started)
+        if sent:
+            return
+        last_error = ValueError(f"{name} returned an empty stream")
+    if last_error:
+        raise last_error
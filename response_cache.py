@@ -0,0 +1,114 @@
+"""
+In-memory LRU + TTL cache for deterministic chat responses.
+
+Entries are keyed by a SHA-256 of the canonical (normalized) messages array,
+model and provider, bounded by total size in bytes, expire after a per-entry
+TTL and are evicted least-recently-used first. Hit/miss counters are kept so
+the bounds can be tuned from /cache.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+RESPONSE_CACHE_MAX_MB = float(os.getenv('RESPONSE_CACHE_MAX_MB', 32))
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 600))
+# Fixed per-entry bookkeeping cost added to the payload size
+_ENTRY_OVERHEAD = 256
+
+
+def _normalize_content(content):
+    if isinstance(content, str):
+        return content.replace('\r\n', '\n').strip()
+    return content
+
+
+def canonical_key(messages, model, provider=None):
+    """Hash the normalized request so equivalent requests share one entry."""
+    normalized = [
+        {'role': str(m.get('role', '')).strip().lower(), 'content': _normalize_content(m.get('content'))}
+        for m in messages
+    ]
+    payload = json.dumps(
+        {'messages': normalized, 'model': model, 'provider': provider},
+        sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with a byte budget and per-entry TTL."""
+
+    def __init__(self, max_bytes=int(RESPONSE_CACHE_MAX_MB * 1024 * 1024), default_ttl=RESPONSE_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Return the cached value or None, refreshing its LRU position on a hit."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, size, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, ttl=None, size=None):
+        """Store a JSON-serializable value, evicting least-recently-used entries to fit."""
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        if size is None:
+            size = len(json.dumps(value, ensure_ascii=False, default=str).encode('utf-8'))
+        size += _ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'default_ttl': self.default_ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
@@ -0,0 +1,273 @@
+"""
+Fair-share admission control for g4f / Pollinations work in the Discord bot.
+
+Every AI request asks for a slot before doing any upstream work:
+- token buckets rate-limit each user and each guild (over-limit requests are
+  rejected with a retry hint instead of piling up),
+- a bounded number of slots caps global concurrency,
+- waiting requests are dispatched by weighted fair queuing across guilds and
+  round-robin across users within a guild, so one spammy user or guild only
+  ever delays itself.
+Waiters can be told their queue position when they are queued.
+"""
+
+import asyncio
+import heapq
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+AI_MAX_CONCURRENCY = int(os.getenv('AI_MAX_CONCURRENCY', 8))
+AI_USER_RATE = float(os.getenv('AI_USER_RATE', 0.2))  # requests per second
+AI_USER_BURST = float(os.getenv('AI_USER_BURST', 5))
+AI_GUILD_RATE = float(os.getenv('AI_GUILD_RATE', 1.0))
+AI_GUILD_BURST = float(os.getenv('AI_GUILD_BURST', 20))
+AI_MAX_QUEUED_PER_USER = int(os.getenv('AI_MAX_QUEUED_PER_USER', 3))
+# Optional per-guild weights, e.g. "123456789:2,987654321:0.5" (default weight 1)
+AI_GUILD_WEIGHTS = os.getenv('AI_GUILD_WEIGHTS', '')
+# Full (idle) buckets are pruned once this many are tracked
+_MAX_BUCKETS = 10000
+
+
+def parse_weights(spec):
+    weights = {}
+    for item in spec.split(','):
+        if ':' in item:
+            key, _, value = item.partition(':')
+            try:
+                weights[key.strip()] = float(value)
+            except ValueError:
+                continue
+    return weights
+
+
+class RateLimited(Exception):
+    """Raised when a user or guild is over its rate limit or queue allowance."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until one token is available (0 if available now)."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float('inf')
+
+    def take(self):
+        self.tokens -= 1
+
+    def idle(self, now):
+        """True once the bucket has refilled completely (safe to forget)."""
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class _Waiter:
+    __slots__ = ('user_id', 'queue_key', 'future')
+
+    def __init__(self, user_id, queue_key, future):
+        self.user_id = user_id
+        self.queue_key = queue_key
+        self.future = future
+
+
+class _GuildQueue:
+    __slots__ = ('users', 'vtime', 'weight')
+
+    def __init__(self, vtime, weight):
+        self.users = OrderedDict()  # user_id -> deque of _Waiter, served round-robin
+        self.vtime = vtime
+        self.weight = weight
+
+
+class FairScheduler:
+    """Token-bucket rate limits plus weighted fair queuing over a fixed number of slots."""
+
+    def __init__(self, max_concurrency=AI_MAX_CONCURRENCY, user_rate=AI_USER_RATE, user_burst=AI_USER_BURST,
+                 guild_rate=AI_GUILD_RATE, guild_burst=AI_GUILD_BURST,
+                 max_queued_per_user=AI_MAX_QUEUED_PER_USER, weights=None):
+        self.max_concurrency = max_concurrency
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.guild_rate = guild_rate
+        self.guild_burst = guild_burst
+        self.max_queued_per_user = max_queued_per_user
+        self.weights = parse_weights(AI_GUILD_WEIGHTS) if weights is None else weights
+        self._user_buckets = {}
+        self._guild_buckets = {}
+        self._queues = {}  # queue key (guild or dm:user) -> _GuildQueue
+        self._vclock = 0.0
+        self._active = 0
+        self._queued = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def _bucket(self, buckets, key, rate, burst):
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) >= _MAX_BUCKETS:
+                now = time.monotonic()
+                for stale in [k for k, b in buckets.items() if b.idle(now)]:
+                    del buckets[stale]
+            bucket = buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+    def _charge(self, user_id, guild_id):
+        now = time.monotonic()
+        user_bucket = self._bucket(self._user_buckets, user_id, self.user_rate, self.user_burst)
+        wait = user_bucket.wait_time(now)
+        if wait > 0:
+            self.rejected += 1
+            raise RateLimited(f"You're sending requests too fast, try again in {wait:.0f}s.", wait)
+        guild_bucket = None
+        if guild_id is not None:
+            guild_bucket = self._bucket(self._guild_buckets, guild_id, self.guild_rate, self.guild_burst)
+            wait = guild_bucket.wait_time(now)
+            if wait > 0:
+                self.rejected += 1
+                raise RateLimited(f"This server is sending too many requests, try again in {wait:.0f}s.", wait)
+        user_bucket.take()
+        if guild_bucket is not None:
+            guild_bucket.take()
+
+    def _order(self):
+        """Waiters in the order they would be dispatched right now."""
+        heap = []
+        for key, queue in self._queues.items():
+            lanes = [list(waiters) for waiters in queue.users.values()]
+            interleaved = [lane[i] for i in range(max(map(len, lanes))) for lane in lanes if i < len(lane)]
+            heap.append((queue.vtime, key, 0, interleaved, 1 / queue.weight))
+        heapq.heapify(heap)
+        while heap:
+            vtime, key, i, waiters, step = heapq.heappop(heap)
+            yield waiters[i]
+            if i + 1 < len(waiters):
+                heapq.heappush(heap, (vtime + step, key, i + 1, waiters, step))
+
+    def position(self, waiter):
+        for position, queued in enumerate(self._order(), 1):
+            if queued is waiter:
+                return position
+        return 0
+
+    def _dispatch(self):
+        while self._active < self.max_concurrency and self._queues:
+            key = min(self._queues, key=lambda k: self._queues[k].vtime)
+            queue = self._queues[key]
+            user_id, waiters = next(iter(queue.users.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                queue.users.move_to_end(user_id)
+            else:
+                del queue.users[user_id]
+            self._vclock = queue.vtime
+            queue.vtime += 1 / queue.weight
+            if not queue.users:
+                del self._queues[key]
+            self._queued -= 1
+            if waiter.future.done():
+                continue
+            self._active += 1
+            waiter.future.set_result(None)
+
+    def _remove(self, waiter):
+        queue = self._queues.get(waiter.queue_key)
+        if queue is None or waiter.user_id not in queue.users:
+            return
+        waiters = queue.users[waiter.user_id]
+        try:
+            waiters.remove(waiter)
+        except ValueError:
+            return
+        self._queued -= 1
+        if not waiters:
+            del queue.users[waiter.user_id]
+        if not queue.users:
+            del self._queues[waiter.queue_key]
+
+    async def acquire(self, user_id, guild_id=None, on_queued=None, rate_limit=True):
+        """Wait for a slot. Raises RateLimited when over the user/guild limits.
+
+        `on_queued` is an optional coroutine function called with the queue
+        position when the request has to wait.
+        """
+        user_id = str(user_id)
+        guild_id = None if guild_id is None else str(guild_id)
+        queue_key = guild_id if guild_id is not None else f"dm:{user_id}"
+        immediate = self._active < self.max_concurrency and not self._queues
+        # Check the queue allowance before charging, so a rejected request costs no tokens
+        queue = self._queues.get(queue_key)
+        queued = len(queue.users.get(user_id, ())) if queue is not None else 0
+        if rate_limit and not immediate and queued >= self.max_queued_per_user:
+            self.rejected += 1
+            raise RateLimited(f"You already have {self.max_queued_per_user} requests waiting, please wait for them.")
+        if rate_limit:
+            self._charge(user_id, guild_id)
+        if immediate:
+            self._active += 1
+            self.admitted += 1
+            return
+
+        if queue is None:
+            # A newly active guild starts at the current virtual time: no banked credit
+            queue = self._queues[queue_key] = _GuildQueue(self._vclock, self.weights.get(queue_key, 1.0))
+        waiters = queue.users.setdefault(user_id, deque())
+        waiter = _Waiter(user_id, queue_key, asyncio.get_running_loop().create_future())
+        waiters.append(waiter)
+        self._queued += 1
+        try:
+            if on_queued is not None:
+                try:
+                    await on_queued(self.position(waiter))
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    pass
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Slot was granted just as we were cancelled: hand it on
+                self.release()
+            else:
+                self._remove(waiter)
+            raise
+        self.admitted += 1
+
+    def release(self):
+        self._active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user_id, guild_id=None, on_queued=None, rate_limit=True):
+        await self.acquire(user_id, guild_id, on_queued, rate_limit)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        return {
+            'active': self._active,
+            'max_concurrency': self.max_concurrency,
+            'queued': self._queued,
+            'queued_by_guild': {key: sum(map(len, q.users.values())) for key, q in self._queues.items()},
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,96 @@
+"""
+Single-flight coalescing for identical concurrent work.
+
+When several callers ask for the same thing at once (same TMDB lookup, same
+image prompt, same cacheable chat request), only the first one runs the
+upstream call; the others wait for its result (or exception) instead of
+fanning out. Nothing is cached once the call finishes - pair it with a cache.
+
+`SingleFlight` is for asyncio code, `SyncSingleFlight` for threaded servers.
+"""
+
+import asyncio
+import threading
+
+
+class SingleFlight:
+    """Coalesce concurrent coroutine calls that share a key."""
+
+    def __init__(self):
+        self._calls = {}  # key -> asyncio.Task of the call in flight
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key, fn):
+        """Return await fn(), or the result of an identical call already in flight.
+
+        The call runs as its own task, so one caller being cancelled does not
+        cancel it for the others.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+            self.leaders += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        self._calls.pop(key, None)
+        # Mark the outcome as retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        return {'in_flight': len(self._calls), 'leaders': self.leaders, 'shared': self.shared}
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SyncSingleFlight:
+    """Thread-safe version for blocking code: followers block until the leader finishes."""
+
+    def __init__(self):
+        self._calls = {}  # key -> _Call in flight
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        """Return fn(), or the result of an identical call already running in another thread."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {'in_flight': len(self._calls), 'leaders': self.leaders, 'shared': self.shared}
@@ -0,0 +1,122 @@
+"""Tests for race_async / race_sync: hedge delay, lazy launches and first valid result."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from hedging import race_async, race_sync
+
+
+def test_race_async_launches_a_backup_after_the_delay():
+    launched = {}
+    cancelled = []
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        async def stuck():
+            launched['stuck'] = loop.time() - start
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append('stuck')
+                raise
+
+        async def quick():
+            launched['quick'] = loop.time() - start
+            return 'answer'
+
+        return await race_async([('stuck', stuck), ('quick', quick)], delay=0.05)
+
+    assert asyncio.run(main()) == ('quick', 'answer')
+    assert launched['stuck'] < 0.04 <= launched['quick']
+    assert cancelled == ['stuck']
+
+
+def test_race_async_skips_invalid_and_failed_results_without_waiting():
+    async def empty():
+        return '  '
+
+    async def broken():
+        raise RuntimeError('down')
+
+    async def good():
+        return 'ok'
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        # A long delay: backups only start this quickly because earlier attempts ended
+        result = await race_async([('empty', empty), ('broken', broken), ('good', good)], delay=10)
+        return result, loop.time() - start
+
+    result, elapsed = asyncio.run(main())
+    assert result == ('good', 'ok')
+    assert elapsed < 1
+
+
+def test_race_async_does_not_pull_backups_once_the_first_wins():
+    pulled = []
+
+    async def answer():
+        return 'first'
+
+    def attempts():
+        for name in ('a', 'b', 'c'):
+            pulled.append(name)
+            yield name, answer
+
+    assert asyncio.run(race_async(attempts(), delay=1)) == ('a', 'first')
+    assert pulled == ['a']
+
+
+def test_race_async_raises_the_last_error_when_everything_fails():
+    async def broken():
+        raise RuntimeError('down')
+
+    with pytest.raises(RuntimeError, match='down'):
+        asyncio.run(race_async([('a', broken), ('b', broken)], delay=0))
+    with pytest.raises(RuntimeError, match='No providers'):
+        asyncio.run(race_async([], delay=0))
+
+
+def test_race_sync_launches_a_backup_after_the_delay():
+    release = threading.Event()
+    launched = {}
+    start = time.monotonic()
+
+    def slow():
+        launched['slow'] = time.monotonic() - start
+        release.wait(5)
+        return 'late'
+
+    def quick():
+        launched['quick'] = time.monotonic() - start
+        return 'answer'
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        try:
+            assert race_sync([('slow', slow), ('quick', quick)], executor, delay=0.05) == ('quick', 'answer')
+        finally:
+            release.set()
+    assert launched['slow'] < 0.04 <= launched['quick']
+
+
+def test_race_sync_returns_the_first_valid_result():
+    def empty():
+        return ''
+
+    def broken():
+        raise RuntimeError('down')
+
+    def good():
+        return 'ok'
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        assert race_sync([('empty', empty), ('broken', broken), ('good', good)], executor, delay=10) == ('good', 'ok')
+        with pytest.raises(RuntimeError, match='down'):
+            race_sync([('broken', broken)], executor, delay=0)
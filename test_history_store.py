@@ -0,0 +1,28 @@
+"""Tests for HistoryStore sequence numbering and compaction across !clear."""
+
+from history_store import HistoryStore
+
+
+def store(tmp_path):
+    return HistoryStore(path=str(tmp_path / 'history.sqlite3'))
+
+
+def test_compaction_of_a_cleared_chat_does_not_touch_the_new_one(tmp_path):
+    history = store(tmp_path)
+    for i in range(4):
+        history.append('u', 'user', f'old {i}')
+    stale_upto = history.turns('u')[-1].seq
+    history.clear('u')
+    history.append('u', 'user', 'new')
+    assert not history.compact('u', stale_upto, 'summary of the old chat')
+    assert [turn.text for turn in history.turns('u')] == ['new']
+
+
+def test_sequence_numbers_keep_increasing_after_clear_and_reopen(tmp_path):
+    history = store(tmp_path)
+    seqs = [history.append('u', 'user', 'a').seq, history.append('u', 'user', 'b').seq]
+    history.clear('u')
+    history.clear('u')
+    seqs.append(history.append('u', 'user', 'c').seq)
+    seqs.append(store(tmp_path).append('u', 'user', 'd').seq)
+    assert seqs == sorted(set(seqs))
@@ -0,0 +1,139 @@
+"""Tests for HTTPClient: per-loop session handling and the download byte cap."""
+
+import asyncio
+import contextlib
+import threading
+
+from aiohttp import web
+
+from http_client import HTTPClient, DownloadTooLarge
+
+
+@contextlib.asynccontextmanager
+async def serve(handler):
+    """Run a one-route aiohttp server on a free local port and yield its URL."""
+    app = web.Application()
+    app.router.add_get('/', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}/"
+    finally:
+        await runner.cleanup()
+
+
+async def hello(request):
+    return web.Response(body=b'hello')
+
+
+async def fetch(client):
+    async with serve(hello) as url:
+        return client.session, await client.get_bytes(url)
+
+
+def test_client_moves_across_asyncio_run_calls():
+    client = HTTPClient()
+    first, body = asyncio.run(fetch(client))
+    assert body == b'hello'
+    second, body = asyncio.run(fetch(client))
+    assert body == b'hello'
+    assert second is not first and not second.closed
+    asyncio.run(client.close())
+
+
+def test_session_is_reused_on_the_same_loop():
+    async def main():
+        client = HTTPClient()
+        try:
+            return client.session is client.session
+        finally:
+            await client.close()
+
+    assert asyncio.run(main())
+
+
+def test_session_of_a_still_running_loop_is_closed_there():
+    client = HTTPClient()
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        async def grab():
+            return client.session
+
+        old = asyncio.run_coroutine_threadsafe(grab(), loop).result(timeout=5)
+
+        async def main():
+            new = client.session
+            # The close was scheduled on the old loop; give it a moment to run
+            for _ in range(50):
+                if old.closed:
+                    break
+                await asyncio.sleep(0.01)
+            await client.close()
+            return new
+
+        assert asyncio.run(main()) is not old
+        assert old.closed
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        loop.close()
+
+
+def run_download(handler, max_bytes, accept=None):
+    async def main():
+        client = HTTPClient()
+        try:
+            async with serve(handler) as url:
+                try:
+                    return await client.download(url, max_bytes, accept=accept), client.stats()
+                except Exception as e:
+                    return e, client.stats()
+        finally:
+            await client.close()
+
+    return asyncio.run(main())
+
+
+async def announced(request):
+    return web.Response(body=b'x' * 5000)
+
+
+async def chunked(request):
+    # No Content-Length, so only the bytes actually received can trip the cap
+    resp = web.StreamResponse()
+    resp.enable_chunked_encoding()
+    await resp.prepare(request)
+    for _ in range(10):
+        await resp.write(b'x' * 1000)
+    await resp.write_eof()
+    return resp
+
+
+def test_download_returns_bodies_within_the_cap():
+    body, stats = run_download(announced, 5000)
+    assert body == b'x' * 5000
+    assert stats['downloading_bytes'] == 0 and stats['peak_download_bytes'] == 5000
+
+
+def test_download_rejects_an_announced_oversized_body():
+    error, stats = run_download(announced, 4999)
+    assert isinstance(error, DownloadTooLarge)
+    assert stats['peak_download_bytes'] == 0
+
+
+def test_download_stops_a_chunked_body_at_the_cap():
+    error, stats = run_download(chunked, 2500)
+    assert isinstance(error, DownloadTooLarge)
+    assert stats['downloading_bytes'] == 0
+    assert stats['peak_download_bytes'] <= 2500
+
+
+def test_download_accept_check_stops_early():
+    body, stats = run_download(chunked, 100_000, accept=lambda head: head.startswith(b'\x89PNG'))
+    assert body is None
+    assert stats['rejected'] == 1
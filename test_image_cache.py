@@ -0,0 +1,79 @@
+"""Tests for ImageStore: LRU eviction under the byte cap and index rebuild on start."""
+
+import os
+
+from image_cache import ImageStore, image_key
+
+
+def test_least_recently_used_images_are_evicted(tmp_path):
+    store = ImageStore(root=str(tmp_path), max_bytes=30)
+    store.put('a', b'a' * 10)
+    store.put('b', b'b' * 10)
+    store.put('c', b'c' * 10)
+    # Touch `a`, so `b` is now the least recently used
+    assert store.get('a') == b'a' * 10
+    store.put('d', b'd' * 10)
+
+    assert store.get('b') is None
+    assert not os.path.exists(store._path('b'))
+    assert [store.get(k) for k in 'acd'] == [b'a' * 10, b'c' * 10, b'd' * 10]
+    stats = store.stats()
+    assert (stats['images'], stats['bytes'], stats['evictions']) == (3, 30, 1)
+
+
+def test_replacing_an_image_counts_its_new_size(tmp_path):
+    store = ImageStore(root=str(tmp_path), max_bytes=30)
+    store.put('a', b'a' * 10)
+    store.put('a', b'a' * 25)
+    store.put('b', b'b' * 5)
+    assert store.stats()['bytes'] == 30
+    store.put('c', b'c' * 5)
+    assert store.get('a') is None
+    assert store.stats()['bytes'] == 10
+
+
+def test_images_larger_than_the_cap_are_not_stored(tmp_path):
+    store = ImageStore(root=str(tmp_path), max_bytes=10)
+    store.put('a', b'a' * 5)
+    store.put('big', b'x' * 11)
+    assert store.get('big') is None
+    assert store.get('a') == b'a' * 5
+
+
+def test_index_is_rebuilt_in_recency_order_and_trimmed(tmp_path):
+    store = ImageStore(root=str(tmp_path), max_bytes=100)
+    for age, key in enumerate('abc'):
+        store.put(key, key.encode() * 10)
+        # Oldest modification time first: a, then b, then c
+        os.utime(store._path(key), (1000 + age, 1000 + age))
+
+    reopened = ImageStore(root=str(tmp_path), max_bytes=20)
+    assert reopened.stats()['images'] == 2
+    assert reopened.get('a') is None
+    assert reopened.get('b') == b'b' * 10 and reopened.get('c') == b'c' * 10
+
+
+def test_stale_partial_writes_are_removed_on_start(tmp_path):
+    store = ImageStore(root=str(tmp_path), max_bytes=100)
+    key = image_key('flux', 'a cat', 1)
+    store.put(key, b'png')
+    stale = store._path(key) + '.1.tmp'
+    fresh = store._path(key) + '.2.tmp'
+    for path in (stale, fresh):
+        with open(path, 'wb') as f:
+            f.write(b'partial')
+    os.utime(stale, (0, 0))
+
+    reopened = ImageStore(root=str(tmp_path), max_bytes=100)
+    assert not os.path.exists(stale)
+    assert os.path.exists(fresh)
+    assert reopened.stats()['images'] == 1
+    assert reopened.get(key) == b'png'
+
+
+def test_a_zero_cap_disables_the_store(tmp_path):
+    root = tmp_path / 'images'
+    store = ImageStore(root=str(root), max_bytes=0)
+    store.put('a', b'a')
+    assert store.get('a') is None
+    assert not root.exists()
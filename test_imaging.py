@@ -0,0 +1,76 @@
+"""Tests for compress_image's quality search and downscale fallback."""
+
+import io
+import random
+
+from PIL import Image
+
+import imaging
+from imaging import compress_image, sniff_format
+
+
+def photo(width=480, height=360, seed=0):
+    """A PNG with gradients and grain, so JPEG size actually depends on quality."""
+    rng = random.Random(seed)
+    pixels = bytes(
+        min(255, max(0, (x * 255 // width + y * 255 // height) // 2 + rng.randint(-40, 40)))
+        for y in range(height) for x in range(width) for _ in range(3))
+    output = io.BytesIO()
+    Image.frombytes('RGB', (width, height), pixels).save(output, format='PNG')
+    return output.getvalue()
+
+
+def size_at(data, quality):
+    return len(imaging._encode(imaging._flatten(Image.open(io.BytesIO(data)), 'jpeg'), 'jpeg', quality))
+
+
+def count_encodes(monkeypatch):
+    calls = []
+    encode = imaging._encode
+
+    def counting(img, fmt, quality):
+        calls.append((img.size, quality))
+        return encode(img, fmt, quality)
+
+    monkeypatch.setattr(imaging, '_encode', counting)
+    return calls
+
+
+def test_small_images_are_returned_untouched():
+    data = photo(32, 32)
+    assert compress_image(data, max_size_mb=1) is data
+
+
+def test_picks_the_highest_quality_level_that_fits(monkeypatch):
+    data = photo()
+    # A limit just under quality 70's size: 65 is the best level that fits
+    limit = size_at(data, 70) - 1
+    assert size_at(data, 65) <= limit
+    calls = count_encodes(monkeypatch)
+    result = compress_image(data, max_size_mb=limit / 1024 / 1024, fmt='jpeg')
+    assert sniff_format(result) == 'jpeg'
+    assert len(result) == size_at(data, 65)
+    assert len(calls) <= imaging._MAX_ENCODES
+    assert all(size == (480, 360) for size, _ in calls)
+
+
+def test_downscales_when_even_the_lowest_quality_is_too_big(monkeypatch):
+    data = photo()
+    limit = size_at(data, imaging._QUALITY_LEVELS[-1]) // 3
+    calls = count_encodes(monkeypatch)
+    result = compress_image(data, max_size_mb=limit / 1024 / 1024, fmt='jpeg')
+    assert len(result) <= limit
+    assert len(calls) <= imaging._MAX_ENCODES
+    width, height = Image.open(io.BytesIO(result)).size
+    assert width < 480 and height < 360
+    assert abs(width / height - 480 / 360) < 0.05
+
+
+def test_transparent_images_are_flattened_for_jpeg():
+    output = io.BytesIO()
+    Image.new('RGBA', (300, 300), (255, 0, 0, 0)).save(output, format='PNG')
+    data = output.getvalue()
+    result = compress_image(data, max_size_mb=(len(data) - 1) / 1024 / 1024, fmt='jpeg')
+    image = Image.open(io.BytesIO(result))
+    assert image.format == 'JPEG' and image.mode == 'RGB'
+    assert image.getpixel((150, 150)) == (255, 255, 255)
@@ -0,0 +1,93 @@
+"""Tests for ProviderScoreboard: circuit breaker, half-open probes, backoff and ranking."""
+
+import pytest
+
+import provider_health
+from provider_health import ProviderScoreboard, CLOSED, OPEN, HALF_OPEN
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(provider_health.time, 'monotonic', clock)
+    return clock
+
+
+def state(board, name, model='m'):
+    return board._health[(name, model)].state
+
+
+def test_circuit_opens_after_consecutive_failures(clock):
+    board = ProviderScoreboard(failure_threshold=3, cooldown=60)
+    board.record('p', 'm', False, 1.0)
+    board.record('p', 'm', False, 1.0)
+    assert state(board, 'p') == CLOSED and board.allow('p', 'm')
+    board.record('p', 'm', False, 1.0)
+    assert state(board, 'p') == OPEN
+    assert not board.allow('p', 'm')
+    clock.now += 59
+    assert not board.allow('p', 'm')
+
+
+def test_half_open_admits_a_single_probe(clock):
+    board = ProviderScoreboard(failure_threshold=1, cooldown=60)
+    board.record('p', 'm', False, 1.0)
+    clock.now += 60
+    assert board.allow('p', 'm')
+    assert state(board, 'p') == HALF_OPEN
+    assert not board.allow('p', 'm')
+    # A probe that never reports back expires after one cooldown
+    clock.now += 60
+    assert board.allow('p', 'm')
+    board.record('p', 'm', True, 0.5)
+    assert state(board, 'p') == CLOSED
+    assert board.allow('p', 'm') and board.allow('p', 'm')
+
+
+def test_failed_probes_double_the_cooldown_up_to_the_cap(clock):
+    board = ProviderScoreboard(failure_threshold=1, cooldown=60, max_cooldown=200)
+    board.record('p', 'm', False, 1.0)
+    for expected in (120, 200, 200):
+        clock.now += board._health[('p', 'm')].cooldown
+        assert board.allow('p', 'm')
+        board.record('p', 'm', False, 1.0)
+        assert state(board, 'p') == OPEN
+        assert board._health[('p', 'm')].cooldown == expected
+    # A successful probe resets the cooldown
+    clock.now += 200
+    assert board.allow('p', 'm')
+    board.record('p', 'm', True, 0.5)
+    assert board._health[('p', 'm')].cooldown == 60
+
+
+def test_rank_orders_probes_then_fastest_healthy_then_untried(clock):
+    board = ProviderScoreboard(failure_threshold=1, cooldown=60)
+    for _ in range(4):
+        board.record('fast', 'm', True, 0.2)
+        board.record('slow', 'm', True, 1.0)
+    # Flaky: fast when it works, but half its calls fail
+    board.record('flaky', 'm', True, 0.3)
+    board.record('flaky', 'm', True, 0.3)
+    board.record('flaky', 'm', False, 0.3)
+    board.record('flaky', 'm', False, 0.3)
+    board.record('flaky', 'm', True, 0.3)
+    board.record('flaky', 'm', False, 0.3)
+    board.record('flaky', 'm', True, 0.3)
+    board.record('dead', 'm', False, 5.0)
+    names = ['untried', 'slow', 'dead', 'flaky', 'fast']
+
+    # `dead` is cooling down, so it is left out
+    assert board.rank(names, 'm') == ['fast', 'flaky', 'slow', 'untried']
+    # Once its cooldown has passed its probe goes first
+    clock.now += 60
+    assert board.rank(names, 'm') == ['dead', 'fast', 'flaky', 'slow', 'untried']
+    # Health is tracked per model
+    assert board.rank(names, 'other') == names
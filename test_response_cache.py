@@ -0,0 +1,70 @@
+"""Tests for ResponseCache (LRU, byte budget, TTL) and canonical_key."""
+
+import response_cache
+from response_cache import ResponseCache, canonical_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_put_then_get_counts_hits_and_misses():
+    cache = ResponseCache(max_bytes=10_000, default_ttl=60)
+    assert cache.get('a') is None
+    cache.put('a', {'response': 'hi'})
+    assert cache.get('a') == {'response': 'hi'}
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache.time, 'monotonic', clock)
+    cache = ResponseCache(max_bytes=10_000, default_ttl=60)
+    cache.put('default', 'x')
+    cache.put('short', 'y', ttl=5)
+    clock.now += 10
+    assert cache.get('short') is None
+    assert cache.get('default') == 'x'
+    clock.now += 60
+    assert cache.get('default') is None
+    assert cache.stats()['expirations'] == 2
+    assert cache.stats()['bytes'] == 0
+
+
+def test_least_recently_used_is_evicted_to_fit_the_budget():
+    cache = ResponseCache(max_bytes=3 * (response_cache._ENTRY_OVERHEAD + 100), default_ttl=60)
+    for key in 'abc':
+        cache.put(key, key, size=100)
+    cache.get('a')
+    cache.put('d', 'd', size=100)
+    assert cache.get('b') is None
+    assert [cache.get(key) for key in 'acd'] == ['a', 'c', 'd']
+    assert cache.stats()['evictions'] == 1
+
+
+def test_oversized_and_zero_ttl_values_are_not_stored():
+    cache = ResponseCache(max_bytes=1000, default_ttl=60)
+    cache.put('big', 'x', size=1000)
+    cache.put('never', 'x', ttl=0)
+    assert cache.get('big') is None and cache.get('never') is None
+    assert cache.stats()['bytes'] == 0
+
+
+def test_replacing_a_key_does_not_leak_bytes():
+    cache = ResponseCache(max_bytes=10_000, default_ttl=60)
+    cache.put('a', 'x', size=100)
+    cache.put('a', 'y', size=200)
+    assert cache.get('a') == 'y'
+    assert cache.stats()['bytes'] == 200 + response_cache._ENTRY_OVERHEAD
+
+
+def test_canonical_key_ignores_formatting_noise_but_not_content():
+    base = canonical_key([{'role': 'user', 'content': 'Hello'}], 'gpt-4')
+    assert canonical_key([{'role': ' USER', 'content': 'Hello \r\n'}], 'gpt-4') == base
+    assert canonical_key([{'role': 'user', 'content': 'hello'}], 'gpt-4') != base
+    assert canonical_key([{'role': 'user', 'content': 'Hello'}], 'gpt-4', 'Yqcloud') != base
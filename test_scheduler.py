@@ -0,0 +1,99 @@
+"""Tests for FairScheduler's rate limits, queue allowance and fair dispatch."""
+
+import asyncio
+
+import pytest
+
+from scheduler import FairScheduler, RateLimited
+
+
+def scheduler(**kwargs):
+    options = dict(max_concurrency=1, user_rate=0.001, user_burst=100, guild_rate=0.001, guild_burst=100,
+                   max_queued_per_user=10, weights={})
+    options.update(kwargs)
+    return FairScheduler(**options)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_admits_up_to_max_concurrency_then_queues():
+    async def run():
+        s = scheduler(max_concurrency=2)
+        await s.acquire('a', 'g')
+        await s.acquire('b', 'g')
+        waiting = asyncio.ensure_future(s.acquire('c', 'g'))
+        await settle()
+        assert not waiting.done()
+        s.release()
+        await waiting
+        assert s.admitted == 3
+    asyncio.run(run())
+
+
+def test_user_burst_is_enforced_with_a_retry_hint():
+    async def run():
+        s = scheduler(max_concurrency=10, user_burst=2)
+        await s.acquire('a', 'g')
+        await s.acquire('a', 'g')
+        with pytest.raises(RateLimited) as info:
+            await s.acquire('a', 'g')
+        assert info.value.retry_after > 0
+        # Someone else is unaffected
+        await s.acquire('b', 'g')
+    asyncio.run(run())
+
+
+def test_queue_allowance_is_checked_before_tokens_are_charged():
+    async def run():
+        s = scheduler(max_queued_per_user=1)
+        await s.acquire('busy', 'g')
+        queued = asyncio.ensure_future(s.acquire('a', 'g'))
+        await settle()
+        tokens = s._user_buckets['a'].tokens
+        for _ in range(3):
+            with pytest.raises(RateLimited):
+                await s.acquire('a', 'g')
+        assert s._user_buckets['a'].tokens == pytest.approx(tokens)
+        s.release()
+        await queued
+    asyncio.run(run())
+
+
+def test_waiters_are_served_round_robin_across_guilds_and_users():
+    async def run():
+        s = scheduler()
+        await s.acquire('busy', 'x')
+        order = []
+
+        async def request(user, guild):
+            await s.acquire(user, guild)
+            order.append(user)
+
+        # Guild "spam" queues first and more, but only gets every other slot
+        tasks = [asyncio.ensure_future(request(user, guild)) for user, guild in
+                 [('s1', 'spam'), ('s1', 'spam'), ('s2', 'spam'), ('q1', 'quiet'), ('q2', 'quiet')]]
+        await settle()
+        for _ in tasks:
+            s.release()
+            await settle()
+        await asyncio.gather(*tasks)
+        assert order == ['s1', 'q1', 's2', 'q2', 's1']
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        s = scheduler()
+        await s.acquire('busy', 'g')
+        waiting = asyncio.ensure_future(s.acquire('a', 'g'))
+        await settle()
+        waiting.cancel()
+        await settle()
+        assert s._queued == 0 and not s._queues
+        s.release()
+        await s.acquire('b', 'g')
+        assert s._active == 1
+    asyncio.run(run())
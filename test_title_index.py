@@ -0,0 +1,37 @@
+"""Tests for TitleIndex.resolve: only confident, unambiguous matches are answered locally."""
+
+from title_index import TitleIndex
+
+
+def index_of(*rows):
+    index = TitleIndex()
+    for tmdb_id, title, popularity in rows:
+        index.add(tmdb_id, title, popularity)
+    return index
+
+
+def test_a_clear_match_resolves_locally():
+    index = index_of((1, 'Inception', 80.0), (2, 'Interception', 3.0), (3, 'Alien', 60.0), (4, 'Aliens', 50.0))
+    assert index.resolve('inception') == 1
+    assert index.resolve('Alien') == 3
+
+
+def test_same_title_entries_fall_back_to_tmdb():
+    # Several films share the original title "Parasite"; none is the one a user
+    # typing the English title of 기생충 most likely means
+    index = index_of((10, 'Parasite', 20.0), (11, 'Parasite', 2.0), (12, '기생충', 90.0))
+    assert index.resolve('Parasite') is None
+
+
+def test_close_runner_up_falls_back_to_tmdb():
+    index = index_of((20, 'Star Wars Rebels', 40.0), (21, 'Star Wars Resistance', 40.0))
+    assert index.resolve('star wars') is None
+    assert index.resolve('star wars', margin=0) == 20
+
+
+def test_a_partial_overlap_falls_back_to_tmdb():
+    # Only the original title 千と千尋の神隠し is exported, so the English title
+    # must not settle for a different film that shares a word
+    index = index_of((30, '千と千尋の神隠し', 90.0), (31, 'Spirited', 5.0))
+    assert index.resolve('Spirited Away') is None
+    assert index.resolve('Spirited') == 31
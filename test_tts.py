@@ -0,0 +1,41 @@
+"""Tests for tts.split_sentences and TTSEngine's voice fallback."""
+
+import asyncio
+
+from tts import TTSEngine, split_sentences
+
+
+def test_packs_whole_sentences_up_to_the_limit():
+    text = "One. Two two. Three three three. Four."
+    assert split_sentences(text, max_chars=20) == ['One. Two two.', 'Three three three.', 'Four.']
+
+
+def test_every_chunk_fits_and_no_text_is_lost():
+    text = "Short one. " + "A much longer sentence that keeps going and going without stopping " * 3 + "End."
+    chunks = split_sentences(text, max_chars=60)
+    assert all(len(chunk) <= 60 for chunk in chunks)
+    assert ' '.join(chunks).split() == text.split()
+
+
+def test_over_long_word_is_hard_cut():
+    assert split_sentences('x' * 25, max_chars=10) == ['x' * 10, 'x' * 10, 'x' * 5]
+
+
+def test_newlines_end_sentences_and_blank_text_gives_nothing():
+    assert split_sentences("line one\n\nline two", max_chars=8) == ['line one', 'line two']
+    assert split_sentences("  \n ") == []
+
+
+def test_speak_keeps_one_voice_when_a_chunk_falls_back(monkeypatch):
+    async def synthesize(text, voice):
+        if voice == 'primary' and 'two' in text:
+            raise RuntimeError('primary failed')
+        return f"[{voice}:{text}]".encode()
+
+    monkeypatch.setattr('tts.split_sentences', lambda text: ['Sentence one.', 'Sentence two.', 'Sentence three.'])
+    engine = TTSEngine(voices=['primary', 'backup'], hedge_delay=5, synthesize_fn=synthesize)
+    audio, ext, voices = asyncio.run(engine.speak("ignored", fmt='mp3'))
+    assert voices == {'backup'}
+    assert audio == b'[backup:Sentence one.][backup:Sentence two.][backup:Sentence three.]'
+    assert ext == 'mp3'
+    assert engine.backup_used == 1
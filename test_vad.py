@@ -0,0 +1,72 @@
+"""Tests for vad.split_on_silence and StreamingVAD on synthetic speech and silence."""
+
+import math
+import random
+import struct
+
+from vad import SAMPLE_WIDTH, StreamingVAD, frame_bytes, split_on_silence
+
+RATE = 16000
+
+
+def tone(seconds, amplitude=8000, freq=220):
+    n = int(seconds * RATE)
+    return b''.join(struct.pack('<h', int(amplitude * math.sin(2 * math.pi * freq * i / RATE))) for i in range(n))
+
+
+def hiss(seconds, amplitude=30, seed=0):
+    rng = random.Random(seed)
+    return b''.join(struct.pack('<h', int(rng.gauss(0, amplitude))) for _ in range(int(seconds * RATE)))
+
+
+def seconds(span):
+    return (span[1] - span[0]) / (RATE * SAMPLE_WIDTH)
+
+
+def test_cuts_at_pauses_and_drops_silence():
+    pcm = hiss(1) + tone(1) + hiss(1, seed=1) + tone(2) + hiss(1, seed=2)
+    spans = split_on_silence(pcm, RATE, max_segment_s=4)
+    assert len(spans) == 2
+    # Each span holds its burst plus at most the padding on each side
+    assert 0.9 <= seconds(spans[0]) <= 1.4
+    assert 1.9 <= seconds(spans[1]) <= 2.4
+    first_start = spans[0][0] / (RATE * SAMPLE_WIDTH)
+    assert 0.7 <= first_start <= 1.0
+
+
+def test_spans_are_ordered_frame_aligned_and_within_the_recording():
+    pcm = hiss(0.5) + tone(1.5) + hiss(0.5, seed=3) + tone(0.7) + hiss(0.5, seed=4)
+    spans = split_on_silence(pcm, RATE)
+    size = frame_bytes(RATE)
+    assert spans == sorted(spans)
+    for start, end in spans:
+        assert 0 <= start < end <= len(pcm)
+        assert start % size == 0 and end % size == 0
+    for (_, end), (start, _) in zip(spans, spans[1:]):
+        assert end <= start
+
+
+def test_long_speech_without_pauses_is_cut_to_max_segment():
+    pcm = tone(7)
+    spans = split_on_silence(pcm, RATE, max_segment_s=2)
+    assert len(spans) >= 4
+    assert all(seconds(span) <= 2 for span in spans)
+    # Nothing is lost between the cuts
+    assert sum(end - start for start, end in spans) >= len(pcm) - frame_bytes(RATE)
+
+
+def test_silence_and_empty_input_give_no_segments():
+    assert split_on_silence(hiss(2), RATE) == []
+    assert split_on_silence(b'', RATE) == []
+
+
+def test_streaming_vad_marks_start_and_end():
+    vad = StreamingVAD(frame_ms=20, start_ms=60, end_ms=200)
+    frame = frame_bytes(RATE, 20)
+    pcm = hiss(0.5) + tone(1) + hiss(0.5, seed=5)
+    events = [(i, vad.push(pcm[i * frame:(i + 1) * frame])) for i in range(len(pcm) // frame)]
+    events = [(i, event) for i, event in events if event]
+    assert [event for _, event in events] == ['start', 'end']
+    (start, _), (end, _) = events
+    assert 25 <= start <= 30   # speech begins at frame 25, confirmed after 3 frames
+    assert 75 <= end <= 86     # speech ends at frame 75, confirmed after 10 silent frames
@@ -0,0 +1,38 @@
+"""Tests for voice_listen.RingBuffer against a plain bytes reference."""
+
+import random
+
+from voice_listen import RingBuffer
+
+
+def test_reads_match_a_reference_across_wraparound():
+    rng = random.Random(0)
+    ring = RingBuffer(100)
+    stream = b''
+    for _ in range(500):
+        chunk = rng.randbytes(rng.randint(0, 130))
+        ring.write(chunk)
+        stream += chunk
+        assert ring.end == len(stream)
+        assert ring.start == max(0, len(stream) - 100)
+        start = rng.randint(0, len(stream))
+        end = rng.randint(start, len(stream))
+        assert ring.read(start, end) == stream[max(start, ring.start):end]
+
+
+def test_read_clamps_to_what_is_still_held():
+    ring = RingBuffer(4)
+    ring.write(b'abcdef')
+    assert ring.start == 2
+    assert ring.read(0) == b'cdef'
+    assert ring.read(3, 5) == b'de'
+    assert ring.read(5, 5) == b''
+    assert ring.read(0, 1) == b''
+
+
+def test_write_larger_than_capacity_keeps_the_tail():
+    ring = RingBuffer(3)
+    ring.write(b'x')
+    ring.write(b'0123456789')
+    assert ring.end == 11
+    assert ring.read(0) == b'789'
@@ -0,0 +1,58 @@
+"""Tests for talk mode's SentenceSplitter."""
+
+from voice_talk import SentenceSplitter
+
+
+def split(text, step=3, **kwargs):
+    """Feed text in small deltas, like a streamed reply, and collect every sentence."""
+    splitter = SentenceSplitter(**kwargs)
+    sentences = []
+    for i in range(0, len(text), step):
+        sentences += splitter.feed(text[i:i + step])
+    return sentences + splitter.flush()
+
+
+def test_splits_at_sentence_ends_and_newlines():
+    assert split("Hello there. How are you? Fine!\nNext line") == \
+        ['Hello there.', 'How are you?', 'Fine!', 'Next line']
+
+
+def test_first_chunk_is_cut_early_at_a_clause():
+    text = ("This opening sentence runs on for quite a while, well past the first chunk limit and "
+            "then some more, so that playback would wait far too long for its end.")
+    sentences = split(text, first_chunk_chars=60, max_chunk_chars=250)
+    assert sentences[0] == "This opening sentence runs on for quite a while,"
+    assert ' '.join(sentences) == text
+
+
+def test_long_text_without_punctuation_is_cut_at_words():
+    text = ' '.join(['word'] * 200)
+    sentences = split(text, first_chunk_chars=20, max_chunk_chars=50)
+    assert all(len(sentence) <= 50 for sentence in sentences)
+    assert ' '.join(sentences) == text
+
+
+def test_fenced_code_is_dropped():
+    text = "Here is the code:\n```python\nprint('a')\nx = 1\n```\nThat prints a. Done"
+    assert split(text) == ['Here is the code:', 'That prints a.', 'Done']
+
+
+def test_fence_markers_split_across_deltas():
+    text = "Run this:\n```\nrm -rf build\nmake\n```\nThen check."
+    for step in (1, 2, 4):
+        assert split(text, step=step) == ['Run this:', 'Then check.'], step
+
+
+def test_unclosed_fence_drops_the_rest():
+    assert split("Start. ```bash\necho hi\necho bye") == ['Start.']
+
+
+def test_inline_code_is_kept_for_speakable():
+    assert split("Use `ls -la` here. Ok") == ['Use `ls -la` here.', 'Ok']
+
+
+def test_flush_returns_the_remainder_once():
+    splitter = SentenceSplitter()
+    assert splitter.feed("No sentence end yet") == []
+    assert splitter.flush() == ['No sentence end yet']
+    assert splitter.flush() == []
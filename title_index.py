@@ -0,0 +1,193 @@
+"""
+Offline fuzzy title index for instant movie/TV lookup and autocomplete.
+
+Built from TMDB's daily ID export files (gzipped JSON lines such as
+movie_ids_MM_DD_YYYY.json.gz / tv_series_ids_MM_DD_YYYY.json.gz). Titles are
+normalized and split into character trigrams; an inverted index of compact
+integer arrays maps each trigram to the titles containing it. Queries score
+candidates by trigram overlap (Dice coefficient), weighted by TMDB popularity,
+with a bonus for prefix matches so the same index serves autocomplete.
+
+The exports only carry each entry's original title (original_title /
+original_name), not its translations. An English query for a foreign film
+("Spirited Away", "Parasite") either finds nothing or lands on an unrelated
+film whose original title happens to match or merely overlaps it, so `resolve`
+only answers locally when the best hit is above the threshold, contains every
+word of the query and is clearly ahead of the runner-up; everything else goes
+to TMDB search, which knows translated titles.
+"""
+
+import gzip
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Paths to TMDB ID exports (https://developer.themoviedb.org/docs/daily-id-exports)
+TITLE_INDEX_MOVIES = os.getenv('TITLE_INDEX_MOVIES')
+TITLE_INDEX_TV = os.getenv('TITLE_INDEX_TV')
+# Titles below this popularity are skipped to keep the index small
+TITLE_INDEX_MIN_POPULARITY = float(os.getenv('TITLE_INDEX_MIN_POPULARITY', 1.0))
+# Minimum score for a local hit to be trusted instead of asking TMDB
+TITLE_INDEX_MATCH_THRESHOLD = float(os.getenv('TITLE_INDEX_MATCH_THRESHOLD', 0.55))
+# ...and how far ahead of the runner-up it must be (same-title entries always count as ambiguous)
+TITLE_INDEX_AMBIGUITY_MARGIN = float(os.getenv('TITLE_INDEX_AMBIGUITY_MARGIN', 0.1))
+# Postings counted per query before common trigrams only rescore candidates
+_SEED_BUDGET = 12000
+_MAX_CANDIDATES = 200
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_title(title):
+    """Casefold, strip accents and punctuation, collapse whitespace."""
+    text = unicodedata.normalize('NFKD', title)
+    text = ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+    return _NON_ALNUM.sub(' ', text).strip()
+
+
+def trigrams(normalized):
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    """Trigram index over (TMDB ID, title, popularity) records."""
+
+    def __init__(self):
+        self.ids = array('i')
+        self.popularity = array('f')
+        self.trigram_counts = array('H')
+        self.titles = []
+        self._normalized = []
+        self._postings = {}  # trigram -> array('I') of record numbers, ascending
+        self._max_popularity = 1.0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, tmdb_id, title, popularity=0.0):
+        normalized = normalize_title(title)
+        if not normalized:
+            return
+        grams = trigrams(normalized)
+        record = len(self.ids)
+        self.ids.append(int(tmdb_id))
+        self.popularity.append(float(popularity))
+        self.trigram_counts.append(min(len(grams), 65535))
+        self.titles.append(title)
+        self._normalized.append(normalized)
+        self._max_popularity = max(self._max_popularity, float(popularity))
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is None:
+                posting = self._postings[gram] = array('I')
+            posting.append(record)
+
+    @classmethod
+    def from_export(cls, path, min_popularity=TITLE_INDEX_MIN_POPULARITY):
+        """Build an index from a TMDB ID export (.json.gz or plain JSON lines)."""
+        index = cls()
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if row.get('adult') or row.get('video'):
+                    continue
+                popularity = row.get('popularity') or 0.0
+                if popularity < min_popularity:
+                    continue
+                title = row.get('original_title') or row.get('original_name')
+                if title:
+                    index.add(row['id'], title, popularity)
+        logger.info(f"Title index: {len(index)} titles from {os.path.basename(path)}")
+        return index
+
+    def search(self, query, limit=10):
+        """Return up to `limit` (tmdb_id, title, popularity, score) tuples, best first."""
+        normalized = normalize_title(query)
+        if not normalized:
+            return []
+        query_grams = trigrams(normalized)
+        postings = sorted(
+            (self._postings[g] for g in query_grams if g in self._postings),
+            key=len
+        )
+        if not postings:
+            return []
+
+        # Count overlaps from the rarest trigrams (C-speed Counter), then only
+        # re-check the best candidates against the very common ones
+        shared = Counter()
+        seeded = 0
+        common = []
+        for posting in postings:
+            if not seeded or seeded + len(posting) <= _SEED_BUDGET:
+                shared.update(posting)
+                seeded += len(posting)
+            else:
+                common.append(posting)
+        candidates = dict(shared.most_common(_MAX_CANDIDATES))
+        for posting in common:
+            size = len(posting)
+            for record in candidates:
+                i = bisect_left(posting, record)
+                if i < size and posting[i] == record:
+                    candidates[record] += 1
+
+        query_size = len(query_grams)
+        log_max = math.log1p(self._max_popularity)
+        scored = []
+        for record, overlap in candidates.items():
+            similarity = 2.0 * overlap / (query_size + self.trigram_counts[record])
+            title = self._normalized[record]
+            if title == normalized:
+                similarity += 0.5
+            elif title.startswith(normalized):
+                similarity += 0.25
+            weight = 0.85 + 0.15 * (math.log1p(self.popularity[record]) / log_max)
+            scored.append((similarity * weight, record))
+
+        best = heapq.nlargest(limit, scored)
+        return [(self.ids[r], self.titles[r], self.popularity[r], round(score, 4)) for score, r in best]
+
+    def resolve(self, query, threshold=TITLE_INDEX_MATCH_THRESHOLD, margin=TITLE_INDEX_AMBIGUITY_MARGIN):
+        """Return the TMDB ID of a confident, unambiguous match, or None to fall back to TMDB search."""
+        hits = self.search(query, limit=2)
+        if not hits or hits[0][3] < threshold:
+            return None
+        # "Spirited Away" must not settle for "Spirited"
+        if not set(normalize_title(query).split()) <= set(normalize_title(hits[0][1]).split()):
+            return None
+        if len(hits) > 1:
+            best, runner_up = hits
+            if normalize_title(best[1]) == normalize_title(runner_up[1]) or best[3] - runner_up[3] < margin:
+                return None
+        return hits[0][0]
+
+
+def load_indexes(movie_path=TITLE_INDEX_MOVIES, tv_path=TITLE_INDEX_TV):
+    """Load {'movie': TitleIndex, 'tv': TitleIndex} from the configured export files."""
+    indexes = {}
+    for media_type, path in (('movie', movie_path), ('tv', tv_path)):
+        if not path:
+            continue
+        if not os.path.exists(path):
+            logger.warning(f"Title index file not found: {path}")
+            continue
+        try:
+            indexes[media_type] = TitleIndex.from_export(path)
+        except Exception as e:
+            logger.error(f"Failed to load {media_type} title index: {e}")
+    return indexes
@@ -0,0 +1,81 @@
+"""
+Async TMDB client for the bot's !movie, !tv and !tvepisode commands.
+
+Calls the TMDB v3 REST API over the bot's shared HTTP pool (http_client.py), so lookups
+never block the Discord event loop. Details and external IDs come back in one
+request (append_to_response=external_ids), and both search results and details
+are kept in TTL caches so popular titles resolve without any network I/O;
+concurrent misses for the same lookup share one request (single_flight.py).
+"""
+
+import logging
+import os
+import re
+
+from http_client import HTTPError, http
+from response_cache import ResponseCache
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+TMDB_API_KEY = os.getenv('TMDB_API_KEY', 'ae4bd1b6fce2a5648671bfc171d15ba4')
+TMDB_LANGUAGE = os.getenv('TMDB_LANGUAGE', 'en')
+TMDB_BASE_URL = 'https://api.themoviedb.org/3'
+TMDB_TIMEOUT = 10
+# Search results change slowly; details (ratings, episode counts) a little faster
+TMDB_SEARCH_TTL = float(os.getenv('TMDB_SEARCH_TTL', 3600))
+TMDB_DETAILS_TTL = float(os.getenv('TMDB_DETAILS_TTL', 6 * 3600))
+TMDB_CACHE_MAX_MB = float(os.getenv('TMDB_CACHE_MAX_MB', 16))
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+class TMDBError(Exception):
+    pass
+
+
+class TMDBClient:
+    """Minimal async TMDB client over the shared HTTP client, with TTL caches."""
+
+    def __init__(self, api_key=TMDB_API_KEY, language=TMDB_LANGUAGE, client=http):
+        self.api_key = api_key
+        self.language = language
+        self.http = client
+        self.cache = ResponseCache(max_bytes=int(TMDB_CACHE_MAX_MB * 1024 * 1024), default_ttl=TMDB_DETAILS_TTL)
+        self.flight = SingleFlight()
+
+    async def _get(self, path, **params):
+        params = {'api_key': self.api_key, 'language': self.language, **params}
+        try:
+            return await self.http.get_json(f"{TMDB_BASE_URL}{path}", params=params, timeout=TMDB_TIMEOUT)
+        except HTTPError as e:
+            raise TMDBError(f"TMDB returned HTTP {e.status} for {path}")
+
+    async def search(self, media_type, query):
+        """Return the list of search result dicts for 'movie' or 'tv'."""
+        normalized = _WHITESPACE.sub(' ', query).strip().casefold()
+        key = f"search:{media_type}:{self.language}:{normalized}"
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        return await self.flight.do(key, lambda: self._search(key, media_type, query))
+
+    async def _search(self, key, media_type, query):
+        data = await self._get(f"/search/{media_type}", query=query, include_adult='false')
+        results = (data or {}).get('results', [])
+        self.cache.put(key, results, ttl=TMDB_SEARCH_TTL)
+        return results
+
+    async def details(self, media_type, tmdb_id):
+        """Return the details dict (with an 'external_ids' entry) or None if not found."""
+        key = f"details:{media_type}:{self.language}:{int(tmdb_id)}"
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        return await self.flight.do(key, lambda: self._details(key, media_type, int(tmdb_id)))
+
+    async def _details(self, key, media_type, tmdb_id):
+        data = await self._get(f"/{media_type}/{tmdb_id}", append_to_response='external_ids')
+        if data is not None:
+            self.cache.put(key, data)
+        return data
@@ -0,0 +1,103 @@
+"""
+Chunked, parallel speech-to-text for !transcribe (and live !listen utterances).
+
+An attachment is decoded to 16 kHz mono PCM in memory (ffmpeg over pipes) and
+split at pauses by the energy VAD in vad.py. Both steps run in the process
+pool. The segments are recognized concurrently, up to TRANSCRIBE_CONCURRENCY
+at a time, and the text is stitched back in order. Long recordings therefore
+take about as long as their slowest segment rather than the whole clip, and
+no single request exceeds the recognizer's length limit.
+
+The recognizer is any blocking callable `(pcm, sample_rate) -> str` that
+returns '' for silence. Google's free web API is the default; tests and
+benchmarks can pass a local stand-in.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+import speech_recognition as sr
+
+from audio_pipeline import RECOGNIZER_SAMPLE_RATE, decode_segments
+from executors import cpu_pool, io_pool
+from vad import SAMPLE_WIDTH, VAD_MAX_SEGMENT_S
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIBE_CONCURRENCY = int(os.getenv('TRANSCRIBE_CONCURRENCY', 4))
+TRANSCRIBE_LANGUAGE = os.getenv('TRANSCRIBE_LANGUAGE', 'en-US')
+# Placeholder for a segment the recognizer failed on
+_GAP = '[…]'
+
+
+class NoSpeech(Exception):
+    """Raised when a recording contains no recognisable speech."""
+
+
+def recognize_google(pcm, sample_rate, language=TRANSCRIBE_LANGUAGE):
+    """Recognize one segment with Google's web speech API ('' if nothing was understood)."""
+    audio = sr.AudioData(pcm, sample_rate, SAMPLE_WIDTH)
+    try:
+        return sr.Recognizer().recognize_google(audio, language=language)
+    except sr.UnknownValueError:
+        return ''
+
+
+class Transcriber:
+    """Decode, segment and recognize audio with a pluggable recognizer."""
+
+    def __init__(self, recognize_fn=recognize_google, concurrency=TRANSCRIBE_CONCURRENCY,
+                 sample_rate=RECOGNIZER_SAMPLE_RATE, max_segment_s=VAD_MAX_SEGMENT_S):
+        self.recognize_fn = recognize_fn
+        self.sample_rate = sample_rate
+        self.max_segment_s = max_segment_s
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.transcribed = 0
+        self.segments = 0
+        self.failed_segments = 0
+        self.audio_seconds = 0.0
+        # Recent wall-clock time per second of audio, for stats
+        self._speed = deque(maxlen=100)
+
+    async def recognize(self, pcm):
+        """Recognize one PCM segment in the I/O pool."""
+        async with self._semaphore:
+            return await io_pool.run(self.recognize_fn, pcm, self.sample_rate)
+
+    async def transcribe(self, audio_bytes):
+        """Return the text of an encoded recording; raises NoSpeech if nothing was understood."""
+        started = time.monotonic()
+        duration, segments = await cpu_pool.run(decode_segments, audio_bytes, self.sample_rate, self.max_segment_s)
+        if not segments:
+            raise NoSpeech()
+        results = await asyncio.gather(*[self.recognize(pcm) for _, pcm in segments], return_exceptions=True)
+        errors = [r for r in results if isinstance(r, Exception)]
+        self.segments += len(segments)
+        self.failed_segments += len(errors)
+        for (start, _), result in zip(segments, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Transcription of segment at {start:.1f}s failed: {result}")
+        if not any(isinstance(r, str) and r.strip() for r in results):
+            if errors:
+                raise errors[0]
+            raise NoSpeech()
+        text = ' '.join(_GAP if isinstance(r, Exception) else r.strip() for r in results
+                        if isinstance(r, Exception) or r.strip())
+        self.transcribed += 1
+        self.audio_seconds += duration
+        if duration:
+            self._speed.append((time.monotonic() - started) / duration)
+        return text
+
+    def stats(self):
+        speed = sorted(self._speed)
+        return {
+            'transcribed': self.transcribed,
+            'segments': self.segments,
+            'failed_segments': self.failed_segments,
+            'audio_seconds': round(self.audio_seconds, 1),
+            'seconds_per_audio_second_p50': round(speed[len(speed) // 2], 3) if speed else None,
+        }
@@ -0,0 +1,136 @@
+"""
+Text-to-speech for the bot: edge-tts streamed straight into memory.
+
+Long text is split at sentence boundaries into chunks that are synthesized
+concurrently and concatenated (edge-tts returns plain MP3 frames, which join
+cleanly). Each chunk starts on the primary voice and a backup voice is only
+hedged in if nothing came back within TTS_HEDGE_DELAY seconds, or right away
+if the primary failed. If any chunk ends up on a backup voice, the others are
+redone in it, so one file is one voice. Chunks are cached by (voice, text), so
+repeated phrases are instant. Output can optionally be re-encoded as Opus to
+shrink uploads.
+"""
+
+import asyncio
+import logging
+import os
+import re
+from functools import partial
+
+import edge_tts
+
+from audio_pipeline import mp3_to_opus
+from executors import cpu_pool
+from hedging import race_async
+from response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+# Primary voice first, then backups
+TTS_VOICES = [v.strip() for v in os.getenv(
+    'TTS_VOICES', 'en-IN-NeerjaNeural,en-US-JennyNeural,en-GB-SoniaNeural').split(',') if v.strip()]
+TTS_HEDGE_DELAY = float(os.getenv('TTS_HEDGE_DELAY', 1.5))
+TTS_CHUNK_CHARS = int(os.getenv('TTS_CHUNK_CHARS', 300))
+TTS_CONCURRENCY = int(os.getenv('TTS_CONCURRENCY', 4))
+TTS_CACHE_MB = float(os.getenv('TTS_CACHE_MB', 32))
+TTS_CACHE_TTL = float(os.getenv('TTS_CACHE_TTL', 24 * 3600))
+# 'mp3' or 'opus' (Ogg/Opus, about half the size)
+TTS_FORMAT = os.getenv('TTS_FORMAT', 'mp3')
+
+_SENTENCE_END = re.compile(r'(?<=[.!?…।])\s+|\n+')
+
+
+def split_sentences(text, max_chars=TTS_CHUNK_CHARS):
+    """Pack whole sentences into chunks of at most max_chars (over-long sentences are split at spaces)."""
+    chunks = []
+    current = ''
+    for sentence in _SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def synthesize(text, voice):
+    """Stream one edge-tts request into memory and return the MP3 bytes."""
+    parts = []
+    async for chunk in edge_tts.Communicate(text, voice).stream():
+        if chunk['type'] == 'audio':
+            parts.append(chunk['data'])
+    return b''.join(parts)
+
+
+class TTSEngine:
+    """Chunked, hedged and cached edge-tts synthesis."""
+
+    def __init__(self, voices=None, hedge_delay=TTS_HEDGE_DELAY, concurrency=TTS_CONCURRENCY,
+                 synthesize_fn=synthesize):
+        self.voices = list(voices or TTS_VOICES)
+        self.hedge_delay = hedge_delay
+        self.synthesize_fn = synthesize_fn
+        self.cache = ResponseCache(max_bytes=int(TTS_CACHE_MB * 1024 * 1024), default_ttl=TTS_CACHE_TTL)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.backup_used = 0
+
+    async def synthesize_chunk(self, text, voices=None):
+        """Return (voice, mp3_bytes) for one chunk, from the cache or a hedged request.
+
+        `voices` narrows the race to those voices (default: all, primary first).
+        """
+        pinned = voices is not None
+        voices = voices or self.voices
+        for voice in voices:
+            cached = self.cache.get(f"{voice}\0{text}")
+            if cached is not None:
+                return voice, cached
+        attempts = [(voice, partial(self.synthesize_fn, text, voice)) for voice in voices]
+        async with self._semaphore:
+            voice, audio = await race_async(attempts, delay=self.hedge_delay, is_valid=bool)
+        if voice != self.voices[0] and not pinned:
+            self.backup_used += 1
+            logger.warning(f"TTS used backup voice {voice}")
+        self.cache.put(f"{voice}\0{text}", audio, size=len(audio))
+        return voice, audio
+
+    async def speak(self, text, fmt=TTS_FORMAT):
+        """Synthesize text; returns (audio_bytes, file_extension, voices_used)."""
+        chunks = split_sentences(text) or [text]
+        results = list(await asyncio.gather(*[self.synthesize_chunk(chunk) for chunk in chunks]))
+        # Chunks race voices independently; once one falls back, redo the others
+        # in that voice so the file doesn't switch speakers halfway through
+        fallback = next((voice for voice, _ in results if voice != self.voices[0]), None)
+        if fallback is not None:
+            mismatched = [i for i, (voice, _) in enumerate(results) if voice != fallback]
+            redone = await asyncio.gather(*[self.synthesize_chunk(chunks[i], voices=[fallback]) for i in mismatched],
+                                          return_exceptions=True)
+            for i, result in zip(mismatched, redone):
+                if isinstance(result, Exception):
+                    logger.warning(f"TTS could not redo a chunk in {fallback}, keeping {results[i][0]}: {result}")
+                else:
+                    results[i] = result
+        audio = b''.join(chunk_audio for _, chunk_audio in results)
+        voices_used = {voice for voice, _ in results}
+        if fmt == 'opus':
+            try:
+                return await cpu_pool.run(mp3_to_opus, audio), 'ogg', voices_used
+            except Exception as e:
+                logger.warning(f"Opus encode failed, sending MP3: {e}")
+        return audio, 'mp3', voices_used
+
+    def stats(self):
+        return {'voices': self.voices, 'backup_used': self.backup_used, 'cache': self.cache.stats()}
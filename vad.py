@@ -0,0 +1,156 @@
+"""
+Energy-based voice activity detection on 16-bit mono PCM.
+
+Audio is measured in short frames (VAD_FRAME_MS). A frame counts as speech
+when it is louder than both VAD_SILENCE_DB and a threshold set from the
+recording's own noise floor and loud frames (speech_threshold), so quiet
+recordings and noisy ones both split sensibly. `split_on_silence` cuts a whole
+recording at pauses into segments short enough to recognize quickly and in
+parallel; `StreamingVAD` makes the same decision frame by frame for live
+voice. It is plain stdlib (audioop), so it runs in the process pool without
+extra dependencies.
+"""
+
+import math
+import os
+
+try:
+    import audioop
+except ImportError:  # Python 3.13+: the same module as shipped for pydub
+    import pyaudioop as audioop
+
+SAMPLE_WIDTH = 2
+VAD_FRAME_MS = int(os.getenv('VAD_FRAME_MS', 30))
+VAD_SILENCE_DB = float(os.getenv('VAD_SILENCE_DB', -45))
+VAD_FLOOR_MARGIN_DB = float(os.getenv('VAD_FLOOR_MARGIN_DB', 8))
+# A pause at least this long is a place to cut
+VAD_MIN_SILENCE_MS = int(os.getenv('VAD_MIN_SILENCE_MS', 300))
+# Speech kept on each side of a cut
+VAD_PAD_MS = int(os.getenv('VAD_PAD_MS', 150))
+VAD_MAX_SEGMENT_S = float(os.getenv('VAD_MAX_SEGMENT_S', 15))
+# Live audio: voiced time before an utterance starts, silence before it ends
+VAD_START_MS = int(os.getenv('VAD_START_MS', 60))
+VAD_END_SILENCE_MS = int(os.getenv('VAD_END_SILENCE_MS', 700))
+
+_FULL_SCALE = 32768
+
+
+def frame_bytes(sample_rate, frame_ms=VAD_FRAME_MS):
+    return sample_rate * frame_ms // 1000 * SAMPLE_WIDTH
+
+
+def level_db(pcm):
+    """RMS level of a PCM chunk in dBFS (-inf dB is reported as -100)."""
+    rms = audioop.rms(pcm, SAMPLE_WIDTH) if pcm else 0
+    return 20 * math.log10(rms / _FULL_SCALE) if rms else -100.0
+
+
+def frame_levels(pcm, sample_rate, frame_ms=VAD_FRAME_MS):
+    size = frame_bytes(sample_rate, frame_ms)
+    return [level_db(pcm[i:i + size]) for i in range(0, len(pcm) - size + 1, size)]
+
+
+def speech_threshold(levels, silence_db=VAD_SILENCE_DB, margin_db=VAD_FLOOR_MARGIN_DB):
+    """dBFS above which a frame is speech.
+
+    That is the noise floor (10th percentile) plus a margin, but never more
+    than the margin below the loud frames (90th percentile), so a recording
+    that is nearly all speech is not treated as silence.
+    """
+    if not levels:
+        return silence_db
+    ordered = sorted(levels)
+    floor, loud = ordered[len(ordered) // 10], ordered[len(ordered) * 9 // 10]
+    return max(silence_db, min(floor + margin_db, loud - margin_db))
+
+
+def split_on_silence(pcm, sample_rate, max_segment_s=VAD_MAX_SEGMENT_S, min_silence_ms=VAD_MIN_SILENCE_MS,
+                     pad_ms=VAD_PAD_MS, frame_ms=VAD_FRAME_MS):
+    """Cut PCM at pauses; returns (start_byte, end_byte) spans that contain speech, in order.
+
+    Each span is at most max_segment_s long. Cuts go in the middle of the
+    last pause that keeps under that limit; a stretch with no pause at all
+    is cut at its quietest frame. Leading, trailing and all-silent stretches
+    are dropped.
+    """
+    size = frame_bytes(sample_rate, frame_ms)
+    levels = frame_levels(pcm, sample_rate, frame_ms)
+    if not levels:
+        return []
+    threshold = speech_threshold(levels)
+    voiced = [level > threshold for level in levels]
+    max_frames = max(1, int(max_segment_s * 1000 / frame_ms))
+    min_silence = max(1, min_silence_ms // frame_ms)
+    pad = pad_ms // frame_ms
+
+    # Pauses as (start_frame, end_frame) runs of unvoiced frames
+    pauses = []
+    run_start = None
+    for i, is_voiced in enumerate(voiced + [True]):
+        if not is_voiced and run_start is None:
+            run_start = i
+        elif is_voiced and run_start is not None:
+            if i - run_start >= min_silence or run_start == 0 or i == len(voiced):
+                pauses.append((run_start, i))
+            run_start = None
+
+    spans = []
+    start = 0
+    while start < len(voiced):
+        end = min(len(voiced), start + max_frames)
+        if end < len(voiced):
+            # Last pause whose midpoint keeps this segment under the limit
+            inside = [(a + b) // 2 for a, b in pauses if start < (a + b) // 2 < end]
+            if inside:
+                end = inside[-1]
+            else:
+                tail = range(start + max_frames // 2, end)
+                end = min(tail, key=lambda i: levels[i]) + 1
+        if any(voiced[start:end]):
+            first = next(i for i in range(start, end) if voiced[i])
+            last = next(i for i in range(end - 1, start - 1, -1) if voiced[i])
+            spans.append((max(start, first - pad) * size, min(end, last + 1 + pad) * size))
+        start = end
+    return spans
+
+
+class StreamingVAD:
+    """Frame-by-frame speech start/end decisions for live audio.
+
+    The noise floor starts at VAD_SILENCE_DB, drops at once to quieter frames
+    and creeps up slowly during silence only, so long speech never becomes the
+    floor. Speech starts after start_ms of voiced frames and ends after
+    end_ms of unvoiced ones.
+    """
+
+    def __init__(self, frame_ms=20, start_ms=VAD_START_MS, end_ms=VAD_END_SILENCE_MS,
+                 silence_db=VAD_SILENCE_DB, margin_db=VAD_FLOOR_MARGIN_DB):
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.end_frames = max(1, end_ms // frame_ms)
+        self.silence_db = silence_db
+        self.margin_db = margin_db
+        self.floor = silence_db
+        self.in_speech = False
+        self._run = 0
+
+    def push(self, pcm):
+        """Feed one frame; returns 'start', 'end' or None."""
+        level = level_db(pcm)
+        voiced = level > max(self.silence_db, self.floor + self.margin_db)
+        if level < self.floor:
+            self.floor = level
+        elif not voiced:
+            self.floor += (level - self.floor) * 0.05
+        # Count frames that disagree with the current state
+        self._run = self._run + 1 if voiced != self.in_speech else 0
+        if not self.in_speech and self._run >= self.start_frames:
+            self.in_speech, self._run = True, 0
+            return 'start'
+        if self.in_speech and self._run >= self.end_frames:
+            self.in_speech, self._run = False, 0
+            return 'end'
+        return None
+
+    def reset(self):
+        self.in_speech = False
+        self._run = 0
@@ -0,0 +1,305 @@
+"""
+Live voice receive for !listen: per-speaker VAD and streaming transcription.
+
+Receiving needs the discord-ext-voice-recv package (discord.py 2.5+) and
+libopus, both shipped in the bot image; without the package
+`RECEIVE_AVAILABLE` is False and the bot says so. Packets arrive on the
+library's router thread as Opus. Each speaker has their own decoder. Audio
+is downmixed and resampled to 16 kHz mono into a fixed-size ring buffer, and
+a StreamingVAD marks utterance starts and ends. A finished utterance (or one
+that fills the buffer) is handed to the event loop and recognized while the
+speaker keeps talking. Transcripts are posted as they come back.
+
+Memory per session is bounded by LISTEN_MAX_SPEAKERS ring buffers of
+LISTEN_MAX_UTTERANCE_S each plus at most LISTEN_MAX_PENDING utterances
+waiting for the recognizer, however long the session runs. Decode, resample
+and VAD CPU time is measured per speaker.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import discord
+
+from audio_pipeline import RECOGNIZER_SAMPLE_RATE
+from vad import SAMPLE_WIDTH, StreamingVAD, audioop
+
+try:
+    from discord.ext import voice_recv
+    RECEIVE_AVAILABLE = True
+except ImportError:
+    voice_recv = None
+    RECEIVE_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+LISTEN_MAX_SECONDS = int(os.getenv('LISTEN_MAX_SECONDS', 120))
+LISTEN_MAX_SPEAKERS = int(os.getenv('LISTEN_MAX_SPEAKERS', 8))
+LISTEN_MAX_UTTERANCE_S = float(os.getenv('LISTEN_MAX_UTTERANCE_S', 15))
+LISTEN_MAX_PENDING = int(os.getenv('LISTEN_MAX_PENDING', 8))
+# Audio kept from before speech was detected, so first syllables are not clipped
+LISTEN_PREROLL_MS = int(os.getenv('LISTEN_PREROLL_MS', 300))
+# Utterances shorter than this are clicks and coughs, not words
+LISTEN_MIN_UTTERANCE_MS = int(os.getenv('LISTEN_MIN_UTTERANCE_MS', 300))
+
+# Discord voice: 48 kHz stereo, 20 ms per packet
+DISCORD_SAMPLE_RATE = 48000
+DISCORD_CHANNELS = 2
+FRAME_MS = 20
+
+# Recent per-speaker CPU use (% of one core), for stats
+_cpu_samples = deque(maxlen=100)
+_sessions = set()
+
+
+def voice_client_class():
+    """The VoiceClient class to connect with (one that can receive, when available).
+
+    VoiceRecvClient subclasses discord.VoiceClient, so playback is unchanged.
+    """
+    return voice_recv.VoiceRecvClient if RECEIVE_AVAILABLE else discord.VoiceClient
+
+
+if not RECEIVE_AVAILABLE:
+    logger.warning("discord-ext-voice-recv is not installed: voice connections can't receive, !listen is off")
+
+
+def can_receive(voice_client):
+    return RECEIVE_AVAILABLE and isinstance(voice_client, voice_recv.VoiceRecvClient)
+
+
+class RingBuffer:
+    """Fixed-size byte ring addressed by absolute stream positions."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = bytearray(capacity)
+        self.end = 0
+
+    @property
+    def start(self):
+        """Oldest position still held."""
+        return max(0, self.end - self.capacity)
+
+    def write(self, data):
+        if len(data) > self.capacity:
+            self.end += len(data) - self.capacity
+            data = data[-self.capacity:]
+        offset = self.end % self.capacity
+        first = min(len(data), self.capacity - offset)
+        self._data[offset:offset + first] = data[:first]
+        self._data[:len(data) - first] = data[first:]
+        self.end += len(data)
+
+    def read(self, start, end=None):
+        """Bytes from absolute position start (clamped to what is still held) to end."""
+        end = self.end if end is None else end
+        start = max(start, self.start)
+        if end <= start:
+            return b''
+        offset = start % self.capacity
+        if offset + end - start <= self.capacity:
+            return bytes(self._data[offset:offset + end - start])
+        return bytes(self._data[offset:] + self._data[:offset + end - start - self.capacity])
+
+
+class SpeakerStream:
+    """One speaker's decoder, ring buffer and VAD; push frames in, get utterances out."""
+
+    def __init__(self, decoder=None, sample_rate=RECOGNIZER_SAMPLE_RATE, max_utterance_s=LISTEN_MAX_UTTERANCE_S):
+        self.decoder = decoder
+        self.sample_rate = sample_rate
+        self.bytes_per_ms = sample_rate * SAMPLE_WIDTH // 1000
+        self.preroll = LISTEN_PREROLL_MS * self.bytes_per_ms
+        self.max_utterance = int(max_utterance_s * 1000) * self.bytes_per_ms
+        self.ring = RingBuffer(self.max_utterance + self.preroll)
+        self.vad = StreamingVAD(frame_ms=FRAME_MS)
+        self.utterance_start = None
+        self._ratecv_state = None
+        self.last_audio = time.monotonic()
+        self.cpu_seconds = 0.0
+        self.audio_seconds = 0.0
+        self.utterances = 0
+
+    def push_opus(self, packet):
+        """Decode one Opus packet and push it; returns a finished utterance (PCM) or None.
+
+        None stands for a lost packet: the decoder conceals it with a frame of
+        its own, so the timeline (and the VAD's silence counts) stay intact.
+        """
+        started = time.thread_time()
+        pcm = self.decoder.decode(packet)
+        self.cpu_seconds += time.thread_time() - started
+        return self.push(pcm)
+
+    def push(self, pcm):
+        """Push one frame of 48 kHz stereo PCM; returns a finished utterance (PCM) or None."""
+        started = time.thread_time()
+        try:
+            self.last_audio = time.monotonic()
+            self.audio_seconds += len(pcm) / (DISCORD_SAMPLE_RATE * DISCORD_CHANNELS * SAMPLE_WIDTH)
+            mono = audioop.tomono(pcm, SAMPLE_WIDTH, 0.5, 0.5)
+            mono, self._ratecv_state = audioop.ratecv(mono, SAMPLE_WIDTH, 1, DISCORD_SAMPLE_RATE,
+                                                      self.sample_rate, self._ratecv_state)
+            self.ring.write(mono)
+            event = self.vad.push(mono)
+            if event == 'start':
+                voiced = self.vad.start_frames * FRAME_MS * self.bytes_per_ms
+                self.utterance_start = max(self.ring.start, self.ring.end - voiced - self.preroll)
+            elif event == 'end':
+                # Drop most of the silence that confirmed the end
+                return self.cut(trim_ms=max(0, self.vad.end_frames * FRAME_MS - LISTEN_PREROLL_MS))
+            elif self.utterance_start is not None and self.ring.end - self.utterance_start >= self.max_utterance:
+                # Still talking but the buffer is full: send what we have and carry on
+                utterance = self.cut()
+                self.utterance_start = self.ring.end
+                return utterance
+            return None
+        finally:
+            self.cpu_seconds += time.thread_time() - started
+
+    def idle(self, now, end_silence_ms):
+        """End the current utterance if no packets came for end_silence_ms (Discord stops sending in silence)."""
+        if self.utterance_start is not None and (now - self.last_audio) * 1000 >= end_silence_ms:
+            self.vad.reset()
+            return self.cut()
+        return None
+
+    def cut(self, trim_ms=0):
+        """Take the current utterance out of the buffer (None if there is none or it is too short)."""
+        if self.utterance_start is None:
+            return None
+        pcm = self.ring.read(self.utterance_start, self.ring.end - trim_ms * self.bytes_per_ms)
+        self.utterance_start = None
+        if len(pcm) < LISTEN_MIN_UTTERANCE_MS * self.bytes_per_ms + self.preroll:
+            return None
+        self.utterances += 1
+        return pcm
+
+    def cpu_percent(self):
+        """CPU time spent per second of received audio, as % of one core."""
+        return round(100 * self.cpu_seconds / self.audio_seconds, 2) if self.audio_seconds else 0.0
+
+
+class ListenSession:
+    """Receive a voice channel for a while and post each speaker's utterances as text.
+
+    `recognize` is an async callable (pcm) -> str, e.g. Transcriber.recognize;
+    `post` is an async callable (user, text).
+    """
+
+    def __init__(self, voice_client, recognize, post, max_speakers=LISTEN_MAX_SPEAKERS,
+                 max_pending=LISTEN_MAX_PENDING, make_decoder=None):
+        self.voice_client = voice_client
+        self.recognize = recognize
+        self.post = post
+        self.max_speakers = max_speakers
+        self.max_pending = max_pending
+        self.make_decoder = make_decoder or discord.opus.Decoder
+        self.speakers = {}
+        self.users = {}
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._loop = None
+        self.ignored_speakers = 0
+        self.dropped = 0
+        self.posted = 0
+
+    def on_audio(self, user, data):
+        """Sink callback (router thread): decode and segment one packet."""
+        if user is None:
+            return
+        with self._lock:
+            speaker = self.speakers.get(user.id)
+            if not data.opus:
+                # The jitter buffer gave up on a packet; only conceal it mid-stream
+                if speaker is None:
+                    return
+            elif speaker is None:
+                if len(self.speakers) >= self.max_speakers:
+                    self.ignored_speakers += 1
+                    return
+                speaker = self.speakers[user.id] = SpeakerStream(self.make_decoder())
+                self.users[user.id] = user
+            try:
+                utterance = speaker.push_opus(data.opus or None)
+            except discord.opus.OpusError as e:
+                logger.warning(f"Opus decode failed for {user}: {e}")
+                return
+        if utterance:
+            self._loop.call_soon_threadsafe(self._submit, user, utterance)
+
+    def _submit(self, user, pcm):
+        if len(self._pending) >= self.max_pending:
+            # The recognizer is behind: drop rather than queue without bound
+            self.dropped += 1
+            return
+        task = asyncio.ensure_future(self._recognize(user, pcm))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _recognize(self, user, pcm):
+        try:
+            text = await self.recognize(pcm)
+        except Exception as e:
+            logger.warning(f"Live recognition failed for {user}: {e}")
+            return
+        if text and text.strip():
+            self.posted += 1
+            await self.post(user, text.strip())
+
+    def _sweep(self, flush=False):
+        """Cut utterances whose speaker went quiet (or all of them when flushing)."""
+        now = time.monotonic()
+        with self._lock:
+            finished = []
+            for user_id, speaker in self.speakers.items():
+                utterance = speaker.cut() if flush else speaker.idle(now, speaker.vad.end_frames * FRAME_MS)
+                if utterance:
+                    finished.append((self.users[user_id], utterance))
+        for user, utterance in finished:
+            self._submit(user, utterance)
+
+    async def run(self, duration):
+        """Listen for duration seconds, then finish recognizing what was said."""
+        self._loop = asyncio.get_running_loop()
+        _sessions.add(self)
+        self.voice_client.listen(voice_recv.BasicSink(self.on_audio, decode=False))
+        try:
+            deadline = self._loop.time() + duration
+            while self._loop.time() < deadline and self.voice_client.is_connected():
+                await asyncio.sleep(0.1)
+                self._sweep()
+        finally:
+            if self.voice_client.is_listening():
+                self.voice_client.stop_listening()
+            self._sweep(flush=True)
+            for speaker in self.speakers.values():
+                _cpu_samples.append(speaker.cpu_percent())
+            _sessions.discard(self)
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def buffered_bytes(self):
+        """Upper bound on audio memory held by this session."""
+        return sum(s.ring.capacity for s in self.speakers.values())
+
+    def speaker_stats(self):
+        return [{'user': str(self.users[user_id]), 'audio_s': round(s.audio_seconds, 1),
+                 'utterances': s.utterances, 'cpu_percent': s.cpu_percent()}
+                for user_id, s in self.speakers.items()]
+
+
+def stats():
+    samples = sorted(_cpu_samples)
+    return {
+        'available': RECEIVE_AVAILABLE,
+        'active_sessions': len(_sessions),
+        'buffered_bytes': sum(s.buffered_bytes() for s in _sessions),
+        'speaker_cpu_percent_p50': samples[len(samples) // 2] if samples else None,
+        'speaker_cpu_percent_max': samples[-1] if samples else None,
+    }
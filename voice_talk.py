@@ -0,0 +1,221 @@
+"""
+Voice-channel talk mode: speak a streamed AI answer while it is being written.
+
+The reply's text deltas are cut into sentences as they arrive. Each finished
+sentence goes to TTS straight away (tts.TTSEngine, so sentences synthesize
+concurrently and repeated ones come from its cache) and its audio is queued
+for the guild's voice client in order. The first sentence plays while later
+ones are still being generated, so first audio arrives after roughly one
+sentence of LLM output plus one short TTS request, not after the full answer.
+"""
+
+import asyncio
+import io
+import logging
+import re
+import time
+from collections import deque
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+# The first chunk is cut early (at a comma or space) so playback can start sooner
+TALK_FIRST_CHUNK_CHARS = 80
+TALK_MAX_CHUNK_CHARS = 250
+
+_SENTENCE_END = re.compile(r'[.!?…।](?:["\')\]]*)\s+|\n+')
+_FENCE = '```'
+# Markdown that should not be read aloud
+_MARKDOWN = re.compile(r'```.*?```|`|\*\*|__|~~|^#+\s*|^\s*[-*]\s+', re.DOTALL | re.MULTILINE)
+
+# Recent time-to-first-audio samples (seconds), for stats
+_first_audio = deque(maxlen=100)
+# Pipelines still playing (the event loop only keeps weak references to tasks)
+_active = set()
+
+
+class SentenceSplitter:
+    """Accumulates streamed text and hands back complete sentences.
+
+    Fenced code blocks are dropped as they stream in, so their lines are
+    never taken for sentences and read aloud.
+    """
+
+    def __init__(self, first_chunk_chars=TALK_FIRST_CHUNK_CHARS, max_chunk_chars=TALK_MAX_CHUNK_CHARS):
+        self.buffer = ''
+        self.first = True
+        self.first_chunk_chars = first_chunk_chars
+        self.max_chunk_chars = max_chunk_chars
+        self.in_fence = False
+        # Trailing backticks that may turn out to open or close a fence
+        self._held = ''
+
+    def _outside_fences(self, text):
+        text = self._held + text
+        backticks = len(text) - len(text.rstrip('`'))
+        self._held = text[len(text) - backticks:] if 0 < backticks < len(_FENCE) else ''
+        text = text[:len(text) - len(self._held)]
+        kept = []
+        while True:
+            fence = text.find(_FENCE)
+            if fence < 0:
+                if not self.in_fence:
+                    kept.append(text)
+                return ' '.join(kept)
+            if not self.in_fence:
+                kept.append(text[:fence])
+            self.in_fence = not self.in_fence
+            text = text[fence + len(_FENCE):]
+
+    def feed(self, text):
+        self.buffer += self._outside_fences(text)
+        sentences = []
+        while True:
+            match = _SENTENCE_END.search(self.buffer)
+            limit = self.first_chunk_chars if self.first else self.max_chunk_chars
+            if match and match.end() <= limit * 2:
+                cut = match.end()
+            elif len(self.buffer) > limit:
+                # No sentence end soon enough: cut at a clause or word boundary
+                comma = self.buffer.rfind(', ', 0, limit)
+                cut = comma + 2 if comma > limit // 2 else self.buffer.rfind(' ', 0, limit) + 1
+                if cut <= 0:
+                    cut = limit
+            else:
+                return sentences
+            sentence = self.buffer[:cut].strip()
+            self.buffer = self.buffer[cut:]
+            if sentence:
+                sentences.append(sentence)
+                self.first = False
+
+    def flush(self):
+        sentence, self.buffer, self._held = self.buffer.strip(), '', ''
+        return [sentence] if sentence else []
+
+
+def speakable(text):
+    """Text with code blocks and markdown markers removed."""
+    return _MARKDOWN.sub(' ', text).strip()
+
+
+def opus_source(audio):
+    """A voice-client source for MP3/Ogg bytes; ffmpeg encodes Opus so Python does not have to."""
+    return discord.FFmpegOpusAudio(io.BytesIO(audio), pipe=True)
+
+
+class SpeechPipeline:
+    """Sentence TTS for one reply, played in order on a voice client.
+
+    `lock` (one per guild) keeps replies from talking over each other: a new
+    reply synthesizes right away but starts playing once the previous one ends.
+    """
+
+    def __init__(self, voice_client, engine, lock, make_source=opus_source):
+        self.voice_client = voice_client
+        self.engine = engine
+        self.lock = lock
+        self.make_source = make_source
+        self.splitter = SentenceSplitter()
+        self.started = time.monotonic()
+        self.first_audio = None
+        self._queue = asyncio.Queue()
+        self._closed = False
+        self._player = asyncio.ensure_future(self._play_all())
+        _active.add(self)
+        self._player.add_done_callback(lambda _: _active.discard(self))
+
+    def feed(self, text):
+        for sentence in self.splitter.feed(text):
+            self._enqueue(sentence)
+
+    def _enqueue(self, sentence):
+        sentence = speakable(sentence)
+        if re.search(r'\w', sentence) and not self._player.done():
+            # Synthesis starts now; playback order is kept by the queue
+            self._queue.put_nowait(asyncio.ensure_future(self.engine.synthesize_chunk(sentence)))
+
+    def close(self):
+        """No more text: speak what is left. Playback continues in the background."""
+        if self._closed:
+            return
+        self._closed = True
+        for sentence in self.splitter.flush():
+            self._enqueue(sentence)
+        self._queue.put_nowait(None)
+
+    async def tee(self, deltas):
+        """Pass an async iterator of text deltas through, speaking it along the way."""
+        try:
+            async for text in deltas:
+                self.feed(text)
+                yield text
+        finally:
+            self.close()
+
+    def cancel(self):
+        self._player.cancel()
+        self._drop()
+
+    def _drop(self):
+        while not self._queue.empty():
+            task = self._queue.get_nowait()
+            if task is not None:
+                task.cancel()
+
+    async def _play_all(self):
+        async with self.lock:
+            while True:
+                task = await self._queue.get()
+                if task is None:
+                    return
+                try:
+                    _, audio = await task
+                except Exception as e:
+                    logger.warning(f"Talk mode TTS failed for a sentence: {e}")
+                    continue
+                if not self.voice_client.is_connected():
+                    self._drop()
+                    return
+                if not await self._play(audio):
+                    self._drop()
+                    return
+
+    async def _play(self, audio):
+        """Play one sentence to the end; False if the voice client would not take it."""
+        loop = asyncio.get_running_loop()
+        finished = loop.create_future()
+
+        def after(error):
+            if error:
+                logger.warning(f"Talk mode playback error: {error}")
+            loop.call_soon_threadsafe(lambda: finished.done() or finished.set_result(None))
+
+        # Another audio source may already be playing on the voice client
+        while self.voice_client.is_playing():
+            await asyncio.sleep(0.1)
+        try:
+            self.voice_client.play(self.make_source(audio), after=after)
+        except discord.ClientException as e:
+            # Lost the race to another audio source already playing on the voice client, or we disconnected
+            logger.info(f"Talk mode stopped, voice client busy: {e}")
+            return False
+        if self.first_audio is None:
+            self.first_audio = time.monotonic() - self.started
+            _first_audio.append(self.first_audio)
+            logger.info(f"Talk mode first audio after {self.first_audio:.2f}s")
+        await finished
+        return True
+
+
+def stats():
+    samples = sorted(_first_audio)
+    if not samples:
+        return {'replies': 0, 'active': len(_active), 'first_audio_p50_s': None, 'first_audio_p95_s': None}
+    return {
+        'replies': len(samples),
+        'active': len(_active),
+        'first_audio_p50_s': round(samples[len(samples) // 2], 2),
+        'first_audio_p95_s': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+    }